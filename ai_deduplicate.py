@@ -1,81 +1,193 @@
+import hashlib
 import json
+import re
 import numpy as np
+from pathlib import Path
 from sentence_transformers import SentenceTransformer
 import faiss
 
+import pipeline_metrics
+from canonical import ensure_id
+
 # ============================
-# LOAD ARTICLES
+# CONFIG
 # ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+INPUT_FILE = PROJECT_ROOT / "data" / "raw_news.json"
+OUTPUT_FILE = PROJECT_ROOT / "data" / "deduped_news.json"
+# Vectors of the kept articles, reused by later stages (e.g. lab report triage)
+EMBEDDINGS_FILE = PROJECT_ROOT / "data" / "deduped_embeddings.npy"
+EMBEDDING_IDS_FILE = PROJECT_ROOT / "data" / "deduped_embedding_ids.json"
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+SIMILARITY_THRESHOLD = 0.85
 
-print("Loading articles...")
-
-with open("data/raw_news.json", "r", encoding="utf-8") as f:
-    articles = json.load(f)
-
-print(f"Loaded {len(articles)} articles")
-
-# Exit if no articles to process
-if not articles:
-    print("No articles to deduplicate. Exiting AI deduplication.")
-    exit(0)
+# Lexical prefilter (runs before the model ever sees an article)
+SHINGLE_SIZE = 3           # words per shingle
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16             # 16 bands x 4 rows: pairs above ~0.5 Jaccard become candidates
+JACCARD_THRESHOLD = 0.8    # estimated shingle overlap treated as the same text
 
 # ============================
-# LOAD AI MODEL
+# HELPERS
 # ============================
-
-print("Loading FREE local AI model...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-texts = [
-    article["title"] + " " + article.get("summary", "")
-    for article in articles
-]
-
-print("Generating embeddings...")
-embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+def load_model():
+    print("Loading FREE local AI model...")
+    return SentenceTransformer(MODEL_NAME)
+
+def article_text(article):
+    return article["title"] + " " + article.get("summary", "")
+
+def shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+_rng = np.random.default_rng(0x5EED)
+_SEEDS = _rng.integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MULTIPLIERS = _rng.integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+
+def minhash(text):
+    """MinHash signature over word shingles; equal slots estimate Jaccard similarity."""
+    grams = set(shingles(text))
+    if not grams:
+        return np.zeros(MINHASH_PERMUTATIONS, dtype=np.uint64)
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest() for g in grams),
+        dtype=np.uint64
+    )
+    # One xor-multiply permutation per column (uint64 arithmetic wraps around)
+    return ((hashes[:, None] ^ _SEEDS) * _MULTIPLIERS).min(axis=0)
+
+def minhash_prefilter(articles):
+    """
+    Returns the sorted indices of the first article of every near-identical group
+    (syndicated press releases, re-posted copies). Candidate pairs come from LSH
+    buckets over signature bands, so the cost stays linear in the number of articles.
+    """
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    buckets = [{} for _ in range(LSH_BANDS)]
+    signatures = []
+    kept = []
+
+    for i, article in enumerate(articles):
+        sig = minhash(article_text(article))
+        signatures.append(sig)
+        bands = [sig[b * rows:(b + 1) * rows].tobytes() for b in range(LSH_BANDS)]
+
+        candidates = {j for b, key in enumerate(bands) for j in buckets[b].get(key, ())}
+        if any(np.mean(sig == signatures[j]) >= JACCARD_THRESHOLD for j in candidates):
+            continue
+
+        kept.append(i)
+        for b, key in enumerate(bands):
+            buckets[b].setdefault(key, []).append(i)
+    return kept
+
+def embed_texts(model, texts, show_progress_bar=False):
+    """Encode texts into L2-normalised float32 vectors (cosine = inner product)"""
+    embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=show_progress_bar)
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype("float32")
+
+def embed_articles(model, articles, show_progress_bar=True):
+    return embed_texts(model, [article_text(a) for a in articles], show_progress_bar)
+
+def save_embeddings(articles, embeddings):
+    np.save(EMBEDDINGS_FILE, embeddings.astype("float32"))
+    EMBEDDING_IDS_FILE.write_text(json.dumps([ensure_id(a) for a in articles]), encoding="utf-8")
+
+def load_embeddings():
+    """{article_id: vector} from the last dedup run, or {} if missing / out of sync."""
+    if not EMBEDDINGS_FILE.exists() or not EMBEDDING_IDS_FILE.exists():
+        return {}
+    try:
+        ids = json.loads(EMBEDDING_IDS_FILE.read_text(encoding="utf-8"))
+        vectors = np.load(EMBEDDINGS_FILE)
+    except (OSError, ValueError):
+        return {}
+    if len(ids) != len(vectors):
+        return {}
+    return dict(zip(ids, vectors))
+
+def build_index(embeddings):
+    index = faiss.IndexFlatIP(embeddings.shape[1])  # Inner product = cosine similarity after normalization
+    if len(embeddings):
+        index.add(embeddings)
+    return index
+
+def deduplicate(embeddings, index=None):
+    """
+    Returns the sorted indices of the first article in every near-duplicate cluster.
+    If `index` is given (vectors already kept earlier), anything similar to it is dropped too.
+    """
+    local_index = build_index(embeddings)
+    lims, D, I = local_index.range_search(embeddings, SIMILARITY_THRESHOLD)
+
+    dropped = set()
+    if index is not None and index.ntotal > 0:
+        prev_lims, _, _ = index.range_search(embeddings, SIMILARITY_THRESHOLD)
+        dropped = {i for i in range(len(embeddings)) if prev_lims[i + 1] > prev_lims[i]}
+
+    kept = []
+    for i in range(len(embeddings)):
+        if i in dropped:
+            continue
+        kept.append(i)
+        # Everything later that is too similar belongs to this cluster
+        for j in I[lims[i]:lims[i + 1]]:
+            if j > i:
+                dropped.add(int(j))
+    return kept
 
 # ============================
-# AI-BASED DEDUPLICATION USING FAISS
+# MAIN
 # ============================
+def main():
+    pipeline_metrics.start_stage("ai_deduplicate")
+    print("Loading articles...")
 
-SIMILARITY_THRESHOLD = 0.85
-
-# Normalize embeddings for cosine similarity
-embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+        articles = json.load(f)
 
-d = embeddings.shape[1]  # dimension of embeddings
-index = faiss.IndexFlatIP(d)  # Inner product = cosine similarity after normalization
-index.add(embeddings)
+    print(f"Loaded {len(articles)} articles")
+    pipeline_metrics.incr("articles_in", len(articles))
 
-kept_indices = set()
-all_indices = set(range(len(articles)))
+    # Exit if no articles to process
+    if not articles:
+        print("No articles to deduplicate. Exiting AI deduplication.")
+        return
 
-print("Running AI-based deduplication with FAISS...")
+    with pipeline_metrics.span("minhash"):
+        representatives = [articles[i] for i in minhash_prefilter(articles)]
+    prefiltered = len(articles) - len(representatives)
+    pipeline_metrics.incr("dropped_minhash", prefiltered)
+    print(f"MinHash prefilter removed {prefiltered} near-identical copies "
+          f"({len(representatives)} left to embed)")
+    articles = representatives
 
-for i in range(len(articles)):
-    if i in kept_indices:
-        continue
+    with pipeline_metrics.span("load_model"):
+        model = load_model()
 
-    # Query similar vectors (self + others)
-    x = embeddings[i].reshape(1, -1).astype('float32')
-    D, I = index.search(x, len(articles))  # get all similarities
-    # I contains indices sorted by inner product (cosine similarity)
+    print("Generating embeddings...")
+    with pipeline_metrics.span("encode"):
+        embeddings = embed_articles(model, articles)
 
-    for j, score in zip(I[0], D[0]):
-        if score > SIMILARITY_THRESHOLD:
-            kept_indices.add(j)
-        else:
-            break  # embeddings are sorted, so rest are below threshold
+    print("Running AI-based deduplication with FAISS...")
+    with pipeline_metrics.span("faiss"):
+        kept_indices = deduplicate(embeddings)
 
-# Keep only first occurrence of each cluster
-kept_articles = [articles[i] for i in sorted(kept_indices)]
+    # Keep only first occurrence of each cluster
+    kept_articles = [articles[i] for i in kept_indices]
 
-# ============================
-# SAVE DEDUPLICATED ARTICLES
-# ============================
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(kept_articles, f, indent=2, ensure_ascii=False)
+    save_embeddings(kept_articles, embeddings[kept_indices])
 
-with open("data/deduped_news.json", "w", encoding="utf-8") as f:
-    json.dump(kept_articles, f, indent=2, ensure_ascii=False)
+    pipeline_metrics.incr("articles_out", len(kept_articles))
+    print(f"After AI deduplication: {len(kept_articles)} articles")
+    print("AI deduplication completed successfully")
 
-print(f"After AI deduplication: {len(kept_articles)} articles")
-print("AI deduplication completed successfully")
+if __name__ == "__main__":
+    main()
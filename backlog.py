@@ -0,0 +1,205 @@
+"""
+Persistent backlog of ranked-but-unpicked stories.
+
+One max-heap replaces the old archive_news.json / backup_queue.json pair.
+Stories are ordered by a time-decayed score, score * exp(-age / TAU). Its
+log is
+
+    log(score) + published_at / TAU - now / TAU
+
+and the last term is the same for every story, so each entry's key is fixed
+when it is pushed and the heap never needs reordering as days pass. Pushes
+are O(log n). Expired, superseded and already-sent entries are skipped when
+they reach the top (lazy deletion); ID sets make membership checks O(1).
+
+Stories handed out by `take` are recorded as sent and never come back, whether
+they reached the brief through rank_news.py or the fallback in run_pipeline.py.
+Inside a pipeline run the backlog is saved through staging.deferred(), so it
+only replaces backlog.json when the run publishes; a failed run leaves its
+stories in the backlog for the next one.
+"""
+import heapq
+import json
+import math
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import publish
+import staging
+from canonical import ensure_id
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+DATA_DIR = PROJECT_ROOT / "data"
+BACKLOG_FILE = DATA_DIR / "backlog.json"
+
+# Replaced by the backlog; imported once, then removed
+LEGACY_FILES = [DATA_DIR / "archive_news.json", DATA_DIR / "backup_queue.json"]
+
+HALF_LIFE_HOURS = 48          # A story's priority halves every two days
+MAX_AGE_DAYS = 14             # Older stories expire
+MAX_ENTRIES = 400             # Lowest-priority stories are dropped beyond this
+
+TAU_SECONDS = HALF_LIFE_HOURS * 3600 / math.log(2)
+
+def _now(now=None):
+    return now or datetime.now(timezone.utc)
+
+def _published(article):
+    try:
+        published = datetime.fromisoformat(article["published_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return published if published.tzinfo else published.replace(tzinfo=timezone.utc)
+
+def priority(article):
+    """log of the decayed score, minus the shared now/TAU term. None if undated."""
+    published = _published(article)
+    if published is None:
+        return None
+    return math.log(max(float(article.get("score") or 1), 1e-3)) + published.timestamp() / TAU_SECONDS
+
+# ============================
+# BACKLOG
+# ============================
+class Backlog:
+    def __init__(self, entries=(), sent=None):
+        self.sent = dict(sent or {})   # id -> ISO time it went out
+        self.articles = {}             # id -> article (current version)
+        self.keys = {}                 # id -> priority of that version
+        self._heap = []                # (-priority, id); stale pairs are skipped lazily
+        for article in entries:
+            self.push(article)
+
+    def __len__(self):
+        return len(self.articles)
+
+    def __contains__(self, article_id):
+        return article_id in self.articles
+
+    @classmethod
+    def load(cls, path=BACKLOG_FILE, now=None):
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                return cls(data.get("entries", []), data.get("sent", {}))
+            except (ValueError, AttributeError):
+                print("⚠️ backlog.json unreadable. Starting an empty backlog.")
+                return cls()
+        return cls.migrate(now)
+
+    @classmethod
+    def migrate(cls, now=None):
+        """Backlog built from the legacy archive and backup lists, minus stories already briefed."""
+        backlog = cls(sent={sid: _now(now).isoformat() for sid in briefed_ids(now)})
+        imported = 0
+        for path in LEGACY_FILES:
+            try:
+                articles = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for a in articles if isinstance(articles, list) else []:
+                imported += backlog.push({k: v for k, v in a.items() if k != "archived_at"})
+        if imported:
+            print(f"📦 Migrated {len(backlog)} stories from archive_news.json / backup_queue.json")
+        return backlog
+
+    def save(self, path=None, now=None):
+        """
+        Writes the live entries (best first) and recent sent IDs, by default
+        to backlog.json (its .staged twin during a run). The legacy files go
+        once a backlog.json is in place.
+        """
+        path = path or staging.deferred(BACKLOG_FILE)
+        self.expire(now)
+        data = {"entries": self.ranked(), "sent": self.sent}
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+        if BACKLOG_FILE.exists():
+            for legacy in LEGACY_FILES:
+                legacy.unlink(missing_ok=True)
+
+    # ----------------------------
+    # Heap operations
+    # ----------------------------
+    def push(self, article):
+        """Adds or upgrades a story. Returns False for sent, undated or lower-priority duplicates."""
+        article_id = ensure_id(article)
+        key = priority(article)
+        if key is None or article_id in self.sent:
+            return False
+        if article_id in self.keys and self.keys[article_id] >= key:
+            return False
+        self.articles[article_id] = {k: v for k, v in article.items() if k != "full_text"}
+        self.keys[article_id] = key
+        heapq.heappush(self._heap, (-key, article_id))
+        return True
+
+    def _live(self, neg_key, article_id):
+        return self.keys.get(article_id) == -neg_key
+
+    def _discard(self, article_id):
+        self.articles.pop(article_id, None)
+        self.keys.pop(article_id, None)
+
+    def take(self, n, now=None, exclude=()):
+        """
+        Pops up to `n` of the highest-priority live stories published within
+        MAX_AGE_DAYS and marks them sent. IDs in `exclude` are left in place.
+        """
+        cutoff = _now(now) - timedelta(days=MAX_AGE_DAYS)
+        taken, skipped = [], []
+        while self._heap and len(taken) < n:
+            neg_key, article_id = heapq.heappop(self._heap)
+            if not self._live(neg_key, article_id):
+                continue
+            article = self.articles[article_id]
+            if _published(article) < cutoff:
+                self._discard(article_id)
+                continue
+            if article_id in exclude:
+                skipped.append((neg_key, article_id))
+                continue
+            self._discard(article_id)
+            taken.append(article)
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        self.mark_sent(taken, now)
+        return taken
+
+    def mark_sent(self, articles, now=None):
+        timestamp = _now(now).isoformat()
+        for a in articles:
+            article_id = ensure_id(a)
+            self.sent[article_id] = timestamp
+            self._discard(article_id)
+
+    def expire(self, now=None):
+        """Drops expired stories and sent IDs, keeps the best MAX_ENTRIES and rebuilds the heap."""
+        cutoff = _now(now) - timedelta(days=MAX_AGE_DAYS)
+        # A sent story was published before it went out, so past the cutoff it cannot return
+        self.sent = {sid: ts for sid, ts in self.sent.items() if datetime.fromisoformat(ts) >= cutoff}
+        live = [(self.keys[i], i) for i, a in self.articles.items() if _published(a) >= cutoff]
+        keep = heapq.nlargest(MAX_ENTRIES, live)
+        kept_ids = {i for _, i in keep}
+        self.articles = {i: a for i, a in self.articles.items() if i in kept_ids}
+        self.keys = {i: k for k, i in keep}
+        self._heap = [(-k, i) for k, i in keep]
+        heapq.heapify(self._heap)
+
+    def ranked(self):
+        """Live entries, highest priority first (does not modify the heap)."""
+        return [self.articles[i] for neg_key, i in sorted(self._heap) if self._live(neg_key, i)]
+
+def briefed_ids(now=None):
+    """IDs of the stories in published briefs from the last MAX_AGE_DAYS."""
+    first_day = (_now(now) - timedelta(days=MAX_AGE_DAYS)).date().isoformat()
+    ids = set()
+    for day, path in publish.archive_files().items():
+        payload = publish.load_archived(path)
+        if day >= first_day and isinstance(payload, dict):
+            ids.update(ensure_id(s) for s in payload.get("top_stories", []))
+    return ids
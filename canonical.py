@@ -0,0 +1,58 @@
+"""
+URL canonicalization and stable article IDs shared by every stage.
+
+`canonical_url` strips tracking parameters and fragments, lowercases the
+host and drops default ports, so the same story linked from two feeds
+(or with a new utm_ tag) compares equal. `article_id` hashes a
+scheme-, www.- and trailing-slash-insensitive form of it into a compact
+64-bit ID (16 hex chars, JSON-safe) that stages join on instead of titles.
+"""
+import hashlib
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_hsenc", "_hsmi", "mkt_tok", "ref", "ref_src", "cmpid", "spm", "guccounter",
+    "guce_referrer", "guce_referrer_sig", "sr_share", "smid", "ocid", "taid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+def _is_tracking(key):
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+@lru_cache(maxsize=4096)
+def canonical_url(url):
+    """Same link without tracking params / fragment, with a lowercase host. Safe to publish."""
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+
+    host = (parts.hostname or "").lower()
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k)
+    ))
+    path = parts.path or "/"
+    return urlunsplit((scheme, host, path, query, ""))
+
+@lru_cache(maxsize=4096)
+def article_id(url):
+    """64-bit ID (16 hex chars) that ignores scheme, a leading www. and trailing slashes."""
+    parts = urlsplit(canonical_url(url) or "")
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = parts.path.rstrip("/") or "/"
+    key = f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+def ensure_id(article):
+    """Backfill `id` on records written before IDs existed (archive, backups). Returns the ID."""
+    if not article.get("id"):
+        article["id"] = article_id(article.get("url") or article.get("title", ""))
+    return article["id"]
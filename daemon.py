@@ -0,0 +1,309 @@
+"""
+Long-running brief daemon.
+
+Keeps the sentence-transformer encoder and the FAISS index of today's kept
+articles warm in memory, so dedup only embeds articles it has not seen.
+Every other stage (ranking included) still runs as a subprocess through
+run_pipeline.run_step and loads its own state on each refresh. It also
+exposes a small local HTTP API:
+
+    GET  /status   -> daemon state (articles in window, last run, running flag)
+    GET  /brief    -> current docs/data/daily_brief.json
+    POST /run      -> trigger an incremental refresh (202, or 409 if one is running)
+    POST /score    -> score ad-hoc articles: [{"title", "summary", "source"}, ...]
+
+Usage:
+    python daemon.py [--port 8765] [--interval-hours 6]
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+import ai_deduplicate
+import pipeline_metrics
+import rank_news
+import staging
+from canonical import ensure_id
+from run_pipeline import STANDARD_FLOW, FINAL_STEPS, run_step
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+RAW_NEWS_FILE = PROJECT_ROOT / "data" / "raw_news.json"
+DEDUPED_FILE = PROJECT_ROOT / "data" / "deduped_news.json"
+BRIEF_FILE = staging.LIVE_SITE_DIR / "data" / "daily_brief.json"
+
+DEFAULT_PORT = 8765
+WINDOW_HOURS = 24
+
+# ============================
+# DAEMON STATE
+# ============================
+def _published(article):
+    try:
+        published = datetime.fromisoformat(article["published_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return published if published.tzinfo else published.replace(tzinfo=timezone.utc)
+
+class BriefDaemon:
+    def __init__(self):
+        self.model = ai_deduplicate.load_model()
+        self.articles = []        # kept (deduplicated) articles inside the window
+        self.embeddings = None    # float32 matrix aligned with self.articles
+        self.index = None
+        self.seen_ids = {}        # article ID -> published_at of every article processed (kept or dropped)
+        self.pending = None       # Delta of the running refresh; applied only if it publishes
+        self.last_run = None
+        self.last_delta = 0
+        self.run_lock = threading.Lock()
+
+    # ----------------------------
+    # Window maintenance
+    # ----------------------------
+    def _prune_window(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=WINDOW_HOURS)
+        # Older articles are outside fetch_news.py's window too, so they cannot come back
+        self.seen_ids = {
+            article_id: published for article_id, published in self.seen_ids.items()
+            if published is not None and published >= cutoff
+        }
+        keep = []
+        for i, a in enumerate(self.articles):
+            try:
+                if datetime.fromisoformat(a["published_at"]) >= cutoff:
+                    keep.append(i)
+            except (KeyError, ValueError):
+                continue
+
+        if len(keep) == len(self.articles):
+            return
+
+        self.articles = [self.articles[i] for i in keep]
+        self.embeddings = self.embeddings[keep] if len(keep) else None
+        self.index = ai_deduplicate.build_index(self.embeddings) if len(keep) else None
+
+    def _absorb(self, raw_articles):
+        """
+        Embed and dedup only articles not seen before, against the warm index.
+        Returns the delta {seen, articles, vectors} without applying it (see
+        _commit), or None when nothing is new.
+        """
+        delta = [a for a in raw_articles if ensure_id(a) not in self.seen_ids]
+        if not delta:
+            return None
+
+        candidates = [delta[i] for i in ai_deduplicate.minhash_prefilter(delta)]
+        vectors = ai_deduplicate.embed_articles(self.model, candidates, show_progress_bar=False)
+        kept = ai_deduplicate.deduplicate(vectors, index=self.index)
+
+        print(f"[DAEMON] Delta: {len(delta)} new, {len(candidates)} after MinHash, {len(kept)} kept after dedup")
+        return {
+            "seen": {ensure_id(a): _published(a) for a in delta},
+            "articles": [candidates[i] for i in kept],
+            "vectors": vectors[kept],
+        }
+
+    def _commit(self, delta):
+        """Makes a published refresh's articles part of the window, so later refreshes skip them."""
+        self.seen_ids.update(delta["seen"])
+        self.articles.extend(delta["articles"])
+        if self.embeddings is None:
+            self.embeddings = delta["vectors"]
+            self.index = ai_deduplicate.build_index(delta["vectors"])
+        else:
+            self.embeddings = np.vstack([self.embeddings, delta["vectors"]])
+            self.index.add(delta["vectors"])
+
+    # ----------------------------
+    # Refresh
+    # ----------------------------
+    def refresh(self):
+        if not self.run_lock.acquire(blocking=False):
+            return False
+
+        recorder = pipeline_metrics.RunRecorder(mode="daemon")
+        status = "failed"
+        try:
+            with staging.run_lock() as locked:
+                if not locked:
+                    print("[DAEMON] Another pipeline run on this machine holds the lock. Skipping this refresh.")
+                    status = "locked"
+                    return True
+                # Stages write into a copy of docs/; only a complete refresh replaces the live site
+                site = staging.stage_site()
+                status = self._refresh(recorder)
+                if status == "ok":
+                    staging.swap(site)
+                    self._commit(self.pending)
+                else:
+                    # The delta stays unseen, so the next refresh processes it again
+                    staging.discard(site)
+            return True
+        finally:
+            self.pending = None
+            recorder.finish(status)
+            self.last_run = datetime.now(timezone.utc).isoformat()
+            self.run_lock.release()
+
+    def _refresh(self, recorder):
+        """Runs the stages into the staged site. Returns the run status."""
+        print(f"\n[DAEMON] Refresh started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        if not run_step("fetch_news.py", recorder):
+            return "failed"
+        # Filter before the warm dedup so dropped articles are never embedded
+        if not run_step("quality_filter.py", recorder):
+            return "failed"
+
+        raw_articles = []
+        if RAW_NEWS_FILE.exists():
+            raw_articles = json.loads(RAW_NEWS_FILE.read_text(encoding="utf-8"))
+
+        started = time.perf_counter()
+        self._prune_window()
+        self.pending = self._absorb(raw_articles)
+        recorder.step("ai_deduplicate (in-process)", True, time.perf_counter() - started)
+
+        self.last_delta = len(self.pending["seen"]) if self.pending else 0
+        if self.pending is None:
+            print("[DAEMON] No new articles since last run. Keeping current brief.")
+            return "no_delta"
+
+        # The stages see the window as it will be if this refresh publishes
+        articles = self.articles + self.pending["articles"]
+        embeddings = (self.pending["vectors"] if self.embeddings is None
+                      else np.vstack([self.embeddings, self.pending["vectors"]]))
+        DEDUPED_FILE.write_text(
+            json.dumps(articles, indent=2, ensure_ascii=False),
+            encoding="utf-8"
+        )
+        ai_deduplicate.save_embeddings(articles, embeddings)
+
+        # Filtering and dedup already happened above, dedup in-process with the warm model
+        for script, delay in STANDARD_FLOW:
+            if script in ("quality_filter.py", "ai_deduplicate.py"):
+                continue
+            if not run_step(script, recorder):
+                print(f"[DAEMON] Refresh stopped at {script}")
+                return "failed"
+            if delay > 0:
+                print(f"☕ Taking a {delay}s breather to respect Gemini Free Tier limits...")
+                recorder.sleep(delay)
+
+        for script in FINAL_STEPS:
+            if not run_step(script, recorder):
+                return "failed"
+        return "ok"
+
+    # ----------------------------
+    # Ad-hoc scoring
+    # ----------------------------
+    def score(self, articles):
+        results = []
+        vectors = ai_deduplicate.embed_articles(self.model, articles, show_progress_bar=False)
+        for a, v in zip(articles, vectors):
+            nearest = None
+            if self.index is not None and self.index.ntotal > 0:
+                D, I = self.index.search(v.reshape(1, -1), 1)
+                nearest = {
+                    "similarity": round(float(D[0][0]), 4),
+                    "title": self.articles[int(I[0][0])].get("title")
+                }
+            results.append({
+                "title": a.get("title"),
+                "score": rank_news.score_article(a),
+                "is_duplicate": bool(nearest and nearest["similarity"] > ai_deduplicate.SIMILARITY_THRESHOLD),
+                "nearest": nearest
+            })
+        return results
+
+    def status(self):
+        return {
+            "running": self.run_lock.locked(),
+            "articles_in_window": len(self.articles),
+            "seen_articles": len(self.seen_ids),
+            "last_run": self.last_run,
+            "last_delta": self.last_delta
+        }
+
+# ============================
+# HTTP API
+# ============================
+def make_handler(daemon):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._send(200, daemon.status())
+            elif self.path == "/brief":
+                if BRIEF_FILE.exists():
+                    self._send(200, json.loads(BRIEF_FILE.read_text(encoding="utf-8")))
+                else:
+                    self._send(404, {"error": "No brief generated yet"})
+            else:
+                self._send(404, {"error": "Unknown endpoint"})
+
+        def do_POST(self):
+            if self.path == "/run":
+                if daemon.run_lock.locked():
+                    self._send(409, {"error": "A refresh is already running"})
+                    return
+                threading.Thread(target=daemon.refresh, daemon=True).start()
+                self._send(202, {"status": "refresh started"})
+            elif self.path == "/score":
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    articles = json.loads(self.rfile.read(length) or b"[]")
+                    if isinstance(articles, dict):
+                        articles = [articles]
+                    self._send(200, daemon.score(articles))
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send(400, {"error": str(e)})
+            else:
+                self._send(404, {"error": "Unknown endpoint"})
+
+        def log_message(self, fmt, *args):
+            print(f"[DAEMON] {self.address_string()} {fmt % args}")
+
+    return Handler
+
+def schedule_loop(daemon, interval_hours):
+    while True:
+        daemon.refresh()
+        time.sleep(interval_hours * 3600)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AI brief pipeline as a warm local daemon.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--interval-hours", type=float, default=0,
+                        help="Refresh automatically every N hours (0 = only on POST /run)")
+    args = parser.parse_args()
+
+    daemon = BriefDaemon()
+    if args.interval_hours > 0:
+        threading.Thread(target=schedule_loop, args=(daemon, args.interval_hours), daemon=True).start()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(daemon))
+    print(f"🚀 Brief daemon listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down daemon.")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Per-recipient email delivery engine used by send_email.py.
+
+The message body is rendered once (templating.Rendered); each recipient
+only costs a cheap slot fill. Messages go out individually over a small pool of reused
+SMTP connections, with bounded concurrency, a token-bucket rate limit,
+retry on transient failures and a persistent delivery log so a partial
+run can resume without re-sending.
+"""
+import json
+import os
+import queue
+import random
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pipeline_metrics
+from rate_limit import RateLimiter
+
+# ============================
+# CONFIGURATION
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+DELIVERY_LOG = PROJECT_ROOT / "data" / "delivery_log.jsonl"
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_SSL", "1") != "0"
+
+POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+RATE_PER_SEC = float(os.getenv("SMTP_RATE_PER_SEC", "5"))
+MAX_RETRIES = 3
+
+TRANSIENT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    socket.timeout,
+    ConnectionError,
+)
+
+# ============================
+# CONNECTION POOL
+# ============================
+def default_smtp_factory(user=None, password=None, host=None, port=None, use_ssl=None):
+    host = host or SMTP_HOST
+    port = port or SMTP_PORT
+    use_ssl = SMTP_USE_SSL if use_ssl is None else use_ssl
+
+    def connect():
+        server = smtplib.SMTP_SSL(host, port, timeout=30) if use_ssl else smtplib.SMTP(host, port, timeout=30)
+        if user and password:
+            server.login(user, password)
+        return server
+    return connect
+
+class SMTPPool:
+    """Hands out up to `size` live SMTP connections and reuses them across sends."""
+
+    def __init__(self, factory, size=POOL_SIZE):
+        self.factory = factory
+        self.idle = queue.LifoQueue()
+        self.slots = threading.Semaphore(size)
+        self.lock = threading.Lock()
+        self.created = 0
+
+    @contextmanager
+    def connection(self):
+        self.slots.acquire()
+        try:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+                with self.lock:
+                    self.created += 1
+            try:
+                yield conn
+            except TRANSIENT_ERRORS:
+                # A broken connection is never returned to the pool
+                _quietly_close(conn)
+                raise
+            except Exception:
+                # Refused recipient / data error: keep the session if it is still usable
+                try:
+                    conn.rset()
+                    self.idle.put(conn)
+                except Exception:
+                    _quietly_close(conn)
+                raise
+            self.idle.put(conn)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                _quietly_close(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+def _quietly_close(conn):
+    try:
+        conn.quit()
+    except Exception:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# ============================
+# DELIVERY LOG
+# ============================
+class DeliveryLog:
+    """Append-only JSONL log; a recipient marked `sent` for a campaign is never re-sent."""
+
+    def __init__(self, path=DELIVERY_LOG):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+
+    def delivered(self, campaign_id):
+        done = set()
+        if not self.path.exists():
+            return done
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crashed run
+                if entry.get("campaign") == campaign_id and entry.get("status") == "sent":
+                    done.add(entry["recipient"])
+        return done
+
+    def record(self, campaign_id, recipient, status, attempts, error=None):
+        entry = {
+            "campaign": campaign_id,
+            "recipient": recipient,
+            "status": status,
+            "attempts": attempts,
+            "ts": datetime.now(timezone.utc).isoformat()
+        }
+        if error:
+            entry["error"] = error
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+# ============================
+# ENGINE
+# ============================
+def _is_transient(exc):
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return True
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and 400 <= code < 500
+
+def deliver(campaign_id, recipients, build_message, smtp_factory,
+            workers=POOL_SIZE, rate_per_sec=RATE_PER_SEC, max_retries=MAX_RETRIES, log=None):
+    """
+    Send one message per recipient.
+    `recipients`: list of {"email": .., "name": ..}; `build_message(recipient)` returns an EmailMessage.
+    Returns {"sent": n, "failed": n, "skipped": n}.
+    """
+    log = log or DeliveryLog()
+    already = log.delivered(campaign_id)
+    pending = [r for r in recipients if r["email"] not in already]
+    stats = {"sent": 0, "failed": 0, "skipped": len(recipients) - len(pending)}
+    if stats["skipped"]:
+        print(f"↩️ Resuming campaign {campaign_id}: {stats['skipped']} recipient(s) already delivered.")
+
+    pool = SMTPPool(smtp_factory, size=workers)
+    limiter = RateLimiter(rate_per_sec)
+    stats_lock = threading.Lock()
+
+    def send_one(recipient):
+        msg = build_message(recipient)
+        last_error = None
+        for attempt in range(1, max_retries + 1):
+            limiter.acquire()
+            try:
+                with pool.connection() as conn:
+                    conn.send_message(msg, to_addrs=[recipient["email"]])
+                log.record(campaign_id, recipient["email"], "sent", attempt)
+                with stats_lock:
+                    stats["sent"] += 1
+                return
+            except Exception as e:
+                last_error = f"{type(e).__name__}: {e}"
+                if not _is_transient(e) or attempt == max_retries:
+                    break
+                wait = (2 ** attempt) * 0.5 + random.uniform(0, 0.5)
+                pipeline_metrics.incr("retry_wait_s", wait)
+                time.sleep(wait)
+
+        log.record(campaign_id, recipient["email"], "failed", attempt, last_error)
+        with stats_lock:
+            stats["failed"] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(send_one, pending))
+    finally:
+        pool.close()
+
+    pipeline_metrics.incr("smtp_connections", pool.created)
+    return stats
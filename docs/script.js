@@ -1,145 +1,42 @@
+// Pages are pre-rendered by render_site.py; this script only handles history
+// navigation and the glossary search box.
 document.addEventListener("DOMContentLoaded", () => {
+    const root = document.body.dataset.root || "./";
+    const pageDate = document.body.dataset.date;
     const historySelect = document.getElementById("history-select");
 
-    loadBriefData("./data/daily_brief.json");
-    loadJargonData("./data/jargon_buster.json");
-    loadLabData("./data/lab_report.json");
-    loadToolboxData("./data/toolbox.json");
-
-    fetch("./data/manifest.json")
+    fetch(`${root}data/manifest.json`)
         .then(response => response.ok ? response.json() : [])
-        .then(dates => {
-            const sortedDates = dates.sort().reverse();
-            const pastDates = sortedDates.slice(1);
-            if (pastDates.length > 0) {
-                pastDates.forEach(date => {
-                    const option = document.createElement("option");
-                    option.value = `./data/archive/brief_${date}.json`;
-                    option.textContent = date; 
-                    historySelect.appendChild(option);
-                });
-            }
+        .then(entries => {
+            // Entries are {date, file}; manifests from before publish.py were bare dates
+            const pastDates = entries
+                .map(e => typeof e === "string" ? e : e.date)
+                .sort()
+                .reverse()
+                .slice(1);
+            pastDates.forEach(date => {
+                const option = document.createElement("option");
+                option.value = `${root}archive/${date}.html`;
+                option.textContent = date;
+                option.selected = date === pageDate;
+                historySelect.appendChild(option);
+            });
         });
 
     historySelect.addEventListener("change", (event) => {
-        const selectedPath = event.target.value === "latest" ? "./data/daily_brief.json" : event.target.value;
-        loadBriefData(selectedPath);
+        window.location.href = event.target.value === "latest" ? root : event.target.value;
     });
-});
-
-function loadJargonData(path) {
-    fetch(path)
-        .then(response => response.ok ? response.json() : null)
-        .then(data => {
-            const section = document.getElementById("jargon-decoder");
-            const container = document.getElementById("jargon-container");
-
-            if (data && data.terms && data.terms.length > 0) {
-                section.style.display = "block";
-                const titleElement = section.querySelector(".section-title");
-                titleElement.innerHTML = `🎓 Jargon Decoder <span class="update-tag">${data.last_updated || ''}</span>`;
-                container.innerHTML = "";
-                
-                data.terms.forEach(item => {
-                    const box = document.createElement("div");
-                    box.className = "jargon-card";
-                    box.innerHTML = `
-                        <h4>${item.term}</h4>
-                        <p class="jargon-def">${item.definition}</p>
-                        <div class="jargon-meta-box">
-                            <p class="jargon-analogy"><strong>💡 Analogy:</strong> ${item.analogy}</p>
-                            <p class="jargon-biz"><strong>📊 Business Value:</strong> ${item.business_value}</p>
-                        </div>
-                    `;
-                    container.appendChild(box);
-                });
-            } else {
-                section.style.display = "none";
-            }
-        });
-}
 
-function loadToolboxData(path) {
-    fetch(path)
-        .then(response => response.ok ? response.json() : null)
-        .then(data => {
-            const section = document.getElementById("ai-toolbox");
-            const container = document.getElementById("toolbox-container");
-            const tools = data?.tools || (Array.isArray(data) ? data : []);
-
-            if (tools.length > 0) {
-                section.style.display = "block";
-                container.innerHTML = "";
-                tools.forEach(tool => {
-                    const card = document.createElement("div");
-                    card.className = "tool-card";
-                    card.innerHTML = `
-                        <div class="tool-header">
-                            <span class="category-pill">${tool.Category}</span>
-                            <h4>${tool.Name}</h4>
-                        </div>
-                        <p class="tool-desc">${tool.Description}</p>
-                        <p class="tool-usage"><strong>Use Case:</strong> ${tool.Use_Case}</p>
-                        <a href="${tool.URL}" target="_blank" class="tool-link">View Repository →</a>
-                    `;
-                    container.appendChild(card);
-                });
-            } else {
-                section.style.display = "none";
-            }
-        });
-}
-
-function loadLabData(path) {
-    fetch(path)
-        .then(response => response.ok ? response.json() : null)
-        .then(data => {
-            const section = document.getElementById("lab-report");
-            const container = document.getElementById("lab-container");
-            if (data && data.papers) {
-                section.style.display = "block";
-                container.innerHTML = "";
-                data.papers.forEach(paper => {
-                    const card = document.createElement("div");
-                    card.className = "lab-card";
-                    card.innerHTML = `
-                        <h4>${paper.title}</h4>
-                        <div class="lab-meta">
-                            <p><strong>Innovation:</strong> ${paper.innovation}</p>
-                            <p><strong>Use Case:</strong> ${paper.use_case}</p>
-                        </div>
-                        <a href="${paper.url}" target="_blank" class="lab-link">Read Full Paper →</a>
-                    `;
-                    container.appendChild(card);
-                });
-            }
-        });
-}
-
-function loadBriefData(path) {
-    fetch(path)
-        .then(response => response.ok ? response.json() : null)
-        .then(data => {
-            if(!data) return;
-            const container = document.getElementById("stories");
-            document.getElementById("meta").textContent = `Updated on ${data.date}`;
-            container.innerHTML = "";
-            data.top_stories.forEach(story => {
-                const card = document.createElement("div");
-                card.className = "story";
-                card.innerHTML = `
-                    <h2>${story.rank}. ${story.title}</h2>
-                    <div class="story-content">
-                        <p>${story.summary}</p>
-                        <div class="tech-details">
-                            <p><strong>💡 Technical Takeaway:</strong> ${story.technical_takeaway}</p>
-                            <p><strong style="color: #c0392b;">⚖️ Risk:</strong> ${story.primary_risk}</p>
-                            <p><strong style="color: #27ae60;">🚀 Opportunity:</strong> ${story.primary_opportunity}</p>
-                        </div>
-                        <p class="source">Source: <a href="${story.url}" target="_blank">${story.source}</a></p>
-                    </div>
-                `;
-                container.appendChild(card);
+    const search = document.getElementById("glossary-search");
+    if (search) {
+        const list = document.getElementById("glossary-list");
+        search.addEventListener("input", () => {
+            const query = search.value.toLowerCase();
+            list.querySelectorAll("dt").forEach(dt => {
+                const show = dt.textContent.toLowerCase().includes(query);
+                dt.style.display = show ? "" : "none";
+                dt.nextElementSibling.style.display = show ? "" : "none";
             });
         });
-}
\ No newline at end of file
+    }
+});
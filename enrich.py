@@ -1,6 +1,8 @@
 import json
 from pathlib import Path
 
+import pipeline_metrics
+
 PROJECT_ROOT = Path(__file__).resolve().parent
 INPUT_FILE = PROJECT_ROOT / "data" / "technical_summaries.json"
 OUTPUT_FILE = PROJECT_ROOT / "data" / "enriched_summaries.json"
@@ -34,6 +36,43 @@ SOURCE_AUDIENCE_MAP = {
     "TechCrunch": ["Startup Founders", "Product Leaders"]
 }
 
+# ----------------------------
+# High-signal rules (keyword -> templates)
+# ----------------------------
+RULES = [
+    {
+        "keywords": ["privacy", "scraping", "ethics", "legal", "surveillance"],
+        "risk": "Regulatory exposure and erosion of public trust due to opaque data practices.",
+        "opportunity": "Differentiation through auditable, privacy-preserving AI pipelines.",
+        "takeaway": "Trust, not model size, is becoming a core technical constraint in AI systems.",
+        "audience": ["AI Ethics Engineers", "Legal & Compliance"]
+    },
+    {
+        "keywords": ["energy", "compute", "data center", "grid", "power"],
+        "risk": "Compute scaling limited by physical and energy infrastructure.",
+        "opportunity": "Efficiency-driven architectures and workload-aware scheduling.",
+        "takeaway": "Hardware and energy constraints now shape model design decisions.",
+        "audience": ["AI Infrastructure Engineers", "Sustainability Leaders"]
+    },
+    {
+        "keywords": ["agent", "multi-agent", "autonomous", "coding"],
+        "risk": "Debugging complexity and cascading failures in agentic systems.",
+        "opportunity": "End-to-end automation of complex cognitive workflows.",
+        "takeaway": "Agent orchestration is emerging as a new software abstraction layer.",
+        "audience": ["CTOs", "Engineering Leaders"]
+    },
+    {
+        "keywords": ["on-device", "edge", "local", "apple"],
+        "risk": "Fragmentation across hardware-specific inference stacks.",
+        "opportunity": "Low-latency, privacy-preserving user experiences.",
+        "takeaway": "Hybrid local-cloud inference is becoming the dominant deployment model.",
+        "audience": ["Mobile Engineers", "Product Managers"]
+    }
+]
+
+def match_rule(text):
+    return next((r for r in RULES if any(k in text for k in r["keywords"])), None)
+
 def enrich(article):
     title = (article.get("title") or "").strip()
     summary = article.get("what_happened") or "No summary available."
@@ -48,30 +87,17 @@ def enrich(article):
 
     # ----------------------------
     # High-signal rule overrides
+    # (only for articles the LLM summarizer could not cover)
     # ----------------------------
-    if any(k in text for k in ["privacy", "scraping", "ethics", "legal", "surveillance"]):
-        risk = "Regulatory exposure and erosion of public trust due to opaque data practices."
-        opportunity = "Differentiation through auditable, privacy-preserving AI pipelines."
-        takeaway = "Trust, not model size, is becoming a core technical constraint in AI systems."
-        audience = ["AI Ethics Engineers", "Legal & Compliance"]
-
-    elif any(k in text for k in ["energy", "compute", "data center", "grid", "power"]):
-        risk = "Compute scaling limited by physical and energy infrastructure."
-        opportunity = "Efficiency-driven architectures and workload-aware scheduling."
-        takeaway = "Hardware and energy constraints now shape model design decisions."
-        audience = ["AI Infrastructure Engineers", "Sustainability Leaders"]
-
-    elif any(k in text for k in ["agent", "multi-agent", "autonomous", "coding"]):
-        risk = "Debugging complexity and cascading failures in agentic systems."
-        opportunity = "End-to-end automation of complex cognitive workflows."
-        takeaway = "Agent orchestration is emerging as a new software abstraction layer."
-        audience = ["CTOs", "Engineering Leaders"]
-
-    elif any(k in text for k in ["on-device", "edge", "local", "apple"]):
-        risk = "Fragmentation across hardware-specific inference stacks."
-        opportunity = "Low-latency, privacy-preserving user experiences."
-        takeaway = "Hybrid local-cloud inference is becoming the dominant deployment model."
-        audience = ["Mobile Engineers", "Product Managers"]
+    rule = None
+    if not all([risk, opportunity, takeaway, audience]):
+        rule = match_rule(text)
+
+    if rule:
+        risk = risk or rule["risk"]
+        opportunity = opportunity or rule["opportunity"]
+        takeaway = takeaway or rule["takeaway"]
+        audience = audience or rule["audience"]
 
     # ----------------------------
     # Intelligent fallbacks
@@ -103,6 +129,7 @@ def enrich(article):
     return article
 
 def main():
+    pipeline_metrics.start_stage("enrich")
     if not INPUT_FILE.exists():
         print(f"ERROR: {INPUT_FILE.name} not found")
         return
@@ -110,7 +137,9 @@ def main():
     with open(INPUT_FILE, "r", encoding="utf-8", errors="replace") as f:
         articles = json.load(f)
 
+    pipeline_metrics.incr("articles_in", len(articles))
     enriched = [enrich(article) for article in articles]
+    pipeline_metrics.incr("articles_out", len(enriched))
 
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
@@ -0,0 +1,208 @@
+import gzip
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import lxml.html
+import requests
+from requests.adapters import HTTPAdapter
+
+import pipeline_metrics
+from canonical import article_id
+from rank_news import score_article
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+DEDUPED_FILE = PROJECT_ROOT / "data" / "deduped_news.json"
+CACHE_DIR = PROJECT_ROOT / "data" / "extract_cache"
+
+MAX_CANDIDATES = 40        # Only the best pre-scored fresh articles are worth a page fetch
+FRESH_HOURS = 24
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 2         # Concurrent connections per host
+MAX_BYTES = 1_500_000      # Stop reading a page after this many bytes
+TIMEOUT = 10
+CACHE_FRESH_DAYS = 3       # Cached text newer than this is used without any request
+MAX_TEXT_CHARS = 4000      # Stored per article; enough for ranking and summaries
+MIN_PARAGRAPH_CHARS = 40
+
+USER_AGENT = "Mozilla/5.0 (compatible; AIExecutiveBrief/1.0; +https://github.com/Apoorva840/ai-executive-brief)"
+
+DROP_XPATH = "//script|//style|//noscript|//nav|//header|//footer|//aside|//form|//iframe|//svg|//figure"
+
+# ============================
+# CACHE (gzip JSON per URL)
+# ============================
+def cache_path(url):
+    return CACHE_DIR / f"{article_id(url)}.json.gz"
+
+def load_cached(url):
+    path = cache_path(url)
+    if not path.exists():
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def store_cached(url, entry):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path(url).with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    tmp.replace(cache_path(url))
+
+# ============================
+# EXTRACTION
+# ============================
+def extract_main_text(page_bytes):
+    """
+    Readability-lite: drop boilerplate, credit paragraph text to its parent
+    block, and keep the paragraphs of the best-scoring block.
+    """
+    try:
+        doc = lxml.html.fromstring(page_bytes)
+    except (ValueError, lxml.etree.ParserError):
+        return ""
+
+    for node in doc.xpath(DROP_XPATH):
+        node.drop_tree()
+
+    scores = {}
+    for p in doc.iter("p"):
+        length = len(p.text_content().strip())
+        if length >= MIN_PARAGRAPH_CHARS:
+            parent = p.getparent()
+            scores[parent] = scores.get(parent, 0) + length
+
+    if not scores:
+        # Abstract pages (e.g. arXiv) often carry the text only in meta tags
+        meta = doc.xpath('//meta[@property="og:description"]/@content | //meta[@name="description"]/@content')
+        return " ".join(meta[0].split())[:MAX_TEXT_CHARS] if meta else ""
+
+    best = max(scores, key=scores.get)
+    paragraphs = [
+        " ".join(p.text_content().split())
+        for p in best.iter("p")
+        if len(p.text_content().strip()) >= MIN_PARAGRAPH_CHARS
+    ]
+    return "\n\n".join(paragraphs)[:MAX_TEXT_CHARS]
+
+class Fetcher:
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=PER_HOST_LIMIT)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.host_limits = {}
+        self.lock = threading.Lock()
+
+    def host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.Semaphore(PER_HOST_LIMIT)
+            return self.host_limits[host]
+
+    def fetch_text(self, url):
+        """Returns extracted text for `url`, using / refreshing the cache."""
+        cached = load_cached(url)
+        now = datetime.now(timezone.utc)
+        if cached and cached.get("fetched_at", "") >= (now - timedelta(days=CACHE_FRESH_DAYS)).isoformat():
+            pipeline_metrics.incr("cache_hits")
+            return cached.get("text", "")
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        with self.host_slot(url):
+            with self.session.get(url, headers=headers, timeout=TIMEOUT, stream=True) as resp:
+                if resp.status_code == 304 and cached:
+                    pipeline_metrics.incr("cache_revalidated")
+                    cached["fetched_at"] = now.isoformat()
+                    store_cached(url, cached)
+                    return cached.get("text", "")
+
+                resp.raise_for_status()
+                body = bytearray()
+                for chunk in resp.iter_content(chunk_size=65536):
+                    body.extend(chunk)
+                    if len(body) >= MAX_BYTES:
+                        pipeline_metrics.incr("pages_truncated")
+                        break
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+
+        pipeline_metrics.incr("bytes_fetched", len(body))
+        with pipeline_metrics.span("extract"):
+            text = extract_main_text(bytes(body))
+
+        store_cached(url, {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": now.isoformat(),
+            "text": text
+        })
+        return text
+
+# ============================
+# CANDIDATES
+# ============================
+def select_candidates(articles):
+    """Fresh articles, best cheap score first, capped at MAX_CANDIDATES."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=FRESH_HOURS)
+    fresh = []
+    for a in articles:
+        try:
+            if datetime.fromisoformat(a["published_at"]) >= cutoff:
+                fresh.append(a)
+        except (KeyError, ValueError):
+            continue
+    return sorted(fresh, key=score_article, reverse=True)[:MAX_CANDIDATES]
+
+def main():
+    pipeline_metrics.start_stage("extract_articles")
+    if not DEDUPED_FILE.exists():
+        print("⚠️ deduped_news.json missing. Skipping full-text extraction.")
+        return
+
+    articles = json.loads(DEDUPED_FILE.read_text(encoding="utf-8"))
+    candidates = select_candidates(articles)
+    pipeline_metrics.incr("articles_in", len(candidates))
+    print(f"📄 Extracting full text for {len(candidates)} ranking candidates...")
+
+    fetcher = Fetcher()
+
+    def work(article):
+        try:
+            return article, fetcher.fetch_text(article["url"])
+        except Exception as e:
+            pipeline_metrics.incr("fetch_failed")
+            print(f"[WARN] Extraction failed for {article['url']}: {e}")
+            return article, ""
+
+    extracted = 0
+    with pipeline_metrics.span("fetch"):
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for article, text in executor.map(work, candidates):
+                if text:
+                    article["full_text"] = text
+                    extracted += 1
+
+    DEDUPED_FILE.write_text(json.dumps(articles, indent=2, ensure_ascii=False), encoding="utf-8")
+    pipeline_metrics.incr("articles_out", extracted)
+    print(f"✅ Full text extracted for {extracted}/{len(candidates)} candidates.")
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,17 @@ import json
 import os
 from pathlib import Path
 
+import pipeline_metrics
+
 def fetch_github_trending():
+    pipeline_metrics.start_stage("fetch_github")
     print("🌐 Fetching Trending GitHub Repositories (Python/AI)...")
     # Updated to a more stable 2026 RSS provider
-    URL = "https://mshibanami.github.io/GitHubTrendingRSS/daily/python.xml"
+    URL = os.getenv("GITHUB_TRENDING_URL") or "https://mshibanami.github.io/GitHubTrendingRSS/daily/python.xml"
     
     try:
-        feed = feedparser.parse(URL)
+        with pipeline_metrics.span("network"):
+            feed = feedparser.parse(URL)
         repos = []
         
         # Take the top 15 trending entries
@@ -20,6 +24,8 @@ def fetch_github_trending():
                 "summary": entry.description
             })
         
+        pipeline_metrics.incr("articles_out", len(repos))
+
         if not repos:
             print("⚠️ RSS feed was empty. Check if the URL is still active.")
             return False
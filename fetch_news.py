@@ -1,18 +1,25 @@
 import feedparser
 import json
+import os
 import re
 import socket
 import requests
 from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from bs4 import BeautifulSoup
+from lxml import etree
+
+import pipeline_metrics
+import staging
+from canonical import article_id, canonical_url
 
 # ============================
 # PATHS
 # ============================
 PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_DIR = PROJECT_ROOT / "data"
-DATA_DIR.mkdir(exist_ok=True)
 
 RAW_NEWS_FILE = DATA_DIR / "raw_news.json"
 SENT_URLS_FILE = DATA_DIR / "sent_urls.json"
@@ -21,8 +28,12 @@ FAILED_FEEDS_FILE = DATA_DIR / "failed_feeds.json"
 # ============================
 # TIME WINDOW
 # ============================
-NOW_UTC = datetime.now(timezone.utc)
-CUTOFF_UTC = NOW_UTC - timedelta(hours=24)
+# Relative to the `now` passed in (default: the current time), never fixed at import
+WINDOW_HOURS = 24
+
+# Fallback parser stops after this many consecutive entries older than the cutoff
+# (feeds are newest-first; a short streak tolerates the odd out-of-order item)
+STALE_STREAK_LIMIT = 5
 
 # ============================
 # SOURCES
@@ -39,6 +50,18 @@ SOURCES = [
     {"name": "AI News", "rss": "https://artificialintelligence-news.com/feed/"}
 ]
 
+# Offline / load testing: serve every feed from a local stand-in (network_standin.py)
+FEED_BASE_URL = os.getenv("FEED_BASE_URL")
+
+def feed_slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+if FEED_BASE_URL:
+    SOURCES = [
+        {**s, "rss": f"{FEED_BASE_URL.rstrip('/')}/feeds/{feed_slug(s['name'])}.xml"}
+        for s in SOURCES
+    ]
+
 # ============================
 # HELPERS
 # ============================
@@ -56,128 +79,257 @@ def extract_datetime(entry):
     return datetime(*ts[:6], tzinfo=timezone.utc)
 
 # ============================
-# LOAD ARCHIVED URLS (LIST)
+# FALLBACK PARSER (malformed feeds)
 # ============================
-archived_urls = []
+DATE_FORMATS = [
+    "%a, %d %b %Y %H:%M:%S %Z",
+    "%d %b %Y %H:%M:%S %z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+]
+
+ENTRY_TAGS = {"item", "entry"}                 # RSS / Atom
+DATE_TAGS = ["pubDate", "published", "updated", "date"]
+SUMMARY_TAGS = ["description", "summary", "content", "encoded"]
+
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    """RFC 822, ISO 8601 and a few common variants -> aware UTC datetime, or None."""
+    text = (text or "").strip()
+    if not text:
+        return None
 
-if SENT_URLS_FILE.exists():
+    parsed = None
     try:
-        data = json.loads(SENT_URLS_FILE.read_text(encoding="utf-8"))
-        if isinstance(data, list):
-            archived_urls = data
-    except:
-        archived_urls = []
+        parsed = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            for fmt in DATE_FORMATS:
+                try:
+                    parsed = datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    continue
+
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def localname(el):
+    """Tag without namespace; recovered feeds may keep undeclared prefixes like 'dc:date'."""
+    if not isinstance(el.tag, str):  # comments / processing instructions
+        return None
+    return el.tag.rsplit("}", 1)[-1].rsplit(":", 1)[-1]
+
+def child_text(entry, names):
+    children = {localname(c): c for c in entry}
+    for name in names:
+        if name in children:
+            return " ".join("".join(children[name].itertext()).split())
+    return ""
 
-archived_set = set(archived_urls)
+def entry_link(entry):
+    for c in entry:
+        if localname(c) == "link":
+            # Atom: <link rel="alternate" href="..."/>, RSS: <link>...</link>
+            if c.get("href") and c.get("rel", "alternate") == "alternate":
+                return c.get("href").strip()
+            if c.text and c.text.strip():
+                return c.text.strip()
+    return ""
+
+def iter_entries(content):
+    """
+    Streams RSS <item> / Atom <entry> elements out of possibly broken XML,
+    freeing each one once read so memory stays flat on large feeds.
+    """
+    for _, el in etree.iterparse(BytesIO(content), events=("end",), recover=True):
+        if localname(el) not in ENTRY_TAGS:
+            continue
+
+        yield {
+            "title": child_text(el, ["title"]),
+            "link": entry_link(el),
+            "summary": child_text(el, SUMMARY_TAGS),
+            "published": parse_date(child_text(el, DATE_TAGS))
+        }
+
+        # Free this entry and the entries before it. Recovery can nest an entry inside
+        # the previous one (dropped closing tag), so only ever delete entry siblings.
+        el.clear()
+        prev = el.getprevious()
+        while prev is not None:
+            older = prev.getprevious()
+            if localname(prev) in ENTRY_TAGS:
+                el.getparent().remove(prev)
+            prev = older
 
 # ============================
-# FETCH
+# LOAD ARCHIVED URLS (LIST)
 # ============================
-articles = []
-failed_feeds = []
-too_old = no_date = 0
+def load_archived_urls():
+    if SENT_URLS_FILE.exists():
+        try:
+            data = json.loads(SENT_URLS_FILE.read_text(encoding="utf-8"))
+            if isinstance(data, list):
+                # Older entries were stored raw; canonicalize so they compare with new links
+                return list(dict.fromkeys(canonical_url(u) for u in data))
+        except:
+            pass
+    return []
 
-for source in SOURCES:
-    try:
-        socket.setdefaulttimeout(10)
-        feed = feedparser.parse(source["rss"])
-
-        if feed.bozo:
-            print(f"[WARN] feedparser failed for {source['name']} — fallback")
-            resp = requests.get(source["rss"], timeout=10)
-            soup = BeautifulSoup(resp.content, "xml")
-            entries = soup.find_all("item")
-
-            for e in entries:
-                title = e.title.text.strip() if e.title else None
-                link = e.link.text.strip() if e.link else None
-                pub = e.pubDate.text if e.pubDate else None
-                summary = e.description.text if e.description else ""
-
-                if not title or not link or not pub:
-                    no_date += 1
-                    continue
+# ============================
+# FETCH
+# ============================
+def parse_feed(source, content, cutoff, counts):
+    """Articles of one feed published after `cutoff`. Updates too_old / no_date in `counts`."""
+    articles = []
+    with pipeline_metrics.span("parse"):
+        feed = feedparser.parse(content)
 
-                try:
-                    published = datetime.strptime(
-                        pub, "%a, %d %b %Y %H:%M:%S %z"
-                    ).astimezone(timezone.utc)
-                except:
-                    no_date += 1
+    if feed.bozo:
+        print(f"[WARN] feedparser failed for {source['name']} — fallback")
+        stale_streak = 0
+        with pipeline_metrics.span("parse_fallback"):
+            for e in iter_entries(content):
+                if not e["title"] or not e["link"] or not e["published"]:
+                    counts["no_date"] += 1
                     continue
 
-                if published < CUTOFF_UTC:
-                    too_old += 1
+                if e["published"] < cutoff:
+                    counts["too_old"] += 1
+                    stale_streak += 1
+                    if stale_streak >= STALE_STREAK_LIMIT:
+                        pipeline_metrics.incr("fallback_early_stops")
+                        break
                     continue
+                stale_streak = 0
 
                 articles.append({
-                    "title": title,
-                    "summary": clean_summary(summary),
-                    "url": link,
+                    "title": e["title"],
+                    "summary": clean_summary(e["summary"]),
+                    "url": e["link"],
                     "source": source["name"],
-                    "published_at": published.isoformat()
+                    "published_at": e["published"].isoformat()
                 })
 
-        else:
-            print(f"{source['name']} entries: {len(feed.entries)}")
-            for e in feed.entries:
-                title = e.get("title")
-                link = e.get("link")
-                summary = e.get("summary", "")
+    else:
+        print(f"{source['name']} entries: {len(feed.entries)}")
+        for e in feed.entries:
+            title = e.get("title")
+            link = e.get("link")
+            summary = e.get("summary", "")
 
-                if not title or not link:
-                    continue
+            if not title or not link:
+                continue
 
-                published = extract_datetime(e)
-                if not published:
-                    no_date += 1
-                    continue
+            published = extract_datetime(e)
+            if not published:
+                counts["no_date"] += 1
+                continue
 
-                if published < CUTOFF_UTC:
-                    too_old += 1
-                    continue
+            if published < cutoff:
+                counts["too_old"] += 1
+                continue
 
-                articles.append({
-                    "title": title.strip(),
-                    "summary": clean_summary(summary),
-                    "url": link,
-                    "source": source["name"],
-                    "published_at": published.isoformat()
-                })
+            articles.append({
+                "title": title.strip(),
+                "summary": clean_summary(summary),
+                "url": link,
+                "source": source["name"],
+                "published_at": published.isoformat()
+            })
+    return articles
 
-    except Exception as ex:
-        failed_feeds.append({"source": source["name"], "error": str(ex)})
+def canonicalize(articles):
+    """Tracking params / syndication variants of the same link collapse to one ID."""
+    unique = {}
+    for a in articles:
+        a["url"] = canonical_url(a["url"])
+        a["id"] = article_id(a["url"])
+        unique.setdefault(a["id"], a)
+    return list(unique.values())
 
-# ============================
-# SAVE RAW DATA
-# ============================
-RAW_NEWS_FILE.write_text(json.dumps(articles, indent=2), encoding="utf-8")
-FAILED_FEEDS_FILE.write_text(json.dumps(failed_feeds, indent=2), encoding="utf-8")
+def fetch_articles(now=None, window_hours=WINDOW_HOURS, sources=None):
+    """
+    Fetch every source and keep articles from the `window_hours` before `now`.
+    Returns (articles, failed_feeds, counts).
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(hours=window_hours)
 
-# ============================
-# UPDATE ARCHIVE (LIST)
-# ============================
-new_urls = 0
-for a in articles:
-    if a["url"] not in archived_set:
-        archived_set.add(a["url"])
-        archived_urls.append(a["url"])
-        new_urls += 1
+    articles = []
+    failed_feeds = []
+    counts = {"too_old": 0, "no_date": 0, "duplicate_link": 0}
 
-# keep last 500 URLs max
-archived_urls = archived_urls[-500:]
+    for source in sources or SOURCES:
+        try:
+            socket.setdefaulttimeout(10)
+            with pipeline_metrics.span("network"):
+                resp = requests.get(source["rss"], timeout=10, headers={"User-Agent": feedparser.USER_AGENT})
+            pipeline_metrics.incr("bytes_fetched", len(resp.content))
+            articles.extend(parse_feed(source, resp.content, cutoff, counts))
 
-SENT_URLS_FILE.write_text(
-    json.dumps(archived_urls, indent=2),
-    encoding="utf-8"
-)
+        except Exception as ex:
+            pipeline_metrics.incr("feeds_failed")
+            failed_feeds.append({"source": source["name"], "error": str(ex)})
+
+    unique = canonicalize(articles)
+    counts["duplicate_link"] = len(articles) - len(unique)
+    return unique, failed_feeds, counts
 
 # ============================
-# REPORT
+# MAIN
 # ============================
-print("===================================")
-print(f"Fresh articles fetched: {len(articles)}")
-print(f"New URLs archived: {new_urls}")
-print(f"Dropped (too old): {too_old}")
-print(f"Dropped (no date): {no_date}")
-print("Fetch stage completed successfully.")
\ No newline at end of file
+def main(now=None):
+    pipeline_metrics.start_stage("fetch_news")
+    DATA_DIR.mkdir(exist_ok=True)
+
+    articles, failed_feeds, counts = fetch_articles(now)
+
+    pipeline_metrics.incr("articles_out", len(articles))
+    pipeline_metrics.incr("dropped_duplicate_link", counts["duplicate_link"])
+    pipeline_metrics.incr("dropped_too_old", counts["too_old"])
+    pipeline_metrics.incr("dropped_no_date", counts["no_date"])
+
+    # ----------------------------
+    # SAVE RAW DATA
+    # ----------------------------
+    RAW_NEWS_FILE.write_text(json.dumps(articles, indent=2), encoding="utf-8")
+    FAILED_FEEDS_FILE.write_text(json.dumps(failed_feeds, indent=2), encoding="utf-8")
+
+    # ----------------------------
+    # UPDATE ARCHIVE (LIST)
+    # ----------------------------
+    archived_urls = load_archived_urls()
+    archived_set = set(archived_urls)
+    new_urls = 0
+    for a in articles:
+        if a["url"] not in archived_set:
+            archived_set.add(a["url"])
+            archived_urls.append(a["url"])
+            new_urls += 1
+
+    # keep last 500 URLs max
+    archived_urls = archived_urls[-500:]
+
+    staging.atomic_write_text(SENT_URLS_FILE, json.dumps(archived_urls, indent=2))
+
+    # ----------------------------
+    # REPORT
+    # ----------------------------
+    print("===================================")
+    print(f"Fresh articles fetched: {len(articles)}")
+    print(f"New URLs archived: {new_urls}")
+    print(f"Dropped (too old): {counts['too_old']}")
+    print(f"Dropped (no date): {counts['no_date']}")
+    print(f"Dropped (duplicate link): {counts['duplicate_link']}")
+    print("Fetch stage completed successfully.")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,12 @@ import json
 from pathlib import Path
 from datetime import datetime
 
+import pipeline_metrics
+import staging
+import topic_tracker
+import vector_archive
+from canonical import canonical_url, ensure_id
+
 # ============================
 # PATH CONFIGURATION
 # ============================
@@ -9,7 +15,7 @@ PROJECT_ROOT = Path(__file__).resolve().parent
 TOP_NEWS_FILE = PROJECT_ROOT / "data" / "top_news.json"
 ENRICHED_FILE = PROJECT_ROOT / "data" / "enriched_summaries.json"
 SENT_URLS_FILE = PROJECT_ROOT / "data" / "sent_urls.json"
-SITE_DATA_DIR = PROJECT_ROOT / "docs" / "data"
+SITE_DATA_DIR = staging.SITE_DATA_DIR
 SITE_JSON_OUTPUT = SITE_DATA_DIR / "daily_brief.json"
 
 # ============================
@@ -21,10 +27,63 @@ def safe(value, fallback):
         return fallback
     return value
 
+def format_article(rank, story, enriched_story):
+    """Site/email shape for one story. Stories without enrichment are labelled as archive picks."""
+    original_title = story.get("title", "").strip()
+    is_backup = enriched_story is None
+
+    # Summary Recovery Logic: Prioritize AI-enriched text
+    summary_text = safe(
+        enriched_story.get("what_happened") if enriched_story else None,
+        story.get("summary", "No summary available.")
+    )
+
+    return {
+        "id": ensure_id(story),
+        "rank": rank,
+        "title": f"[Archive] {original_title}" if is_backup else original_title,
+        "summary": summary_text,
+        "technical_takeaway": safe(
+            enriched_story.get("technical_angle") if enriched_story else None,
+            "Key technical reference from archive."
+        ),
+        "primary_risk": safe(
+            enriched_story.get("primary_risk") if enriched_story else None,
+            "Standard implementation risks apply."
+        ),
+        "primary_opportunity": safe(
+            enriched_story.get("primary_opportunity") if enriched_story else None,
+            "Incremental framework gains."
+        ),
+        "source": story.get("source", "Unknown"),
+        "url": story.get("url", "#")
+    }
+
+def keep_timestamp(payload, path):
+    """Reuses the timestamp of the brief at `path` when nothing else changed, so a no-op run rewrites nothing."""
+    try:
+        previous = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return payload
+    if isinstance(previous, dict) and {**previous, "timestamp": payload["timestamp"]} == payload:
+        payload["timestamp"] = previous["timestamp"]
+    return payload
+
+def build_payload(final_articles, now=None):
+    now = now or datetime.now()
+    return {
+        "date": now.strftime("%B %d, %Y"),
+        "timestamp": now.isoformat(),
+        "is_archive_run": any("[Archive]" in a["title"] for a in final_articles),
+        "total_stories": len(final_articles),
+        "top_stories": final_articles
+    }
+
 # ============================
 # MAIN LOGIC
 # ============================
 def main():
+    pipeline_metrics.start_stage("format_brief")
     SITE_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
     if not TOP_NEWS_FILE.exists():
@@ -39,45 +98,18 @@ def main():
         with open(ENRICHED_FILE, "r", encoding="utf-8") as f:
             try:
                 enriched_data = json.load(f)
-                enriched_map = {a.get("title", "").strip(): a for a in enriched_data}
+                enriched_map = {ensure_id(a): a for a in enriched_data}
             except:
                 enriched_map = {}
 
+    pipeline_metrics.incr("articles_in", len(top_news))
     final_articles = []
     newly_sent_urls = []
 
     for i, story in enumerate(top_news, start=1):
-        original_title = story.get("title", "").strip()
-        enriched_story = enriched_map.get(original_title)
-        is_backup = enriched_story is None
-        
-        # Summary Recovery Logic: Prioritize AI-enriched text
-        summary_text = safe(
-            enriched_story.get("what_happened") if enriched_story else None,
-            story.get("summary", "No summary available.")
-        )
-
-        final_article = {
-            "rank": i,
-            "title": f"[Archive] {original_title}" if is_backup else original_title,
-            "summary": summary_text,
-            "technical_takeaway": safe(
-                enriched_story.get("technical_angle") if enriched_story else None,
-                "Key technical reference from archive."
-            ),
-            "primary_risk": safe(
-                enriched_story.get("primary_risk") if enriched_story else None,
-                "Standard implementation risks apply."
-            ),
-            "primary_opportunity": safe(
-                enriched_story.get("primary_opportunity") if enriched_story else None,
-                "Incremental framework gains."
-            ),
-            "source": story.get("source", "Unknown"),
-            "url": story.get("url", "#")
-        }
-        final_articles.append(final_article)
-        newly_sent_urls.append(story.get("url", "#"))
+        enriched_story = enriched_map.get(ensure_id(story))
+        final_articles.append(format_article(i, story, enriched_story))
+        newly_sent_urls.append(canonical_url(story.get("url", "#")))
 
     # ----------------------------
     # MEMORY UPDATE (FIXED TYPE ERROR)
@@ -95,25 +127,26 @@ def main():
             except: 
                 existing_sent = []
     
-    # Combine lists and keep unique URLs (limit to last 200)
-    updated_sent = list(set(existing_sent + newly_sent_urls))[-200:]
-    with open(SENT_URLS_FILE, "w", encoding="utf-8") as f:
-        json.dump(updated_sent, f, indent=2)
+    # Combine lists and keep unique URLs (limit to last 200). Insertion order, not
+    # set order: an unchanged list must serialize identically or git sees a change
+    updated_sent = list(dict.fromkeys(existing_sent + newly_sent_urls))[-200:]
+    staging.atomic_write_text(SENT_URLS_FILE, json.dumps(updated_sent, indent=2))
 
     # ----------------------------
     # CREATE FINAL JSON PAYLOAD
     # ----------------------------
-    site_payload = {
-        "date": datetime.now().strftime("%B %d, %Y"),
-        "timestamp": datetime.now().isoformat(),
-        "is_archive_run": any("[Archive]" in a["title"] for a in final_articles),
-        "total_stories": len(final_articles),
-        "top_stories": final_articles
-    }
+    related = vector_archive.load_related()
+    for article in final_articles:
+        article["related"] = related.get(article["id"], [])
+
+    site_payload = build_payload(final_articles)
+    site_payload["rising_topics"] = topic_tracker.load_rising_topics()
+    keep_timestamp(site_payload, SITE_JSON_OUTPUT)
 
     with open(SITE_JSON_OUTPUT, "w", encoding="utf-8") as f:
         json.dump(site_payload, f, indent=2, ensure_ascii=False)
     
+    pipeline_metrics.incr("articles_out", len(final_articles))
     print(f" Success: Daily brief JSON created at {SITE_JSON_OUTPUT}")
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+"""
+Persistent glossary behind jargon_buster: every term ever explained, plus an
+embedding index over term names and definitions, so a term seen again (or
+under another spelling, e.g. "Mixture of Experts" for "MoE") reuses its
+entry instead of costing a new LLM generation.
+
+data/glossary.json holds the entries, data/glossary_embeddings.npy the
+aligned (n, 2, dim) name / definition vectors. Both are saved through
+staging.deferred(), so a failed run's edits are dropped. The site copy is
+docs/data/glossary.json (in the run's staged site, see staging.py); it only
+changes when an entry does.
+"""
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+import publish
+import staging
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+GLOSSARY_FILE = PROJECT_ROOT / "data" / "glossary.json"
+EMBEDDINGS_FILE = PROJECT_ROOT / "data" / "glossary_embeddings.npy"
+SITE_GLOSSARY_FILE = staging.SITE_DATA_DIR / "glossary.json"
+
+NAME_MATCH_THRESHOLD = 0.85        # cosine vs. an existing term name
+DEFINITION_MATCH_THRESHOLD = 0.80  # cosine vs. an existing "term: definition"
+STALE_DAYS = 180                   # Entries older than this are regenerated when they come up again
+
+ENTRY_FIELDS = ["term", "definition", "analogy", "business_value"]
+
+ACRONYM = re.compile(r"[A-Za-z0-9-]{2,12}")
+
+def normalize(term):
+    return re.sub(r"[^a-z0-9]+", " ", (term or "").lower()).strip()
+
+def is_acronym(term):
+    """'RLHF', 'LoRA', 'GPT-4': one short word with at least two capitals."""
+    term = (term or "").strip()
+    return bool(ACRONYM.fullmatch(term)) and sum(c.isupper() for c in term) >= 2
+
+class Glossary:
+    def __init__(self, path=GLOSSARY_FILE, embeddings_path=EMBEDDINGS_FILE):
+        self.path = path
+        self.embeddings_path = embeddings_path
+        self.entries = []
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                self.entries = []
+
+        self.embeddings = None
+        if embeddings_path.exists():
+            vectors = np.load(embeddings_path)
+            if len(vectors) == len(self.entries):
+                self.embeddings = vectors
+
+        self.keys = {}
+        for i, entry in enumerate(self.entries):
+            for name in [entry["term"]] + entry.get("aliases", []):
+                self.keys[normalize(name)] = i
+        self._model = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ----------------------------
+    # Embeddings
+    # ----------------------------
+    def model(self):
+        if self._model is None:
+            import ai_deduplicate  # heavy (sentence-transformers); only loaded when needed
+            self._model = ai_deduplicate.load_model()
+        return self._model
+
+    def _embed(self, texts):
+        import ai_deduplicate
+        return ai_deduplicate.embed_texts(self.model(), texts)
+
+    def _entry_vectors(self, entries):
+        names = self._embed([e["term"] for e in entries])
+        definitions = self._embed([f"{e['term']}: {e['definition']}" for e in entries])
+        return np.stack([names, definitions], axis=1)
+
+    def _ensure_embeddings(self):
+        if self.entries and (self.embeddings is None or len(self.embeddings) != len(self.entries)):
+            self.embeddings = self._entry_vectors(self.entries)
+
+    # ----------------------------
+    # Lookup / update
+    # ----------------------------
+    def lookup(self, term):
+        """Index of the entry for `term` (exact name/alias first, then nearest neighbour), or None."""
+        key = normalize(term)
+        if key in self.keys:
+            return self.keys[key]
+        if not self.entries:
+            return None
+
+        self._ensure_embeddings()
+        query = self._embed([term])[0]
+        scores = self.embeddings @ query                  # (n, 2): name, definition
+        if is_acronym(term):
+            # Related acronyms (RLHF / RLAIF, LoRA / QLoRA) embed close together but
+            # are different terms; an acronym only maps onto an entry known by a full name
+            for i, entry in enumerate(self.entries):
+                if any(is_acronym(name) for name in [entry["term"]] + entry.get("aliases", [])):
+                    scores[i] = -1.0
+        best = int(np.argmax(scores.max(axis=1)))
+        if scores[best, 0] >= NAME_MATCH_THRESHOLD or scores[best, 1] >= DEFINITION_MATCH_THRESHOLD:
+            self._add_alias(best, term)
+            return best
+        return None
+
+    def _add_alias(self, index, name):
+        entry = self.entries[index]
+        if normalize(name) != normalize(entry["term"]) and name not in entry.setdefault("aliases", []):
+            entry["aliases"].append(name)
+        self.keys[normalize(name)] = index
+
+    def is_stale(self, index):
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=STALE_DAYS)).isoformat()
+        return self.entries[index].get("updated_at", "") < cutoff
+
+    def touch(self, index):
+        """Counts the days a term came up (once per day, so a same-day re-run changes nothing)."""
+        entry = self.entries[index]
+        today = datetime.now(timezone.utc).date().isoformat()
+        if entry.get("last_seen") != today:
+            entry["seen_count"] = entry.get("seen_count", 0) + 1
+            entry["last_seen"] = today
+
+    def upsert(self, item, alias=None):
+        """Add or refresh an entry from an LLM item. Returns its index."""
+        now = datetime.now(timezone.utc).isoformat()
+        fields = {f: item.get(f, "") for f in ENTRY_FIELDS}
+        index = self.keys.get(normalize(fields["term"]))
+        if index is None and alias:
+            index = self.keys.get(normalize(alias))
+
+        if index is None:
+            self._ensure_embeddings()
+            self.entries.append({**fields, "aliases": [], "first_seen": now[:10], "updated_at": now, "seen_count": 0})
+            index = len(self.entries) - 1
+            self.keys[normalize(fields["term"])] = index
+            vectors = self._entry_vectors([self.entries[index]])
+            self.embeddings = vectors if self.embeddings is None else np.concatenate([self.embeddings, vectors])
+        else:
+            self.entries[index].update(fields, updated_at=now)
+            if self.embeddings is not None and len(self.embeddings) == len(self.entries):
+                self.embeddings[index] = self._entry_vectors([self.entries[index]])[0]
+
+        if alias:
+            self._add_alias(index, alias)
+        return index
+
+    def card(self, index):
+        return {f: self.entries[index].get(f, "") for f in ENTRY_FIELDS}
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def save(self):
+        """Writes the entries and vectors; inside a pipeline run they only land if it publishes."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        staging.atomic_write_text(
+            staging.deferred(self.path), json.dumps(self.entries, indent=2, ensure_ascii=False)
+        )
+        if self.embeddings is not None and len(self.embeddings) == len(self.entries):
+            # A file object: np.save would append .npy to the .staged name
+            with open(staging.deferred(self.embeddings_path), "wb") as f:
+                np.save(f, self.embeddings.astype("float32"))
+
+    def publish(self, path=SITE_GLOSSARY_FILE):
+        """Writes the site copy unless it is unchanged. Returns True when written."""
+        terms = sorted(
+            ({**self.card(i), "first_seen": e.get("first_seen"), "seen_count": e.get("seen_count", 0)}
+             for i, e in enumerate(self.entries)),
+            key=lambda t: t["term"].lower()
+        )
+        newest = max((e.get("updated_at", "") for e in self.entries), default="")
+        last_updated = datetime.fromisoformat(newest).strftime("%B %d, %Y") if newest else ""
+        body = json.dumps({
+            "last_updated": last_updated,
+            "count": len(terms),
+            "terms": terms
+        }, indent=2, ensure_ascii=False)
+        return publish.write_if_changed(path, body.encode("utf-8"))
@@ -1,81 +1,127 @@
 import os
 import json
-import time
-import random
-import sys
 import re
-from google import genai
+import sys
+from collections import Counter
 from datetime import datetime
 
+import llm_client
+import llm_schema
+import pipeline_metrics
+import staging
+from glossary import Glossary, normalize
+
 # --- CONFIGURATION ---
 INPUT_FILE = "data/deduped_news.json"
-OUTPUT_JSON = "docs/data/jargon_buster.json"
+OUTPUT_JSON = str(staging.SITE_DATA_DIR / "jargon_buster.json")
+DAILY_TERMS = 3
+
+# Multi-word jargon that a capitalisation rule cannot spot
+SEED_TERMS = [
+    "mixture of experts", "retrieval-augmented generation", "agentic", "ai agent", "fine-tuning",
+    "quantization", "distillation", "context window", "chain-of-thought", "reasoning model",
+    "speculative decoding", "kv cache", "diffusion model", "multimodal", "vector database",
+    "embedding", "hallucination", "reinforcement learning", "synthetic data", "small language model",
+    "world model", "test-time compute", "tokenizer", "guardrails", "prompt injection", "red teaming",
+    "open weights", "inference", "benchmark contamination", "model collapse"
+]
+# Short capitalised tokens such as RAG, MoE, LoRA, RLHF, GPU
+ACRONYM_RE = re.compile(r"\b[A-Z][A-Za-z0-9]{1,5}\b")
+NOT_JARGON = {
+    "AI", "CEO", "CTO", "CFO", "US", "UK", "EU", "USA", "IT", "PR", "TV", "PC", "OK", "AM", "PM",
+    "IBM", "AMD", "NVIDIA", "AWS", "SEC", "FTC", "MIT", "IPO", "VC", "HR", "NEW", "THE", "AN", "II"
+}
+
+# Model Pool to distribute load and bypass 'Daily Quota' blocks.
+# The router orders it by observed latency / errors and hedges slow calls.
+MODEL_POOL = [
+    "gemini-3-flash-preview", 
+    "gemini-1.5-flash", 
+    "gemini-2.0-flash"
+]
+router = llm_client.ModelRouter(MODEL_POOL)
 
 def call_gemini_with_retry(prompt, max_retries=3):
     """
-    Enhanced failover logic: Tries multiple models to bypass individual model quotas.
+    Enhanced failover logic: races the model pool (best model first, hedged
+    after its p95) and keeps the first response with usable terms. Fenced or
+    truncated replies are repaired locally and keep their valid terms.
     """
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         print("❌ Error: GEMINI_API_KEY not found.")
         return None
 
-    client = genai.Client(api_key=api_key)
-    
-    # Model Pool to distribute load and bypass 'Daily Quota' blocks
-    model_pool = [
-        "gemini-3-flash-preview", 
-        "gemini-1.5-flash", 
-        "gemini-2.0-flash"
-    ]
-    
-    for model_name in model_pool:
-        print(f"🤖 Attempting Jargon generation with: {model_name}")
-        for attempt in range(max_retries):
-            try:
-                response = client.models.generate_content(
-                    model=model_name,
-                    contents=prompt
-                )
-                
-                raw_text = response.text.strip()
-                json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-                
-                if json_match:
-                    return json.loads(json_match.group(0))
-                
-            except Exception as e:
-                error_msg = str(e)
-                if "429" in error_msg:
-                    sleep_time = (20 * (attempt + 1)) + random.uniform(2, 5)
-                    print(f"⚠️ {model_name} Quota Hit. Retrying in {sleep_time:.2f}s...")
-                    time.sleep(sleep_time)
-                else:
-                    print(f"❌ {model_name} Error: {error_msg}")
-                    break # Skip to next model in pool
-    return None
-
-def load_deduped_data():
+    print(f"🤖 Jargon generation model order: {', '.join(router.ranked())}")
+    return router.generate(prompt, max_rounds=max_retries, schema=llm_schema.JARGON)
+
+def load_articles():
     try:
         if not os.path.exists(INPUT_FILE):
-            return "General AI advancements and LLMs."
-            
+            return []
         with open(INPUT_FILE, "r", encoding="utf-8") as f:
-            articles = json.load(f)
-        
-        if not articles:
-            return "General AI advancements."
-
-        combined_text = ""
-        # Send a concentrated slice of news to keep prompt high-quality
-        for art in articles[:12]:
-            combined_text += f"Title: {art.get('title', '')}\nSummary: {art.get('summary', '')}\n\n"
-        return combined_text
+            return json.load(f)
     except Exception as e:
         print(f"File Loading Error: {e}")
-        return None
+        return []
+
+def load_deduped_data(articles):
+    if not articles:
+        return "General AI advancements and LLMs."
+
+    combined_text = ""
+    # Send a concentrated slice of news to keep prompt high-quality
+    for art in articles[:12]:
+        combined_text += f"Title: {art.get('title', '')}\nSummary: {art.get('summary', '')}\n\n"
+    return combined_text
+
+# ============================
+# CANDIDATE TERMS (no LLM)
+# ============================
+def is_acronym(token):
+    upper = sum(c.isupper() for c in token)
+    return upper >= 2 and len(token) - upper <= 2 and token.upper() not in NOT_JARGON
+
+def extract_candidates(articles):
+    """Jargon-looking terms in today's news, most frequent first."""
+    counts = Counter()
+    surface = {}
+    for art in articles:
+        text = f"{art.get('title', '')} {art.get('summary', '')}"
+        lowered = text.lower()
+        found = {t for t in SEED_TERMS if t in lowered}
+        # "LLMs" and "LLM" are the same term
+        found.update(re.sub(r"(?<=[A-Z])s$", "", t) for t in ACRONYM_RE.findall(text) if is_acronym(t))
+        for term in found:
+            key = normalize(term)
+            counts[key] += 1
+            surface.setdefault(key, term)
+    # A lone acronym is often a product or company name; seed terms count from one mention
+    return [
+        surface[key] for key, n in counts.most_common()
+        if n >= 2 or surface[key] in SEED_TERMS
+    ]
+
+def term_context(term, articles, limit=2):
+    key = term.lower()
+    snippets = [
+        f"Title: {a.get('title', '')}\nSummary: {a.get('summary', '')}"
+        for a in articles if key in f"{a.get('title', '')} {a.get('summary', '')}".lower()
+    ]
+    return "\n\n".join(snippets[:limit])
+
+# ============================
+# LLM
+# ============================
+JARGON_INSTRUCTIONS = """
+    For each term, provide:
+    1. A 'Deep Dive' definition (2-3 sentences) that explains the mechanics.
+    2. A clever Car OR Kitchen analogy to make it relatable.
+    3. A 'Business Value' or 'CEO Insight' explaining why this matters for the bottom line.
+"""
 
 def process_jargon(text):
+    """Fallback when no candidate terms were found: let the model pick 3 terms itself."""
     if not text:
         return None
         
@@ -85,12 +131,7 @@ def process_jargon(text):
     prompt = f"""
     You are an AI Expert Educator for a high-end technical executive brief. 
     Identify 3 complex technical AI terms or trends from the news below. 
-    
-    For each term, provide:
-    1. A 'Deep Dive' definition (2-3 sentences) that explains the mechanics.
-    2. A clever Car OR Kitchen analogy to make it relatable.
-    3. A 'Business Value' or 'CEO Insight' explaining why this matters for the bottom line.
-
+    {JARGON_INSTRUCTIONS}
     Context:
     ---
     {text}
@@ -112,19 +153,90 @@ def process_jargon(text):
     """
     return call_gemini_with_retry(prompt)
 
+def define_terms(terms, articles):
+    """One request covering only the terms missing from (or stale in) the glossary."""
+    context = "\n---\n".join(f"[{t}]\n{term_context(t, articles)}" for t in terms)
+    prompt = f"""
+    You are an AI Expert Educator for a high-end technical executive brief. 
+    Explain these AI terms as they are used in today's news: {json.dumps(terms)}
+    Keep each "term" exactly as given (you may expand an acronym in the definition).
+    {JARGON_INSTRUCTIONS}
+    Context:
+    ---
+    {context}
+    ---
+    
+    Return ONLY valid JSON:
+    {{ "terms": [ {{ "term": "...", "definition": "...", "analogy": "...", "business_value": "..." }} ] }}
+    """
+    data = call_gemini_with_retry(prompt)
+    return data.get("terms", []) if data else []
+
+def build_daily_terms(articles, glossary):
+    """Returns glossary indices for today's terms, calling the LLM only for unknown / stale ones."""
+    picked, to_define = [], []
+    for term in extract_candidates(articles):
+        if len(picked) + len(to_define) >= DAILY_TERMS:
+            break
+        index = glossary.lookup(term)
+        if index is None or glossary.is_stale(index):
+            if normalize(term) not in {normalize(t) for t in to_define}:
+                to_define.append(term)
+        elif index not in picked:
+            picked.append(index)
+            pipeline_metrics.incr("glossary_hits")
+
+    print(f"📚 Glossary: {len(picked)} term(s) reused, {len(to_define)} to generate")
+    if to_define:
+        items = define_terms(to_define, articles)
+        by_key = {normalize(i.get("term")): i for i in items}
+        for position, term in enumerate(to_define):
+            item = by_key.get(normalize(term))
+            if item is None and len(items) == len(to_define):
+                item = items[position]  # the model renamed it ("RAG" -> "Retrieval-Augmented Generation")
+            if item is not None:
+                picked.append(glossary.upsert(item, alias=term))
+                pipeline_metrics.incr("glossary_generated")
+
+    if not picked:
+        # Nothing recognisable in today's news: original behaviour
+        jargon_data = process_jargon(load_deduped_data(articles))
+        for item in (jargon_data or {}).get("terms", []):
+            picked.append(glossary.upsert(item))
+            pipeline_metrics.incr("glossary_generated")
+
+    for index in picked:
+        glossary.touch(index)
+    return picked
+
 def main():
+    pipeline_metrics.start_stage("jargon_buster")
     print(f"🚀 Running Daily Jargon Update ({datetime.now().strftime('%A')})...")
     
-    news_content = load_deduped_data()
-    jargon_data = process_jargon(news_content)
+    articles = load_articles()
+    glossary = Glossary()
+    if not len(glossary) and os.path.exists(OUTPUT_JSON):
+        # First run with a glossary: keep the terms already published
+        with open(OUTPUT_JSON, "r", encoding="utf-8") as f:
+            for item in json.load(f).get("terms", []):
+                glossary.upsert(item)
+
+    picked = build_daily_terms(articles, glossary)
+    glossary.save()
+    glossary.publish()
     
-    if jargon_data:
+    if picked:
+        jargon_data = {
+            "last_updated": datetime.now().strftime('%B %d, %Y'),
+            "is_weekly_active": True,
+            "terms": [glossary.card(i) for i in picked]
+        }
         os.makedirs(os.path.dirname(OUTPUT_JSON), exist_ok=True)
         with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
             json.dump(jargon_data, f, indent=4)
-        print("✅ Jargon Library updated successfully.")
+        print(f"✅ Jargon Library updated successfully ({len(glossary)} terms in glossary).")
     else:
         print("⚠️ AI failed. Keeping existing data.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
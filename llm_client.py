@@ -0,0 +1,278 @@
+"""
+Shared Gemini access for the LLM stages: one client per process, a
+token-bucket rate limit shared by every thread, and 429 backoff.
+
+`ModelRouter` spreads one request over a pool of models: it tries the
+model with the best rolling latency / error record first and, if that
+model runs past its own p95, hedges to the next one and keeps whichever
+valid answer arrives first. Per-model history lives in data/model_stats.json.
+
+Replies are parsed through llm_schema.py, which repairs fenced / truncated
+JSON locally; a model is only asked again when that repair fails.
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from google import genai
+from google.genai import types
+
+import llm_schema
+import pipeline_metrics
+from rate_limit import RateLimiter
+
+# ============================
+# CONFIGURATION
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+MODEL_STATS_FILE = PROJECT_ROOT / "data" / "model_stats.json"
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_RPM", "10"))  # Free Tier friendly
+MAX_RETRIES = 3
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")  # e.g. a local network_standin.py
+
+limiter = RateLimiter(REQUESTS_PER_MINUTE / 60.0, burst=2)
+_client = None
+
+def new_client(**http_options):
+    """Every Gemini client is built here, so GEMINI_BASE_URL reaches all stages."""
+    if GEMINI_BASE_URL:
+        http_options.setdefault("base_url", GEMINI_BASE_URL)
+    return genai.Client(
+        api_key=os.getenv("GEMINI_API_KEY"),
+        http_options=types.HttpOptions(**http_options) if http_options else None
+    )
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = new_client()
+    return _client
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting prompts
+    return len(text) // 4 + 1
+
+def generate_json(prompt, model=DEFAULT_MODEL, max_retries=MAX_RETRIES, schema=None):
+    """
+    One structured-output request under the shared rate limit.
+    Returns the parsed JSON, or None when every attempt failed. A reply
+    that cannot be repaired locally is asked for again.
+    """
+    client = get_client()
+    for attempt in range(max_retries):
+        pipeline_metrics.incr("rate_limit_wait_s", limiter.acquire())
+        try:
+            with pipeline_metrics.span("gemini"):
+                response = client.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json"
+                    )
+                )
+            pipeline_metrics.record_llm_call(prompt, response)
+        except Exception as e:
+            if "429" in str(e) and attempt < max_retries - 1:
+                sleep_time = (10 * (attempt + 1)) + random.uniform(1, 3)
+                print(f"⚠️ {model} Quota Hit. Retrying in {sleep_time:.2f}s...")
+                pipeline_metrics.incr("retry_wait_s", sleep_time)
+                time.sleep(sleep_time)
+            else:
+                print(f"❌ {model} Error: {e}")
+                return None
+            continue
+
+        data = llm_schema.parse(response.text, schema)
+        if data is not None:
+            return data
+        print(f"⚠️ {model} returned unusable JSON.")
+        if attempt < max_retries - 1:
+            pipeline_metrics.incr("llm_recalls")
+    return None
+
+# ============================
+# MODEL ROUTER
+# ============================
+STATS_WINDOW = 50           # Most recent calls kept per model
+MIN_SAMPLES = 5             # Below this a model's p95 is not trusted yet
+UNKNOWN_LATENCY_S = 10.0    # Assumed p50 for a model without history
+DEFAULT_HEDGE_AFTER_S = 20.0
+MIN_HEDGE_AFTER_S = 2.0     # Never hedge sooner than this, however tight a model's p95 is
+ERROR_PENALTY = 4.0         # A 25% error rate doubles a model's expected latency
+ROUND_TIMEOUT_S = 120.0     # Hard cap on one pass over the pool; models still running count as failed
+
+class ModelStats:
+    """Rolling latency / outcome window per model, persisted between runs."""
+
+    def __init__(self, path=MODEL_STATS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.calls = {}   # model -> deque of [latency_s, ok]
+        if path.exists():
+            try:
+                for model, calls in json.loads(path.read_text(encoding="utf-8")).items():
+                    self.calls[model] = deque(calls, maxlen=STATS_WINDOW)
+            except (ValueError, TypeError):
+                self.calls = {}
+
+    def record(self, model, latency_s, ok):
+        with self.lock:
+            self.calls.setdefault(model, deque(maxlen=STATS_WINDOW)).append([round(latency_s, 3), ok])
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({m: list(c) for m, c in self.calls.items()}, indent=1), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def summary(self, model):
+        """(p50, p95, error_rate, samples) over the window; latencies of successful calls only."""
+        with self.lock:
+            calls = list(self.calls.get(model, ()))
+        latencies = [lat for lat, ok in calls if ok]
+        error_rate = sum(1 for _, ok in calls if not ok) / len(calls) if calls else 0.0
+        if not latencies:
+            return None, None, error_rate, len(calls)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        return float(p50), float(p95), error_rate, len(calls)
+
+class ModelRouter:
+    def __init__(self, models, stats=None):
+        self.models = list(models)
+        self.stats = stats or ModelStats()
+
+    def expected_latency(self, model):
+        p50, _, error_rate, _ = self.stats.summary(model)
+        return (p50 if p50 is not None else UNKNOWN_LATENCY_S) * (1 + ERROR_PENALTY * error_rate)
+
+    def ranked(self):
+        # sorted() is stable, so models without history keep the configured order
+        return sorted(self.models, key=self.expected_latency)
+
+    def hedge_after(self, model):
+        _, p95, _, samples = self.stats.summary(model)
+        if p95 is None or samples < MIN_SAMPLES:
+            return DEFAULT_HEDGE_AFTER_S
+        return max(p95, MIN_HEDGE_AFTER_S)
+
+    def _attempt(self, model, prompt, results, schema=None, abandoned=None):
+        started = time.perf_counter()
+        try:
+            with pipeline_metrics.span("gemini"):
+                response = get_client().models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(response_mime_type="application/json")
+                )
+            pipeline_metrics.record_llm_call(prompt, response)
+            data = llm_schema.parse(response.text, schema)
+            error = None
+        except Exception as e:
+            data, error = None, e
+        # An unparseable reply counts against the model like an error.
+        # A round that timed out already recorded this call as failed.
+        if abandoned is None or not abandoned.is_set():
+            self.stats.record(model, time.perf_counter() - started, data is not None)
+        results.put((model, data, error))
+
+    def _launch(self, model, prompt, results, schema=None, abandoned=None):
+        # Daemon threads: a losing request never keeps the stage process alive
+        threading.Thread(
+            target=self._attempt, args=(model, prompt, results, schema, abandoned), daemon=True
+        ).start()
+
+    def _race(self, prompt, validate, schema=None):
+        """One pass over the pool. Returns (data, saw_quota_error)."""
+        order = self.ranked()
+        results = queue.Queue()
+        in_flight = 0
+        next_model = 0
+        deadline = None
+        abandoned = threading.Event()
+        pending = []
+        quota_hit = False
+
+        def start(hedge):
+            nonlocal in_flight, next_model, deadline
+            model = order[next_model]
+            next_model += 1
+            in_flight += 1
+            pending.append(model)
+            deadline = time.monotonic() + self.hedge_after(model)
+            if hedge:
+                pipeline_metrics.incr("hedged_requests")
+                print(f"⏱️ {order[next_model - 2]} is past its p95. Hedging with {model}...")
+            self._launch(model, prompt, results, schema, abandoned)
+
+        pipeline_metrics.incr("rate_limit_wait_s", limiter.acquire())
+        round_deadline = time.monotonic() + ROUND_TIMEOUT_S
+        start(hedge=False)
+
+        while in_flight:
+            # Wait for the next hedge deadline while models are left, never past the round's
+            wake = min(deadline, round_deadline) if next_model < len(order) else round_deadline
+            try:
+                model, data, error = results.get(timeout=max(0.0, wake - time.monotonic()))
+            except queue.Empty:
+                if time.monotonic() >= round_deadline:
+                    abandoned.set()
+                    for model in pending:
+                        self.stats.record(model, ROUND_TIMEOUT_S, False)
+                    pipeline_metrics.incr("round_timeouts")
+                    print(f"❌ No answer from {', '.join(pending)} within {ROUND_TIMEOUT_S:.0f}s.")
+                    return None, quota_hit
+                # Hedges are optional work: only send one if the shared bucket has a token spare
+                if limiter.try_acquire():
+                    start(hedge=True)
+                else:
+                    deadline = time.monotonic() + 1.0
+                continue
+
+            in_flight -= 1
+            pending.remove(model)
+            if error is None and validate(data):
+                if model != order[0]:
+                    pipeline_metrics.incr("hedge_wins" if in_flight else "failovers")
+                return data, quota_hit
+
+            if error is not None:
+                quota_hit = quota_hit or "429" in str(error)
+                print(f"❌ {model} Error: {error}")
+            else:
+                print(f"⚠️ {model} returned an unusable response.")
+
+            # Fail over right away instead of waiting for the hedge deadline
+            if not in_flight and next_model < len(order):
+                if error is None:
+                    pipeline_metrics.incr("llm_recalls")
+                pipeline_metrics.incr("rate_limit_wait_s", limiter.acquire())
+                start(hedge=False)
+        return None, quota_hit
+
+    def generate(self, prompt, validate=lambda data: data is not None, max_rounds=MAX_RETRIES, schema=None):
+        """
+        Returns the first response (parsed JSON, checked against `schema` if
+        given) that passes `validate`, or None. A round that failed on quota
+        errors is retried after a backoff.
+        """
+        for attempt in range(max_rounds):
+            data, quota_hit = self._race(prompt, validate, schema)
+            if data is not None:
+                return data
+            if not quota_hit or attempt == max_rounds - 1:
+                break
+            sleep_time = (20 * (attempt + 1)) + random.uniform(2, 5)
+            print(f"⚠️ Every model hit its quota. Retrying in {sleep_time:.2f}s...")
+            pipeline_metrics.incr("retry_wait_s", sleep_time)
+            time.sleep(sleep_time)
+        return None
@@ -0,0 +1,210 @@
+"""
+Response schemas for the LLM stages, with a local JSON repair pass.
+
+`parse(text, schema)` turns a raw model reply into clean data without a
+second round trip whenever it can:
+
+1. plain `json.loads`;
+2. otherwise repair locally: strip Markdown fences, take the first balanced
+   JSON value, drop trailing commas and, for a reply cut off mid-way, drop
+   the unfinished element and close the open brackets;
+3. check every item against the schema's compiled validator and keep the
+   valid ones (partial acceptance).
+
+Only when nothing usable is left should the caller re-call the model.
+Counters: json_repaired (repair made a reply usable), schema_items_dropped,
+json_unrepairable / schema_rejected (reply unusable), llm_recalls (set by
+the callers when they do ask again).
+"""
+import json
+import re
+
+import pipeline_metrics
+
+FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+# ============================
+# REPAIR
+# ============================
+def _balanced(text):
+    """
+    First JSON value in `text`, minus trailing commas. If the value is cut
+    off, everything after its last complete element is dropped and the open
+    brackets are closed. Returns None when no element ever completed.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+
+    out, stack = [], []
+    in_string = escape = pending_comma = False
+    safe = None  # (len(out), open brackets) after the last complete element
+    for ch in text[min(starts):]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch.isspace():
+            continue
+        if pending_comma:
+            pending_comma = False
+            if ch not in "}]":
+                out.append(",")
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if not stack or ch != stack[-1]:
+                break
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return "".join(out)
+            safe = (len(out), list(stack))
+        elif ch == ",":
+            pending_comma = True
+            safe = (len(out), list(stack))
+        else:
+            out.append(ch)
+
+    if safe is None:
+        return None
+    length, still_open = safe
+    return "".join(out[:length]) + "".join(reversed(still_open))
+
+def load_json(text):
+    """Parsed JSON from a model reply, repaired locally if needed. Returns (data, repaired)."""
+    text = (text or "").strip()
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+
+    fenced = FENCE_RE.search(text)
+    body = _balanced(fenced.group(1) if fenced else text)
+    if body is None:
+        return None, False
+    try:
+        return json.loads(body), True
+    except ValueError:
+        return None, False
+
+# ============================
+# SCHEMAS
+# ============================
+def _coerce(value, kind):
+    """`value` as `kind` (str / int / float), or None. Numbers written as strings are accepted."""
+    if kind is str:
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            return None
+    if not isinstance(value, (int, float)):
+        return None
+    if kind is int:
+        return int(value) if float(value).is_integer() else None
+    return float(value)
+
+class Schema:
+    """
+    A reply holding a list of items under `container` (a bare list is
+    accepted too). `fields` maps field -> str / int / float; `required`
+    fields must be present and non-empty, other fields are optional.
+    """
+    def __init__(self, name, container, fields, required, min_items=1):
+        self.name = name
+        self.container = container
+        self.min_items = min_items
+        # Compiled once: a flat list of (field, coerce, required) checks per item
+        self._checks = [
+            (field, lambda v, kind=kind: _coerce(v, kind), field in required)
+            for field, kind in fields.items()
+        ]
+
+    def clean_item(self, item):
+        if not isinstance(item, dict):
+            return None
+        clean = {}
+        for field, coerce, required in self._checks:
+            value = coerce(item.get(field))
+            if value is None or value == "":
+                if required:
+                    return None
+                continue
+            clean[field] = value
+        return clean
+
+    def validate(self, data):
+        """Returns (clean data, dropped item count); clean data is None below `min_items` valid items."""
+        if isinstance(data, list):
+            data = {self.container: data}
+        items = data.get(self.container) if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return None, 0
+
+        valid = [c for c in map(self.clean_item, items) if c is not None]
+        if len(valid) < self.min_items:
+            return None, len(items)
+        return {**data, self.container: valid}, len(items) - len(valid)
+
+JARGON = Schema(
+    "jargon", "terms",
+    {"term": str, "definition": str, "analogy": str, "business_value": str},
+    required=["term", "definition"]
+)
+
+TOOLBOX = Schema(
+    "toolbox", "tools",
+    {"index": int, "Name": str, "Category": str, "Description": str, "Use_Case": str, "usefulness": float},
+    required=["index", "Name"]
+)
+
+LAB_REPORT = Schema(
+    "lab_report", "papers",
+    {"title": str, "innovation": str, "benchmarks": str, "use_case": str, "url": str},
+    required=["title", "innovation"]
+)
+
+# ============================
+# PARSE
+# ============================
+def parse(text, schema=None):
+    """
+    Clean data from a raw reply (schema-checked when `schema` is given), or
+    None if nothing usable survives repair.
+    """
+    data, repaired = load_json(text)
+    if data is None:
+        pipeline_metrics.incr("json_unrepairable")
+        return None
+    if schema is None:
+        if repaired:
+            pipeline_metrics.incr("json_repaired")
+        return data
+
+    clean, dropped = schema.validate(data)
+    if dropped:
+        pipeline_metrics.incr("schema_items_dropped", dropped)
+    if clean is None:
+        pipeline_metrics.incr("schema_rejected")
+        return None
+    if repaired:
+        pipeline_metrics.incr("json_repaired")
+    return clean
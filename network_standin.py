@@ -0,0 +1,397 @@
+"""
+Local stand-in for everything the pipeline reaches over the network:
+the RSS/Atom news feeds, the GitHub trending feed, article pages and the
+Gemini generateContent API. Used for offline runs, load tests and fault
+injection (slow feeds, malformed XML, huge feeds, 429 storms).
+
+    # Serve on localhost:8090, then point the pipeline at it
+    python network_standin.py --port 8090 --entries 500 --malformed-rate 0.2 --gemini-script 429,429,ok
+    FEED_BASE_URL=http://127.0.0.1:8090 GITHUB_TRENDING_URL=http://127.0.0.1:8090/github/trending.xml \\
+    GEMINI_BASE_URL=http://127.0.0.1:8090 GEMINI_API_KEY=standin python run_pipeline.py
+
+    # Run the whole pipeline N times against it in a scratch copy of the repo
+    python network_standin.py --loadtest 5 --entries 300 --feed-latency-ms 200 --quota-rate 0.3
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+
+# ============================
+# SYNTHETIC CONTENT
+# ============================
+SUBJECTS = ["OpenAI", "Google DeepMind", "Anthropic", "Meta", "Mistral", "NVIDIA", "Hugging Face", "Microsoft", "A startup", "Researchers"]
+ACTIONS = ["releases", "open-sources", "benchmarks", "raises funding for", "unveils", "publishes a paper on", "cuts the price of", "deploys"]
+OBJECTS = ["a reasoning model", "an inference chip", "a multimodal agent", "a coding assistant", "a RAG framework",
+           "a GPU cluster", "an AI safety policy", "a small language model", "a vector database", "a training dataset"]
+DETAILS = ["latency drops sharply on standard benchmarks", "enterprise customers get an API today",
+           "the weights are released under an open licence", "regulators are already asking questions",
+           "training used far less compute than rivals", "the results hold on long-context tasks"]
+
+def story(i):
+    """Deterministic story text for global story number i (same i => same story on every feed)."""
+    rng = random.Random(i)
+    title = f"{rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} {rng.choice(OBJECTS)} ({i})"
+    summary = " ".join(
+        f"{rng.choice(SUBJECTS)} says {rng.choice(DETAILS)}." for _ in range(rng.randint(2, 5))
+    )
+    return title, summary
+
+def feed_xml(base_url, slug, entries, atom, malformed, dup_rate, window_hours):
+    """Newest-first feed. Entries are spread evenly over `window_hours`."""
+    rng = random.Random(zlib.crc32(slug.encode()))
+    now = datetime.now(timezone.utc)
+    step = timedelta(hours=window_hours) / max(entries, 1)
+    offset = zlib.crc32(slug.encode()) % 100_000
+
+    items = []
+    for n in range(entries):
+        # A share of entries re-publish another feed's story (syndication)
+        i = rng.randrange(2000) if rng.random() < dup_rate else offset + n
+        title, summary = story(i)
+        published = now - step * n
+        link = f"{base_url}/articles/{i}.html?utm_source={slug}"
+        if atom:
+            items.append(
+                f"<entry><title>{escape(title)}</title><link rel=\"alternate\" href=\"{escape(link)}\"/>"
+                f"<id>{escape(link)}</id><updated>{published.isoformat()}</updated>"
+                f"<summary>{escape(summary)}</summary></entry>"
+            )
+        else:
+            items.append(
+                f"<item><title>{escape(title)}</title><link>{escape(link)}</link>"
+                f"<pubDate>{format_datetime(published)}</pubDate>"
+                f"<description>{escape(summary)}</description></item>"
+            )
+
+    if atom:
+        body = f"<?xml version=\"1.0\" encoding=\"utf-8\"?><feed xmlns=\"http://www.w3.org/2005/Atom\"><title>{slug}</title>{''.join(items)}</feed>"
+    else:
+        body = f"<?xml version=\"1.0\" encoding=\"utf-8\"?><rss version=\"2.0\"><channel><title>{slug}</title>{''.join(items)}</channel></rss>"
+
+    if malformed:
+        # Typical real-world breakage: raw ampersands, an unclosed tag and a truncated tail
+        body = body.replace("&amp;", "&").replace("</description>", "<b></description>", 1)
+        body = body[: int(len(body) * 0.9)]
+    return body.encode("utf-8")
+
+def article_html(i):
+    title, summary = story(i)
+    paragraphs = "".join(f"<p>{escape(summary)} Paragraph {k} adds more detail for the reader.</p>" for k in range(6))
+    return (f"<html><head><title>{escape(title)}</title></head><body><nav>Home | News</nav>"
+            f"<article><h1>{escape(title)}</h1>{paragraphs}</article><footer>(c) stand-in</footer></body></html>").encode("utf-8")
+
+def gemini_reply(prompt):
+    """A JSON answer in the shape each LLM stage asks for, picked from its prompt."""
+    if '"summaries"' in prompt:
+        indexes = [int(i) for i in re.findall(r"^\[(\d+)\] Title:", prompt, re.M)]
+        return {"summaries": [{
+            "index": i,
+            "technical_takeaway": "A stand-in takeaway about the release.",
+            "primary_risk": "Stand-in risk: results are not independently verified.",
+            "primary_opportunity": "Stand-in opportunity: cheaper inference for product teams.",
+            "who_should_care": ["ML Engineers", "CTOs"]
+        } for i in indexes]}
+    if '"terms"' in prompt:
+        # jargon_buster either names the terms to explain or lets the model pick three
+        asked = re.search(r"used in today's news: (\[.*?\])", prompt)
+        names = json.loads(asked.group(1)) if asked else [f"Stand-in term {k}" for k in range(3)]
+        return {"last_updated": datetime.now().strftime("%B %d, %Y"), "is_weekly_active": True, "terms": [
+            {"term": name, "definition": f"What {name} means.", "analogy": "Analogy.", "business_value": "Value."}
+            for name in names
+        ]}
+    if '"papers"' in prompt:
+        return {"last_updated": "Today", "papers": [
+            {"title": f"Stand-in paper {k}", "innovation": "..", "benchmarks": "..", "use_case": "..", "url": "#"}
+            for k in range(3)
+        ]}
+    if '"tools"' in prompt:
+        indexes = [int(i) for i in re.findall(r"^\s*\[(\d+)\] ", prompt, re.M)]
+        return {"tools": [
+            {"index": i, "Name": f"tool-{i}", "Category": "LLM", "Description": "..", "Use_Case": "..",
+             "usefulness": random.randint(0, 10)}
+            for i in indexes
+        ]}
+    return {}
+
+# ============================
+# SERVER
+# ============================
+class StandinStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}       # endpoint -> count
+        self.latencies = {}      # endpoint -> [seconds]
+        self.quota_errors = 0
+        self.gemini_calls = 0
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.latencies.setdefault(endpoint, []).append(seconds)
+
+    def next_gemini_call(self):
+        with self.lock:
+            self.gemini_calls += 1
+            return self.gemini_calls - 1
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep load tests quiet
+
+    def send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        started = time.perf_counter()
+        cfg = self.server.config
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        base_url = f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+        feed = re.fullmatch(r"/feeds/([\w-]+)\.xml", parts.path)
+        article = re.fullmatch(r"/articles/(\d+)\.html", parts.path)
+        if feed:
+            endpoint = "feed"
+            slug = feed.group(1)
+            time.sleep(float(query.get("latency_ms", cfg["feed_latency_ms"])) / 1000)
+            slug_rng = random.Random(zlib.crc32(slug.encode()) ^ int(time.time() // 60))
+            body = feed_xml(
+                base_url, slug,
+                entries=int(query.get("entries", cfg["entries"])),
+                atom=query.get("format", "atom" if slug_rng.random() < cfg["atom_share"] else "rss") == "atom",
+                malformed=query.get("malformed") == "1" or slug_rng.random() < cfg["malformed_rate"],
+                dup_rate=cfg["dup_rate"],
+                window_hours=cfg["window_hours"]
+            )
+            self.send(200, body, "application/rss+xml; charset=utf-8")
+        elif parts.path == "/github/trending.xml":
+            endpoint = "github"
+            body = feed_xml(base_url, "github", 15, False, False, 0.0, 24)
+            self.send(200, body, "application/rss+xml; charset=utf-8")
+        elif article:
+            endpoint = "article"
+            time.sleep(cfg["feed_latency_ms"] / 1000)
+            self.send(200, article_html(int(article.group(1))), "text/html; charset=utf-8")
+        else:
+            endpoint = "not_found"
+            self.send(404, b"not found", "text/plain")
+        self.server.stats.record(endpoint, time.perf_counter() - started)
+
+    def do_POST(self):
+        started = time.perf_counter()
+        cfg = self.server.config
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        match = re.fullmatch(r"/v1beta/models/([\w.\-]+):generateContent", urlsplit(self.path).path)
+        if not match:
+            self.send(404, b"not found", "text/plain")
+            self.server.stats.record("not_found", time.perf_counter() - started)
+            return
+
+        call = self.server.stats.next_gemini_call()
+        script = cfg["gemini_script"]
+        scripted = script[call % len(script)] if script else "ok"
+        model = match.group(1)
+        time.sleep(cfg["model_latency_ms"].get(model, cfg["gemini_latency_ms"]) / 1000)
+
+        if scripted == "429" or random.random() < cfg["quota_rate"]:
+            with self.server.stats.lock:
+                self.server.stats.quota_errors += 1
+            error = {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                               "status": "RESOURCE_EXHAUSTED"}}
+            self.send(429, json.dumps(error).encode("utf-8"), "application/json")
+            self.server.stats.record("gemini_429", time.perf_counter() - started)
+            return
+
+        prompt = " ".join(
+            part.get("text", "")
+            for content in payload.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        text = json.dumps(gemini_reply(prompt))
+        if scripted == "fenced":
+            text = f"Here is the JSON:\n```json\n{text}\n```"
+        elif scripted == "truncated":
+            text = text[:int(len(text) * 0.8)]
+        elif scripted == "garbage":
+            text = "Sorry, I can't help with that."
+        reply = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+                              "totalTokenCount": (len(prompt) + len(text)) // 4},
+            "modelVersion": model
+        }
+        self.send(200, json.dumps(reply).encode("utf-8"), "application/json")
+        self.server.stats.record("gemini", time.perf_counter() - started)
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=8090, **config):
+        super().__init__(("127.0.0.1", port), StandinHandler)
+        self.config = {
+            "entries": 50,
+            "feed_latency_ms": 0,
+            "malformed_rate": 0.0,
+            "atom_share": 0.3,
+            "dup_rate": 0.1,
+            "window_hours": 48,
+            "gemini_latency_ms": 0,
+            "model_latency_ms": {},
+            "gemini_script": [],
+            "quota_rate": 0.0,
+            **config
+        }
+        self.stats = StandinStats()
+
+def start_in_thread(port=0, **config):
+    """Start a stand-in on a free port (port=0). Returns the server; use server.server_address[1]."""
+    server = StandinServer(port, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ============================
+# LOAD TEST
+# ============================
+def percentiles(values):
+    if not values:
+        return "n/a"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50:.3f}s  p95 {p95:.3f}s  p99 {p99:.3f}s"
+
+def scratch_copy(dest):
+    """The pipeline writes into data/ and docs/data/; never load-test the real checkout."""
+    shutil.copytree(
+        PROJECT_ROOT, dest, dirs_exist_ok=True,
+        ignore=shutil.ignore_patterns(".git", "__pycache__", "extract_cache", "profiles", ".metrics", "run_metrics.jsonl",
+                                      ".staging", "pipeline.lock")
+    )
+
+def run_loadtest(runs, script, config):
+    server = start_in_thread(0, **config)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    env = {
+        **os.environ,
+        "FEED_BASE_URL": base_url,
+        "GITHUB_TRENDING_URL": f"{base_url}/github/trending.xml",
+        "GEMINI_BASE_URL": base_url,
+        "GEMINI_API_KEY": "standin",
+        "GEMINI_RPM": os.getenv("GEMINI_RPM", "6000"),
+        "PIPELINE_BREATHER_SCALE": "0"
+    }
+    env.pop("PIPELINE_METRICS_DIR", None)
+    env.pop("PIPELINE_SITE_DIR", None)
+
+    walls, records = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        scratch_copy(workdir)
+        metrics_file = workdir / "data" / "run_metrics.jsonl"
+
+        for n in range(runs):
+            started = time.perf_counter()
+            result = subprocess.run([sys.executable, script], cwd=workdir, env=env,
+                                    capture_output=True, text=True, encoding="utf-8", errors="replace")
+            walls.append(time.perf_counter() - started)
+            status = "ok" if result.returncode == 0 else f"exit {result.returncode}"
+            print(f"Run {n + 1}/{runs}: {walls[-1]:.2f}s ({status})")
+            if result.returncode != 0:
+                print(result.stdout[-1500:] + result.stderr[-1500:])
+
+        if metrics_file.exists():
+            records = [json.loads(line) for line in metrics_file.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    server.shutdown()
+
+    # Stage records come either merged per run (run_pipeline) or one per line (single stage)
+    stage_walls, fetched, retry_wait = {}, 0, 0.0
+    for rec in records:
+        stages = rec.get("stages") or {rec.get("stage"): rec}
+        for name, stage in stages.items():
+            stage_walls.setdefault(name, []).append(stage.get("wall_s", 0))
+            counters = stage.get("counters", {})
+            retry_wait += counters.get("retry_wait_s", 0)
+            if name == "fetch_news":
+                fetched += counters.get("articles_out", 0)
+
+    print("===================================")
+    print(f"Runs:              {runs} x {script}")
+    print(f"Run wall time:     {percentiles(walls)}")
+    print(f"Articles fetched:  {fetched} ({fetched / sum(walls):.1f} articles/s end to end)")
+    print(f"Client retry wait: {retry_wait:.1f}s")
+    for name, values in sorted(stage_walls.items()):
+        print(f"  {name:<22} {percentiles(values)}")
+    print("Stand-in requests:")
+    for endpoint, count in sorted(server.stats.requests.items()):
+        print(f"  {endpoint:<22} {count:>6}  {percentiles(server.stats.latencies[endpoint])}")
+    print(f"Gemini 429s served: {server.stats.quota_errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Local feed / Gemini stand-in for offline and load tests.")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--entries", type=int, default=50, help="Entries per news feed")
+    parser.add_argument("--feed-latency-ms", type=float, default=0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of feed responses with broken XML")
+    parser.add_argument("--atom-share", type=float, default=0.3, help="Fraction of feeds served as Atom")
+    parser.add_argument("--dup-rate", type=float, default=0.1, help="Fraction of entries syndicated across feeds")
+    parser.add_argument("--gemini-latency-ms", type=float, default=0)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=MS",
+                        help="Per-model latency override, e.g. gemini-3-flash-preview=8000 (repeatable)")
+    parser.add_argument("--gemini-script", default="", help="Comma-separated cycle of responses: ok, 429, fenced, truncated, garbage")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="Random fraction of Gemini calls answered with 429")
+    parser.add_argument("--loadtest", type=int, default=0, help="Run the pipeline N times against a private stand-in")
+    parser.add_argument("--script", default="run_pipeline.py", help="Entry point for --loadtest (e.g. fetch_news.py)")
+    args = parser.parse_args()
+
+    config = {
+        "entries": args.entries,
+        "feed_latency_ms": args.feed_latency_ms,
+        "malformed_rate": args.malformed_rate,
+        "atom_share": args.atom_share,
+        "dup_rate": args.dup_rate,
+        "gemini_latency_ms": args.gemini_latency_ms,
+        "model_latency_ms": {m: float(ms) for m, ms in (o.split("=", 1) for o in args.model_latency)},
+        "gemini_script": [s.strip() for s in args.gemini_script.split(",") if s.strip()],
+        "quota_rate": args.quota_rate
+    }
+
+    if args.loadtest:
+        run_loadtest(args.loadtest, args.script, config)
+        return
+
+    server = StandinServer(args.port, **config)
+    print(f"🧪 Network stand-in listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Served {sum(server.stats.requests.values())} request(s).")
+
+if __name__ == "__main__":
+    main()
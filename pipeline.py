@@ -0,0 +1,242 @@
+"""
+Date-parameterized brief builder and historical backfill.
+
+`build_brief(articles, embeddings, now)` runs dedup -> rank -> summarize/enrich
+-> format for one day, as of `now`, without reading or writing the pipeline's
+working files. The CLI replays it over a date range from a local article
+corpus, archives each day's brief (docs/data/archive/brief_<date>.<hash>.json)
+and renders its page (docs/archive/<date>.html):
+
+    python pipeline.py --start 2026-04-22 --end 2026-05-18 --workers 4
+    python pipeline.py --start 2026-05-01 --end 2026-05-07 --corpus old_raw_news.json --overwrite
+
+The corpus is encoded once in the parent (one model load); worker processes
+receive the vectors at start-up and only do the per-day work. Insights come
+from the shared summary cache (read-only, no LLM calls), everything else
+from enrich.py's local templates; cached page text is reused for ranking.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+import ai_deduplicate
+import enrich
+import format_brief
+import pipeline_metrics
+import publish
+import rank_news
+import render_site
+import staging
+import summarize
+from canonical import ensure_id
+from extract_articles import MAX_CANDIDATES, load_cached
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+DATA_DIR = PROJECT_ROOT / "data"
+
+# Every list the daily run leaves behind; together they cover the last few weeks
+DEFAULT_CORPUS = [
+    DATA_DIR / "raw_news.json",
+    DATA_DIR / "deduped_news.json",
+    DATA_DIR / "backlog.json",
+    DATA_DIR / "candidate_pool.json",
+]
+
+RUN_HOUR_UTC, RUN_MINUTE_UTC = 0, 30   # Daily cron time; a backfilled day is ranked as of this moment
+WINDOW_HOURS = 24
+
+# ============================
+# CORPUS
+# ============================
+def read_articles(path):
+    """A JSON list or JSON-lines file of articles (or backlog.json's entries)."""
+    text = Path(path).read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("entries", [])
+        return data if isinstance(data, list) else []
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def load_corpus(paths):
+    """Articles from `paths`, one per ID, with a parseable published_at."""
+    corpus = {}
+    for path in paths:
+        if not Path(path).exists():
+            continue
+        for a in read_articles(path):
+            try:
+                datetime.fromisoformat(a["published_at"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            a = {k: v for k, v in a.items() if k not in ("score", "archived_at")}
+            corpus.setdefault(ensure_id(a), a)
+    return list(corpus.values())
+
+def run_time(day):
+    return datetime(day.year, day.month, day.day, RUN_HOUR_UTC, RUN_MINUTE_UTC, tzinfo=timezone.utc)
+
+def load_insights():
+    """Summary cache without its TTL: a historical day may use insights of any age."""
+    if not summarize.CACHE_FILE.exists():
+        return {}
+    try:
+        return json.loads(summarize.CACHE_FILE.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+# ============================
+# ONE DAY
+# ============================
+def build_brief(articles, embeddings, now, insights=None):
+    """
+    Brief payload for the daily run at `now`, from `articles` (any time span)
+    and their aligned embeddings. Returns None when nothing was fresh.
+    """
+    insights = insights or {}
+    start = now - timedelta(hours=WINDOW_HOURS)
+    window = [
+        i for i, a in enumerate(articles)
+        if start <= datetime.fromisoformat(a["published_at"]) <= now
+    ]
+    if not window:
+        return None
+
+    # Same two-step dedup as ai_deduplicate.py, on precomputed vectors
+    window = [window[i] for i in ai_deduplicate.minhash_prefilter([articles[i] for i in window])]
+    kept = [window[i] for i in ai_deduplicate.deduplicate(embeddings[window])]
+    day_articles = [dict(articles[i]) for i in kept]
+
+    # Cached page text only, as extract_articles.py would have attached it
+    for a in sorted(day_articles, key=rank_news.score_article, reverse=True)[:MAX_CANDIDATES]:
+        cached = load_cached(a["url"])
+        if cached and cached.get("text"):
+            a["full_text"] = cached["text"]
+
+    fresh = rank_news.filter_fresh(day_articles, now)
+    selected, _ = rank_news.select_top(fresh)
+    if not selected:
+        return None
+
+    stories = []
+    for rank, story in enumerate(selected, start=1):
+        enriched = enrich.enrich(summarize.technical_summary(story, insights.get(ensure_id(story))))
+        stories.append(format_brief.format_article(rank, story, enriched))
+
+    payload = format_brief.build_payload(stories, now.replace(tzinfo=None))
+    payload["backfilled"] = True
+    return payload
+
+# ============================
+# PROCESS POOL
+# ============================
+_worker = {}
+
+def init_worker(articles, embeddings, insights):
+    _worker.update(articles=articles, embeddings=embeddings, insights=insights)
+
+def backfill_day(day, overwrite=False):
+    """Archives the brief for `day`. Returns (day, status, stories)."""
+    if any(publish.ARCHIVE_DIR.glob(f"brief_{day.isoformat()}*.json")) and not overwrite:
+        return day, "exists", 0
+
+    payload = build_brief(_worker["articles"], _worker["embeddings"], run_time(day), _worker["insights"])
+    if payload is None:
+        return day, "empty", 0
+
+    publish.archive_brief(day.isoformat(), payload)
+    return day, "written", payload["total_stories"]
+
+def date_range(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+def backfill(days, args):
+    pipeline_metrics.start_stage("backfill")
+    started = time.perf_counter()
+
+    with pipeline_metrics.span("load_corpus"):
+        articles = load_corpus(args.corpus or DEFAULT_CORPUS)
+        insights = load_insights()
+    print(f"📚 Corpus: {len(articles)} articles, {len(insights)} cached insights")
+    if not articles:
+        print("⚠️ Empty corpus. Nothing to backfill.")
+        return
+
+    with pipeline_metrics.span("load_model"):
+        model = ai_deduplicate.load_model()
+    with pipeline_metrics.span("encode"):
+        embeddings = ai_deduplicate.embed_articles(model, articles).astype(np.float32)
+    del model
+
+    publish.ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    counts = {"written": 0, "exists": 0, "empty": 0}
+    build_started = time.perf_counter()
+    with pipeline_metrics.span("build"):
+        with ProcessPoolExecutor(
+            max_workers=max(1, min(args.workers, len(days))),
+            initializer=init_worker,
+            initargs=(articles, embeddings, insights)
+        ) as executor:
+            futures = [executor.submit(backfill_day, day, args.overwrite) for day in days]
+            for future in futures:
+                day, status, stories = future.result()
+                counts[status] += 1
+                if status == "written":
+                    print(f"✅ {day}: {stories} stories")
+                elif status == "empty":
+                    print(f"⚠️ {day}: no fresh articles in the corpus")
+    build_seconds = time.perf_counter() - build_started
+
+    publish.refresh_site()
+    # The site is pre-rendered: a backfilled day needs its archive page too
+    pages, changed = render_site.render_archive()
+    pipeline_metrics.incr("pages_written", changed)
+    total_seconds = time.perf_counter() - started
+    for status, n in counts.items():
+        pipeline_metrics.incr(f"days_{status}", n)
+
+    print("===================================")
+    print(f"Days: {len(days)} (written {counts['written']}, already present {counts['exists']}, "
+          f"empty {counts['empty']})")
+    print(f"Archive pages: {pages} ({changed} rendered or updated)")
+    print(f"Throughput: {len(days) / build_seconds * 60:.1f} days/minute "
+          f"({len(days) / total_seconds * 60:.1f} including corpus encode)")
+
+# ============================
+# MAIN
+# ============================
+def main():
+    parser = argparse.ArgumentParser(description="Backfill archive briefs for a date range.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day, inclusive (default: --start)")
+    parser.add_argument("--corpus", nargs="*", type=Path, default=None,
+                        help="Article files (JSON list or JSON lines); default: the pipeline's data/ lists")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--overwrite", action="store_true", help="Rebuild days that already have a brief")
+    args = parser.parse_args()
+
+    days = date_range(args.start, args.end or args.start)
+    if not days:
+        print("ERROR: --end is before --start")
+        return
+
+    with staging.run_lock() as locked:
+        if not locked:
+            print("⚠️ A pipeline run holds the lock. Try the backfill again when it has finished.")
+            return
+        # Archive files are written atomically, straight into the live site
+        staging.recover()
+        backfill(days, args)
+
+if __name__ == "__main__":
+    main()
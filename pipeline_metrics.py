@@ -0,0 +1,185 @@
+"""
+Lightweight per-stage instrumentation shared by every pipeline script.
+
+Stages call `start_stage()` once, then use `span()` timers and `incr()`
+counters. On exit the stage record is written to $PIPELINE_METRICS_DIR
+(set by run_pipeline / daemon), which folds all stage records of one run
+into a single line of data/run_metrics.jsonl. A stage run by hand appends
+its own record directly. Once the file passes ~1 MB it is trimmed to the last
+MAX_RUN_RECORDS lines; it is runtime state (git-ignored, carried between CI
+runs by actions/cache).
+
+Profiling is opt-in: PIPELINE_PROFILE=cprofile (or pyinstrument) makes
+run_step launch each stage under the profiler, one dump per stage in
+data/profiles/<run_id>/.
+"""
+import atexit
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+DATA_DIR = PROJECT_ROOT / "data"
+RUN_METRICS_FILE = DATA_DIR / "run_metrics.jsonl"
+PROFILE_DIR = DATA_DIR / "profiles"
+MAX_RUN_RECORDS = 2000      # Oldest lines are dropped beyond this (years of daily runs)
+
+METRICS_DIR_ENV = "PIPELINE_METRICS_DIR"
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+PROFILE_ENV = "PIPELINE_PROFILE"
+
+# ============================
+# STAGE STATE
+# ============================
+_stage = {"name": None, "started": None, "spans": {}, "counters": {}}
+_lock = threading.Lock()  # stages update counters from worker threads
+
+def start_stage(name):
+    """Begin recording for this process. Flushed automatically at exit."""
+    if _stage["name"] is None:
+        atexit.register(flush)
+    _stage["name"] = name
+    _stage["started"] = time.perf_counter()
+
+@contextmanager
+def span(name):
+    """Accumulate wall time (seconds) under `name`. Re-entering the same name adds up."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        with _lock:
+            _stage["spans"][name] = _stage["spans"].get(name, 0.0) + elapsed
+
+def incr(name, value=1):
+    with _lock:
+        _stage["counters"][name] = _stage["counters"].get(name, 0) + value
+
+def record_llm_call(prompt, response=None):
+    """Count tokens sent to Gemini, from usage metadata when present, else a chars/4 estimate."""
+    usage = getattr(response, "usage_metadata", None)
+    tokens = getattr(usage, "prompt_token_count", None) if usage else None
+    incr("llm_calls")
+    incr("tokens_sent", tokens if tokens else len(prompt) // 4)
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def stage_record():
+    return {
+        "stage": _stage["name"],
+        "wall_s": round(time.perf_counter() - _stage["started"], 3),
+        "spans": {k: round(v, 3) for k, v in _stage["spans"].items()},
+        "counters": _stage["counters"],
+        "peak_mem_mb": peak_memory_mb()
+    }
+
+def flush():
+    if _stage["name"] is None:
+        return
+
+    record = stage_record()
+    metrics_dir = os.getenv(METRICS_DIR_ENV)
+    try:
+        if metrics_dir:
+            Path(metrics_dir).mkdir(parents=True, exist_ok=True)
+            (Path(metrics_dir) / f"{record['stage']}.json").write_text(json.dumps(record), encoding="utf-8")
+        else:
+            record["timestamp"] = datetime.now(timezone.utc).isoformat()
+            append_run_record(record)
+    except OSError as e:
+        print(f"[METRICS] Could not write metrics: {e}")
+    _stage["name"] = None
+
+def append_run_record(record):
+    RUN_METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(RUN_METRICS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        size = f.tell()
+    # Cheap size check first: only a file that may be over the limit is re-read
+    if size > MAX_RUN_RECORDS * 512:
+        lines = RUN_METRICS_FILE.read_text(encoding="utf-8").splitlines(keepends=True)
+        if len(lines) > MAX_RUN_RECORDS:
+            tmp = RUN_METRICS_FILE.with_suffix(".tmp")
+            tmp.write_text("".join(lines[-MAX_RUN_RECORDS:]), encoding="utf-8")
+            tmp.replace(RUN_METRICS_FILE)
+
+# ============================
+# RUN-LEVEL (orchestrator side)
+# ============================
+class RunRecorder:
+    """Used by run_pipeline / daemon: collects step timings and merges stage records."""
+
+    def __init__(self, mode="pipeline"):
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.steps = []
+        self.sleep_s = 0.0
+        self.metrics_dir = DATA_DIR / ".metrics" / self.run_id
+        os.environ[METRICS_DIR_ENV] = str(self.metrics_dir)
+        os.environ[RUN_ID_ENV] = self.run_id
+
+    def step(self, script, ok, wall_s):
+        self.steps.append({"script": script, "ok": ok, "wall_s": round(wall_s, 3)})
+
+    def sleep(self, seconds):
+        self.sleep_s += seconds
+        time.sleep(seconds)
+
+    def finish(self, status):
+        stages = {}
+        if self.metrics_dir.exists():
+            for path in sorted(self.metrics_dir.glob("*.json")):
+                try:
+                    rec = json.loads(path.read_text(encoding="utf-8"))
+                    stages[rec.pop("stage")] = rec
+                except (ValueError, KeyError):
+                    continue
+            shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+        record = {
+            "run_id": self.run_id,
+            "mode": self.mode,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "status": status,
+            "wall_s": round(time.perf_counter() - self.started, 3),
+            "sleep_s": round(self.sleep_s, 3),
+            "steps": self.steps,
+            "stages": stages,
+            "peak_mem_mb": max([s.get("peak_mem_mb") or 0 for s in stages.values()] or [0])
+        }
+        append_run_record(record)
+        os.environ.pop(METRICS_DIR_ENV, None)
+        print(f"📈 Run metrics appended to {RUN_METRICS_FILE.name} ({self.run_id})")
+        return record
+
+def profiler_command(script_path):
+    """Command prefix for PIPELINE_PROFILE=cprofile|pyinstrument, else None."""
+    mode = (os.getenv(PROFILE_ENV) or "").lower()
+    if mode not in ("cprofile", "pyinstrument"):
+        return None
+
+    out_dir = PROFILE_DIR / os.getenv(RUN_ID_ENV, "adhoc")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(script_path).stem
+    if mode == "cprofile":
+        return [sys.executable, "-m", "cProfile", "-o", str(out_dir / f"{stem}.prof"), str(script_path)]
+    return [sys.executable, "-m", "pyinstrument", "-r", "html", "-o", str(out_dir / f"{stem}.html"), str(script_path)]
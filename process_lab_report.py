@@ -1,12 +1,37 @@
+import hashlib
 import json
 import os
-import time  # For backoff
-from google import genai
-from google.genai import types, errors  # Added errors for specific catching
+import time
+from functools import lru_cache
+import numpy as np
+
+import ai_deduplicate
+import llm_client
+import llm_schema
+import pipeline_metrics
+import staging
+from canonical import ensure_id
 
 # --- CONFIG ---
 INPUT_FILE = "data/deduped_news.json"
-OUTPUT_FILE = "docs/data/lab_report.json"
+OUTPUT_FILE = str(staging.SITE_DATA_DIR / "lab_report.json")
+QUERY_VECTORS_FILE = "data/lab_query_vectors.npz"
+
+# --- TRIAGE ---
+TRIAGE_TOP_K = 8          # Papers whose abstracts reach the LLM
+MMR_LAMBDA = 0.7          # 1.0 = pure relevance, lower = more diverse picks
+ABSTRACT_CHARS = 700
+MODEL = "gemini-2.5-flash"
+
+# What "matters to an AI engineer" looks like; every paper is scored against the closest one
+RELEVANCE_QUERIES = [
+    "a new model architecture or training method that improves efficiency or accuracy",
+    "faster, cheaper inference: quantization, distillation, serving and hardware optimisation",
+    "open-source release of code, model weights or datasets that engineers can use",
+    "benchmarks and evaluation methodology for large language models",
+    "AI agents, tool use and retrieval-augmented generation systems",
+    "reliability, safety and robustness techniques for deployed AI systems",
+]
 
 def filter_research_papers():
     if not os.path.exists(INPUT_FILE):
@@ -16,29 +41,76 @@ def filter_research_papers():
         all_articles = json.load(f)
 
     research_sources = ["Arxiv AI", "Hugging Face Blog", "Microsoft Research"]
-    papers = [a for a in all_articles if a.get("source") in research_sources]
+    papers = [
+        a for a in all_articles
+        if a.get("source") in research_sources or "arxiv.org/" in (a.get("url") or "")
+    ]
     
     return papers
 
+# ============================
+# LOCAL TRIAGE (no LLM)
+# ============================
+@lru_cache(maxsize=1)
+def get_model():
+    # Only loaded when some paper (or the query set) has no cached vector
+    return ai_deduplicate.load_model()
+
+def query_vectors():
+    """Embedded RELEVANCE_QUERIES, cached on disk until the queries or the model change."""
+    key = hashlib.sha1(json.dumps([ai_deduplicate.MODEL_NAME] + RELEVANCE_QUERIES).encode()).hexdigest()
+    if os.path.exists(QUERY_VECTORS_FILE):
+        cached = np.load(QUERY_VECTORS_FILE)
+        if str(cached["key"]) == key:
+            return cached["vectors"]
+
+    vectors = ai_deduplicate.embed_texts(get_model(), RELEVANCE_QUERIES)
+    np.savez(QUERY_VECTORS_FILE, key=key, vectors=vectors)
+    return vectors
+
+def paper_vectors(papers):
+    """Reuse the vectors ai_deduplicate already computed; embed only papers it did not see."""
+    cached = ai_deduplicate.load_embeddings()
+    missing = [i for i, p in enumerate(papers) if ensure_id(p) not in cached]
+    pipeline_metrics.incr("embeddings_reused", len(papers) - len(missing))
+
+    fresh = {}
+    if missing:
+        vectors = ai_deduplicate.embed_articles(get_model(), [papers[i] for i in missing], show_progress_bar=False)
+        fresh = dict(zip(missing, vectors))
+    return np.stack([fresh[i] if i in fresh else cached[ensure_id(p)] for i, p in enumerate(papers)])
+
+def mmr_select(vectors, relevance, k, lam=MMR_LAMBDA):
+    """Maximal marginal relevance: each pick trades relevance against similarity to earlier picks."""
+    selected = [int(np.argmax(relevance))]
+    max_sim = vectors @ vectors[selected[0]]
+    while len(selected) < min(k, len(vectors)):
+        scores = lam * relevance - (1 - lam) * max_sim
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        max_sim = np.maximum(max_sim, vectors @ vectors[best])
+    return selected
+
+def triage_papers(papers, k=TRIAGE_TOP_K):
+    if len(papers) <= k:
+        return papers
+
+    with pipeline_metrics.span("triage"):
+        vectors = paper_vectors(papers)
+        relevance = (vectors @ query_vectors().T).max(axis=1)
+        picked = mmr_select(vectors, relevance, k)
+    return [papers[i] for i in picked]
+
 def analyze_papers_with_gemini(papers):
     if not papers:
         return None
 
     sample_text = ""
-    for p in papers[:10]:
-        sample_text += f"Title: {p['title']}\nAbstract: {p.get('summary', 'No abstract')}\nURL: {p['url']}\n---\n"
-
-    # Configure Client with built-in Retries for 503/429 errors
-    client = genai.Client(
-        api_key=os.getenv("GEMINI_API_KEY"),
-        http_options=types.HttpOptions(
-            retry_options=types.HttpRetryOptions(
-                attempts=3, 
-                http_status_codes=[429, 500, 502, 503, 504]
-            )
-        )
-    )
-    
+    for p in papers:
+        abstract = (p.get('summary') or 'No abstract')[:ABSTRACT_CHARS]
+        sample_text += f"Title: {p['title']}\nAbstract: {abstract}\nURL: {p['url']}\n---\n"
+
     prompt = f"""
     You are a Senior AI Research Scientist. Review these papers:
     {sample_text}
@@ -59,32 +131,29 @@ def analyze_papers_with_gemini(papers):
     }}
     """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type='application/json'
-            )
-        )
-        return json.loads(response.text)
-    except errors.ServerError as e:
-        print(f"⚠️ Gemini Server Error (503): {e}. High demand detected. Skipping Lab Report.")
-        return None
-    except Exception as e:
-        print(f"❌ Unexpected Error in Gemini Call: {e}")
-        return None
+    # Shared rate limit, 429 backoff and local JSON repair; papers missing fields are dropped
+    report = llm_client.generate_json(prompt, model=MODEL, schema=llm_schema.LAB_REPORT)
+    if report is None:
+        print("⚠️ Gemini unavailable or unusable reply. Skipping Lab Report.")
+    return report
 
 def main():
+    pipeline_metrics.start_stage("process_lab_report")
     print("🔬 Filtering Research Papers for Lab Report...")
     papers = filter_research_papers()
+    pipeline_metrics.incr("articles_in", len(papers))
     
     if not papers:
         print("⚠️ No research papers found today.")
         return
 
+    # Rank every candidate locally; only a small, diverse shortlist reaches Gemini
+    shortlist = triage_papers(papers)
+    pipeline_metrics.incr("papers_sent", len(shortlist))
+    print(f"🧭 Triage: {len(papers)} candidate papers -> {len(shortlist)} sent for analysis")
+
     # Call the AI analyzer
-    report = analyze_papers_with_gemini(papers)
+    report = analyze_papers_with_gemini(shortlist)
     
     # --- GRACEFUL FALLBACK ---
     if not report:
@@ -1,63 +1,114 @@
-import os
 import json
-import time
-import random
+import hashlib
+import re
 from pathlib import Path
-from google import genai
-from google.genai import types
 from datetime import datetime
 
+import llm_client
+import llm_schema
+import pipeline_metrics
+import staging
+
 # ============================
 # CONFIGURATION & PATHS
 # ============================
 PROJECT_ROOT = Path(__file__).resolve().parent
 RAW_DATA_INPUT = PROJECT_ROOT / "data" / "raw_github_trending.json"
-OUTPUT_FILE = PROJECT_ROOT / "docs" / "data" / "toolbox.json"
+OUTPUT_FILE = staging.SITE_DATA_DIR / "toolbox.json"
+CACHE_FILE = PROJECT_ROOT / "data" / "toolbox_cache.json"
 
-def call_gemini_with_retry(prompt, max_retries=3):
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-    
-    for attempt in range(max_retries):
-        try:
-            response = client.models.generate_content(
-                model="gemini-3.1-flash-lite-preview",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type='application/json'
-                )
-            )
-            # Parse the response text as JSON
-            return json.loads(response.text)
-            
-        except Exception as e:
-            if "429" in str(e) and attempt < max_retries - 1:
-                sleep_time = (5 * (attempt + 1)) + random.random()
-                print(f"⚠️ Quota Hit. Retrying in {sleep_time:.2f}s...")
-                time.sleep(sleep_time)
-            else:
-                print(f"❌ AI Error: {e}")
-                return None
-
-def process_tools_with_ai(raw_repos):
-    # Use fallback context if repos are missing
-    context = json.dumps(raw_repos[:15]) if raw_repos else "No new repos today. Suggest 3 trending AI tools."
+MAX_REPOS = 15
+TOP_TOOLS = 3
+README_CHARS = 1500      # Cleaned README text per repo, for both the prompt and the change hash
+CACHE_TTL_DAYS = 30      # Repos not seen trending for this long are dropped from the cache
+MODEL = "gemini-3.1-flash-lite-preview"
+
+# ============================
+# REPO ANALYSIS CACHE
+# ============================
+def readme_text(repo):
+    text = re.sub(r"<[^>]+>", " ", repo.get("summary") or "")
+    return re.sub(r"\s+", " ", text).strip()[:README_CHARS]
+
+def repo_key(repo):
+    return (repo.get("url") or repo.get("title", "")).rstrip("/").lower()
+
+def readme_hash(repo):
+    return hashlib.sha1(readme_text(repo).encode("utf-8")).hexdigest()[:16]
+
+def load_cache():
+    if not CACHE_FILE.exists():
+        return {}
+    try:
+        return json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+def save_cache(cache):
+    cutoff = datetime.now().timestamp() - CACHE_TTL_DAYS * 86400
+    cache = {k: v for k, v in cache.items() if v.get("last_seen", 0) >= cutoff}
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    staging.atomic_write_text(CACHE_FILE, json.dumps(cache, indent=2, ensure_ascii=False))
+
+# ============================
+# LLM (new / changed repos only)
+# ============================
+def process_tools_with_ai(repos):
+    """One batched request. Returns {repo_key: analysis} for the repos the model answered."""
+    context = "\n".join(
+        f"[{i}] {repo.get('title', '')} ({repo.get('url', '')})\n{readme_text(repo)}\n"
+        for i, repo in enumerate(repos)
+    )
     
     prompt = f"""
-    Analyze these repositories and extract the top 3 most useful AI tools.
-    Return a JSON object with a 'tools' key containing a list of objects.
+    Analyze each of these trending GitHub repositories as a potential AI developer tool.
+    For EVERY repository return one object with its "index" and:
+    - "Name", "Category", "Description" (one sentence), "Use_Case" (one sentence)
+    - "usefulness": integer 0-10 for AI engineers (0 = not an AI tool at all)
     
     Format:
     {{
       "tools": [
-        {{ "Name": "..", "Category": "..", "Description": "..", "Use_Case": "..", "URL": ".." }}
+        {{ "index": 0, "Name": "..", "Category": "..", "Description": "..", "Use_Case": "..", "usefulness": 7 }}
       ]
     }}
 
-    RAW DATA: {context}
+    REPOSITORIES:
+    {context}
     """
-    return call_gemini_with_retry(prompt)
+    # Shared rate limit, 429 backoff and local JSON repair
+    data = llm_client.generate_json(prompt, model=MODEL, schema=llm_schema.TOOLBOX)
+
+    results = {}
+    for item in (data or {}).get("tools", []):
+        if 0 <= item["index"] < len(repos):
+            results[repo_key(repos[item["index"]])] = item
+    return results
+
+def rank_tools(repos, cache):
+    """Local ranking: model usefulness, with a small bonus for trending position."""
+    scored = []
+    for position, repo in enumerate(repos):
+        entry = cache.get(repo_key(repo))
+        if not entry:
+            continue
+        analysis = entry["analysis"]
+        usefulness = analysis.get("usefulness") if isinstance(analysis.get("usefulness"), (int, float)) else 5
+        if usefulness <= 0:
+            continue
+        score = usefulness + (len(repos) - position) / len(repos)
+        scored.append((score, {
+            "Name": analysis.get("Name", repo.get("title")),
+            "Category": analysis.get("Category", ""),
+            "Description": analysis.get("Description", ""),
+            "Use_Case": analysis.get("Use_Case", ""),
+            "URL": repo.get("url", "")
+        }))
+    scored.sort(key=lambda pair: pair[0], reverse=True)
+    return [tool for _, tool in scored[:TOP_TOOLS]]
 
 def main():
+    pipeline_metrics.start_stage("process_toolbox")
     print("🛠️ [RUNNING] process_toolbox.py...")
     
     if not RAW_DATA_INPUT.exists():
@@ -67,18 +118,37 @@ def main():
         with open(RAW_DATA_INPUT, "r", encoding="utf-8") as f:
             raw_repos = json.load(f)
 
+    raw_repos = raw_repos[:MAX_REPOS]
+    pipeline_metrics.incr("articles_in", len(raw_repos))
+
     try:
-        structured_data = process_tools_with_ai(raw_repos)
-        
-        if not structured_data:
-            return
+        cache = load_cache()
+        now = datetime.now().timestamp()
+        changed = [
+            r for r in raw_repos
+            if cache.get(repo_key(r), {}).get("readme_hash") != readme_hash(r)
+        ]
+        pipeline_metrics.incr("cache_hits", len(raw_repos) - len(changed))
+        print(f"🔁 {len(raw_repos) - len(changed)} repo(s) cached, {len(changed)} new or changed")
 
-        # --- FIX: TYPE CHECKING ---
-        # If AI returns a list directly, use it. If it's a dict, use .get()
-        if isinstance(structured_data, list):
-            tools_list = structured_data
-        else:
-            tools_list = structured_data.get("tools", [])
+        if changed:
+            analyses = process_tools_with_ai(changed)
+            for repo in changed:
+                if repo_key(repo) in analyses:
+                    cache[repo_key(repo)] = {
+                        "readme_hash": readme_hash(repo),
+                        "analysis": analyses[repo_key(repo)],
+                        "analyzed_at": now
+                    }
+        for repo in raw_repos:
+            if repo_key(repo) in cache:
+                cache[repo_key(repo)]["last_seen"] = now
+        save_cache(cache)
+
+        tools_list = rank_tools(raw_repos, cache)
+        if not tools_list:
+            print("⚠️ No analysed tools available. Keeping existing toolbox.")
+            return
 
         final_output = {
             "last_updated": datetime.now().strftime('%B %d, %Y'),
@@ -89,10 +159,11 @@ def main():
         with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
             json.dump(final_output, f, indent=4)
             
+        pipeline_metrics.incr("articles_out", len(tools_list))
         print(f"✅ Toolbox generated with {len(final_output['tools'])} tools.")
 
     except Exception as e:
         print(f"❌ Error processing toolbox: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,211 @@
+"""
+Publishes the microsite data as cache-friendly files.
+
+The stages keep writing their plain files (daily_brief.json, toolbox.json, ...)
+for email, the daemon and render_site.py. This step, which runs before the
+pages are rendered, archives today's brief as
+docs/data/archive/brief_<date>.<hash>.json and brings manifest.json
+({date, file} entries, the site's history dropdown) up to date. Hashed
+names change whenever their content does, so they can be cached for good.
+
+Archived briefs do not hold their stories: each story is a content-addressed
+blob in docs/data/stories/<hash>.json and the brief lists `story_refs`, so a
+story that runs on several days (e.g. backlog refills) is stored once. Use
+`load_archived(path)` to read a brief back with its `top_stories`. Briefs
+archived with inline stories are converted on the next run, and blobs no
+brief references are removed.
+
+Every write is skipped when the file already holds the same bytes (hashed
+names make that an existence check), so an unchanged run leaves nothing
+for git to commit.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pipeline_metrics
+import staging
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+SITE_DATA_DIR = staging.SITE_DATA_DIR
+ARCHIVE_DIR = SITE_DATA_DIR / "archive"
+MANIFEST_FILE = SITE_DATA_DIR / "manifest.json"
+STORY_DIR = SITE_DATA_DIR / "stories"
+BRIEF_FILE = SITE_DATA_DIR / "daily_brief.json"
+
+# Page section -> file written by the stages (rendered by render_site.py)
+SECTIONS = {
+    "brief": "daily_brief.json",
+    "jargon": "jargon_buster.json",
+    "glossary": "glossary.json",
+    "lab_report": "lab_report.json",
+    "toolbox": "toolbox.json",
+}
+
+HASH_CHARS = 12
+VOLATILE_FIELDS = {"timestamp"}   # Per-run; archiving it would give every run a new archive file
+# Written by earlier versions for a client-rendered site; removed on the next run
+RETIRED_FILES = ["latest.json", "bootstrap.*.json"]
+IST = timezone(timedelta(hours=5, minutes=30))   # Archive dates follow the readers' calendar
+
+# ============================
+# HASHED FILES
+# ============================
+def compact(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def digest(body):
+    return hashlib.sha256(body).hexdigest()[:HASH_CHARS]
+
+def _write(path, body):
+    # Per-process temp name: backfill workers may write the same blob at once
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(body)
+    tmp.replace(path)
+
+def write_if_changed(path, body):
+    """Writes `body` (bytes) unless `path` already holds it. Returns True when written."""
+    if path.exists() and path.stat().st_size == len(body) and path.read_bytes() == body:
+        pipeline_metrics.incr("writes_skipped")
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write(path, body)
+    pipeline_metrics.incr("writes")
+    return True
+
+def write_hashed(directory, stem, data):
+    """Writes `data` as <stem>.<content hash>.json (once per content). Returns the path."""
+    body = compact(data)
+    path = directory / f"{stem}.{digest(body)}.json"
+    if path.exists():
+        pipeline_metrics.incr("writes_skipped")
+    else:
+        _write(path, body)
+        pipeline_metrics.incr("writes")
+    return path
+
+def read_json(path):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+# ============================
+# ARCHIVE
+# ============================
+def archive_day(path):
+    """'2026-05-18' from brief_2026-05-18.json or brief_2026-05-18.<hash>.json."""
+    return path.name[len("brief_"):].split(".")[0]
+
+def archive_files():
+    """{date: path} of every archived brief, oldest first."""
+    return dict(sorted((archive_day(p), p) for p in ARCHIVE_DIR.glob("brief_*.json")))
+
+def store_story(story):
+    """Blob key of `story`; its rank is left out (it is the position in `story_refs`)."""
+    body = compact({k: v for k, v in story.items() if k != "rank"})
+    key = digest(body)
+    path = STORY_DIR / f"{key}.json"
+    if path.exists():
+        pipeline_metrics.incr("story_blobs_reused")
+    else:
+        _write(path, body)
+        pipeline_metrics.incr("story_blobs_written")
+    return key
+
+def load_archived(path):
+    """Archived brief with `top_stories` resolved from the blob store, or None if unreadable."""
+    payload = read_json(path)
+    if not isinstance(payload, dict):
+        return None
+    if "story_refs" in payload:
+        refs = payload.pop("story_refs")
+        stories = [read_json(STORY_DIR / f"{key}.json") for key in refs]
+        payload["top_stories"] = [{**s, "rank": rank} for rank, s in enumerate(stories, start=1) if s]
+    return payload
+
+def archive_brief(day, payload):
+    """Stores `payload` as the brief for `day` (YYYY-MM-DD), replacing that day's previous version."""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    STORY_DIR.mkdir(parents=True, exist_ok=True)
+    packed = {k: v for k, v in payload.items() if k != "top_stories" and k not in VOLATILE_FIELDS}
+    packed["story_refs"] = [store_story(s) for s in payload.get("top_stories", [])]
+    path = write_hashed(ARCHIVE_DIR, f"brief_{day}", packed)
+    for old in ARCHIVE_DIR.glob(f"brief_{day}*.json"):
+        if old != path:
+            old.unlink()
+    return path
+
+def pack_archive():
+    """Converts briefs archived with inline stories or without a hashed name. Returns how many."""
+    converted = 0
+    for path in ARCHIVE_DIR.glob("brief_*.json"):
+        payload = read_json(path)
+        if isinstance(payload, dict) and ("top_stories" in payload or path.name.count(".") == 1):
+            archive_brief(archive_day(path), load_archived(path))
+            converted += 1
+    return converted
+
+def collect_stories():
+    """Deletes story blobs no archived brief refers to. Returns how many."""
+    if not STORY_DIR.exists():
+        return 0
+    referenced = set()
+    for path in archive_files().values():
+        referenced.update((read_json(path) or {}).get("story_refs", []))
+    removed = 0
+    for blob in STORY_DIR.glob("*.json"):
+        if blob.stem not in referenced:
+            blob.unlink()
+            removed += 1
+    return removed
+
+def history():
+    return [
+        {"date": day, "file": path.relative_to(SITE_DATA_DIR).as_posix()}
+        for day, path in archive_files().items()
+    ]
+
+# ============================
+# MANIFEST
+# ============================
+def refresh_site():
+    """Brings manifest.json up to date with the archive on disk. Returns the number of archived briefs."""
+    SITE_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    entries = history()
+    write_if_changed(MANIFEST_FILE, json.dumps(entries, indent=2).encode("utf-8"))
+    for pattern in RETIRED_FILES:
+        for retired in SITE_DATA_DIR.glob(pattern):
+            retired.unlink()
+    return len(entries)
+
+# ============================
+# MAIN
+# ============================
+def main():
+    pipeline_metrics.start_stage("publish")
+    brief = read_json(BRIEF_FILE)
+    if brief is None:
+        print("❌ docs/data/daily_brief.json not found. Nothing to publish.")
+        raise SystemExit(1)
+
+    converted = pack_archive()
+    if converted:
+        print(f"📦 Moved the stories of {converted} archived briefs into the blob store")
+
+    day = datetime.now(IST).date().isoformat()
+    archived = archive_brief(day, brief)
+    days = refresh_site()
+    removed = collect_stories()
+
+    print(f"✅ Archived {archived.name}")
+    print(f"✅ Manifest lists {days} briefs"
+          + (f", {removed} unreferenced story blobs removed" if removed else ""))
+
+if __name__ == "__main__":
+    main()
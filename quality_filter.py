@@ -0,0 +1,231 @@
+"""
+Cheap quality / relevance filter between fetch_news.py and dedup.
+
+Drops articles that would only pad the later stages: sponsored posts,
+off-topic items, stories that already ran in a brief, near-empty entries
+and, above all, articles a small classifier is confident would never be
+picked. Every drop is recorded with its reason in data/filtered_out.json.
+
+The classifier is a logistic regression over hashed word 1-2 grams of the
+title plus the source, trained on each run from the published archive:
+stories that made a brief are positives, the ranked-but-unpicked overflow
+waiting in the backlog (backlog.py) is negative. Summaries are left out: a
+briefed story's summary is the LLM's rewrite, not the feed text today's
+articles carry, so it would teach the model to spot rewrites. Scoring is
+one gather plus `np.add.reduceat` over every article at once.
+"""
+import json
+import re
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import pipeline_metrics
+import publish
+from backlog import Backlog
+from canonical import ensure_id
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+RAW_NEWS_FILE = PROJECT_ROOT / "data" / "raw_news.json"
+FILTERED_FILE = PROJECT_ROOT / "data" / "filtered_out.json"
+
+HASH_BITS = 18
+MIN_CLASS_EXAMPLES = 50       # Per class; below this only the rules run
+EPOCHS = 300
+LEARNING_RATE = 5.0           # Full-batch gradient descent; features are 1/sqrt(n)-scaled
+L2 = 1e-4
+DROP_BELOW = 0.15             # Predicted chance of making a brief
+MAX_MODEL_DROP_SHARE = 0.5    # The classifier never removes more than half of a day
+BRIEF_MEMORY_DAYS = 30        # Stories briefed this recently are not shown again
+
+# Papers feed the Lab Report's own local triage (process_lab_report.py), and
+# these feeds are AI-only, so the classifier and the topic rule leave them alone.
+RESEARCH_SOURCES = {"Arxiv AI", "Hugging Face Blog", "Microsoft Research"}
+
+SPONSORED_RE = re.compile(
+    r"\b(sponsored|partner content|advertorial|promoted|paid post|webinar|giveaway|coupon|"
+    r"promo code|black friday|cyber monday|deals? of the|best deals|\d+% off)\b", re.I
+)
+AI_TOPIC_RE = re.compile(
+    r"\b(ai|a\.i\.|artificial intelligence|machine learning|deep learning|learning|neural|llms?|"
+    r"gpt|gemini|claude|llama|model|models|agents?|agentic|transformer|diffusion|chatbot|"
+    r"robot\w*|inference|gpu|nvidia|openai|anthropic|deepmind|dataset|benchmark|automation)\b", re.I
+)
+MIN_TEXT_CHARS = 60
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9\-\.]*[a-z0-9]|[a-z0-9]")
+
+# ============================
+# FEATURES
+# ============================
+def features(article):
+    """Hashed bucket ids of the article's title word 1-2 grams plus its source."""
+    feats = {f"src:{article.get('source', '')}"}
+    words = TOKEN_RE.findall(re.sub(r"<[^>]+>", " ", article.get("title") or "").lower())
+    feats.update(f"t:{w}" for w in words)
+    feats.update(f"t:{a} {b}" for a, b in zip(words, words[1:]))
+    mask = (1 << HASH_BITS) - 1
+    return np.fromiter((zlib.crc32(f.encode("utf-8")) & mask for f in feats), dtype=np.int64)
+
+def design(articles):
+    """Flat (indices, values, offsets) for all articles; values are 1/sqrt(n) per article."""
+    rows = [features(a) for a in articles]
+    lengths = np.array([len(r) for r in rows], dtype=np.int64)
+    indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    values = np.repeat(1 / np.sqrt(lengths), lengths).astype(np.float32)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if rows else np.zeros(0, dtype=np.int64)
+    return indices, values, offsets, lengths
+
+class QualityModel:
+    def __init__(self, weights, bias):
+        self.weights = weights
+        self.bias = bias
+
+    def predict(self, articles):
+        """P(article makes a brief) for every article, in one vectorized pass."""
+        if not articles:
+            return np.zeros(0, dtype=np.float32)
+        indices, values, offsets, _ = design(articles)
+        logits = np.add.reduceat(self.weights[indices] * values, offsets) + self.bias
+        return 1 / (1 + np.exp(-logits))
+
+    @classmethod
+    def train(cls, positives, negatives):
+        articles = positives + negatives
+        y = np.concatenate([np.ones(len(positives)), np.zeros(len(negatives))]).astype(np.float32)
+        # Balanced class weights: briefs are far rarer than overflow
+        sample_weight = np.where(y == 1, len(y) / (2 * len(positives)), len(y) / (2 * len(negatives)))
+        indices, values, offsets, lengths = design(articles)
+
+        weights = np.zeros(1 << HASH_BITS, dtype=np.float32)
+        bias = 0.0
+        for _ in range(EPOCHS):
+            logits = np.add.reduceat(weights[indices] * values, offsets) + bias
+            error = (1 / (1 + np.exp(-logits)) - y) * sample_weight
+            grad = np.bincount(indices, weights=np.repeat(error, lengths) * values, minlength=len(weights))
+            weights -= LEARNING_RATE * (grad / len(y) + L2 * weights).astype(np.float32)
+            bias -= LEARNING_RATE * float(error.mean())
+        return cls(weights, bias)
+
+# ============================
+# TRAINING DATA
+# ============================
+def load_json_list(path):
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return data if isinstance(data, list) else []
+    except (OSError, ValueError):
+        return []
+
+def load_briefs():
+    """[(date, top_stories)] of every published brief, newest day first."""
+    briefs = []
+    for day, path in reversed(publish.archive_files().items()):
+        payload = publish.load_archived(path)
+        if isinstance(payload, dict):
+            briefs.append((day, payload.get("top_stories", [])))
+    return briefs
+
+def training_sets(briefs):
+    positives = [
+        {**s, "title": re.sub(r"^\[Archive\]\s*", "", s.get("title", ""))}
+        for _, stories in briefs for s in stories
+    ]
+    briefed_ids = {ensure_id(s) for s in positives}
+    negatives = [a for a in Backlog.load().ranked() if ensure_id(a) not in briefed_ids]
+    return positives, negatives
+
+def recent_brief_ids(briefs, days=BRIEF_MEMORY_DAYS):
+    """Stories of the last `days` briefs before today (a same-day re-run may pick today's again)."""
+    # Archive days are named on the readers' calendar (publish.IST), not in UTC
+    today = datetime.now(publish.IST).date().isoformat()
+    earlier = [stories for day, stories in briefs if day < today][:days]
+    return {ensure_id(s) for stories in earlier for s in stories}
+
+# ============================
+# FILTER
+# ============================
+def rule_reason(article, briefed_ids):
+    title = article.get("title") or ""
+    text = f"{title} {article.get('summary') or ''}"
+    if ensure_id(article) in briefed_ids:
+        return "already_briefed"
+    if SPONSORED_RE.search(text):
+        return "sponsored"
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        return "thin_content"
+    if article.get("source") not in RESEARCH_SOURCES and not AI_TOPIC_RE.search(text):
+        return "off_topic"
+    return None
+
+def filter_articles(articles, model=None, briefed_ids=frozenset()):
+    """Returns (kept, dropped); every dropped entry carries its `reason`."""
+    kept, dropped = [], []
+    for a in articles:
+        reason = rule_reason(a, briefed_ids)
+        if reason:
+            dropped.append({**a, "reason": reason})
+        else:
+            kept.append(a)
+
+    if model is None:
+        return kept, dropped
+
+    scored = [i for i, a in enumerate(kept) if a.get("source") not in RESEARCH_SOURCES]
+    with pipeline_metrics.span("classify"):
+        quality = model.predict([kept[i] for i in scored])
+    low = [scored[j] for j in np.argsort(quality) if quality[j] < DROP_BELOW]
+    low = set(low[:int(len(scored) * MAX_MODEL_DROP_SHARE)])
+    by_index = dict(zip(scored, quality))
+    dropped.extend({**kept[i], "reason": "low_quality", "quality": round(float(by_index[i]), 3)} for i in sorted(low))
+    kept = [a for i, a in enumerate(kept) if i not in low]
+    return kept, dropped
+
+def load_model(briefs):
+    """Classifier trained on the archive, or None when there is too little history."""
+    positives, negatives = training_sets(briefs)
+    if min(len(positives), len(negatives)) < MIN_CLASS_EXAMPLES:
+        print(f"⚠️ Only {len(positives)} briefed / {len(negatives)} overflow examples. Rules only.")
+        return None
+    started = time.perf_counter()
+    with pipeline_metrics.span("train"):
+        model = QualityModel.train(positives, negatives)
+    print(f"🧪 Quality model trained on {len(positives)} briefed / {len(negatives)} overflow stories "
+          f"in {time.perf_counter() - started:.2f}s")
+    return model
+
+# ============================
+# MAIN
+# ============================
+def main():
+    pipeline_metrics.start_stage("quality_filter")
+    if not RAW_NEWS_FILE.exists():
+        print("⚠️ raw_news.json missing. Skipping quality filter.")
+        return
+
+    articles = load_json_list(RAW_NEWS_FILE)
+    pipeline_metrics.incr("articles_in", len(articles))
+    briefs = load_briefs()
+    kept, dropped = filter_articles(articles, load_model(briefs), recent_brief_ids(briefs))
+
+    RAW_NEWS_FILE.write_text(json.dumps(kept, indent=2, ensure_ascii=False), encoding="utf-8")
+    FILTERED_FILE.write_text(json.dumps([
+        {k: a.get(k) for k in ("id", "title", "source", "url", "reason", "quality")}
+        for a in dropped
+    ], indent=2, ensure_ascii=False), encoding="utf-8")
+
+    reasons = {}
+    for a in dropped:
+        reasons[a["reason"]] = reasons.get(a["reason"], 0) + 1
+        pipeline_metrics.incr(f"dropped_{a['reason']}")
+    pipeline_metrics.incr("articles_out", len(kept))
+    summary = ", ".join(f"{r}: {n}" for r, n in sorted(reasons.items())) or "none"
+    print(f"🧹 Quality filter kept {len(kept)}/{len(articles)} articles (dropped {summary})")
+
+if __name__ == "__main__":
+    main()
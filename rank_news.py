@@ -2,25 +2,28 @@ import json
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import pipeline_metrics
+import topic_tracker
+from backlog import Backlog
+from canonical import ensure_id
+
 # ============================
 # CONFIG
 # ============================
 TOP_K = 5
-ARCHIVE_ADD_DAILY = 15
-ARCHIVE_MAX = 300
 MAX_PER_SOURCE = 2
 MAX_ARXIV = 1
+CANDIDATE_POOL_SIZE = 40  # Ranked pool shared by the audience briefs (segment_briefs.py)
 
-NOW_UTC = datetime.now(timezone.utc)
-FRESH_THRESHOLD = NOW_UTC - timedelta(hours=24)
+FRESH_HOURS = 24          # Freshness window, relative to the `now` a run is ranking for
 
 PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_DIR = PROJECT_ROOT / "data"
 
 RAW_NEWS_FILE = DATA_DIR / "raw_news.json"
+DEDUPED_FILE = DATA_DIR / "deduped_news.json"
 TOP_NEWS_FILE = DATA_DIR / "top_news.json"
-ARCHIVE_FILE = DATA_DIR / "archive_news.json"
-BACKUP_QUEUE_FILE = DATA_DIR / "backup_queue.json"
+CANDIDATE_POOL_FILE = DATA_DIR / "candidate_pool.json"
 
 # ============================
 # SOURCE WEIGHTS (Updated with New Sources)
@@ -47,6 +50,8 @@ TECH_KEYWORDS = [
 # ============================
 def score_article(a):
     score = SOURCE_SCORES.get(a.get("source"), 2)
+    # Title and summary only: full_text (extract_articles.py) exists for just the
+    # top candidates and would give them extra keyword hits over the rest
     text = (a.get("title", "") + " " + a.get("summary", "")).lower()
 
     for kw in TECH_KEYWORDS:
@@ -59,116 +64,114 @@ def score_article(a):
     return score
 
 # ============================
-# LOAD RAW ARTICLES
+# SELECTION
 # ============================
-if not RAW_NEWS_FILE.exists():
-    print("ERROR: raw_news.json missing")
-    exit(1)
+def filter_fresh(articles, now=None, momentum=None):
+    """
+    Keep 24h-fresh articles (as of `now`), scored and sorted by score descending.
+    `momentum` ({id: topic momentum} from topic_tracker.py) boosts rising topics.
+    """
+    momentum = momentum or {}
+    threshold = (now or datetime.now(timezone.utc)) - timedelta(hours=FRESH_HOURS)
+    fresh = []
+    for a in articles:
+        try:
+            published = datetime.fromisoformat(a["published_at"])
+        except:
+            continue
 
-articles = json.loads(RAW_NEWS_FILE.read_text(encoding="utf-8"))
+        if published >= threshold:
+            a["score"] = score_article(a) + topic_tracker.momentum_bonus(momentum.get(ensure_id(a)))
+            fresh.append(a)
 
-# ============================
-# FILTER FRESH (24H)
-# ============================
-fresh = []
-for a in articles:
-    try:
-        published = datetime.fromisoformat(a["published_at"])
-    except:
-        continue
+    return sorted(fresh, key=lambda x: x["score"], reverse=True)
 
-    if published >= FRESH_THRESHOLD:
-        a["score"] = score_article(a)
-        fresh.append(a)
+def select_top(fresh):
+    """Apply source diversity and Arxiv constraints. Returns (selected, overflow)"""
+    selected = []
+    overflow = []
 
-# Sort by score descending
-fresh = sorted(fresh, key=lambda x: x["score"], reverse=True)
-
-# ============================
-# SELECT TOP STORIES
-# ============================
-selected = []
-overflow = []
-
-source_counter = {}
-arxiv_count = 0
-
-for a in fresh:
-    src = a.get("source", "Unknown")
-    source_counter[src] = source_counter.get(src, 0)
-
-    # Arxiv constraint
-    if src == "Arxiv AI" and arxiv_count >= MAX_ARXIV:
-        overflow.append(a)
-        continue
-
-    # Diversity constraint
-    if source_counter[src] < MAX_PER_SOURCE and len(selected) < TOP_K:
-        selected.append(a)
-        source_counter[src] += 1
-        if src == "Arxiv AI":
-            arxiv_count += 1
-    else:
-        overflow.append(a)
+    source_counter = {}
+    arxiv_count = 0
 
-# ============================
-# LOAD ARCHIVE
-# ============================
-if ARCHIVE_FILE.exists():
-    try:
-        archive = json.loads(ARCHIVE_FILE.read_text(encoding="utf-8"))
-    except:
-        archive = []
-else:
-    archive = []
+    for a in fresh:
+        src = a.get("source", "Unknown")
+        source_counter[src] = source_counter.get(src, 0)
 
-# ============================
-# FILL FROM ARCHIVE IF NEEDED
-# ============================
-if len(selected) < TOP_K:
-    needed = TOP_K - len(selected)
-    print(f"[ARCHIVE] Filling {needed} slots from archive")
+        # Arxiv constraint
+        if src == "Arxiv AI" and arxiv_count >= MAX_ARXIV:
+            overflow.append(a)
+            continue
 
-    for a in archive:
-        if len(selected) >= TOP_K:
-            break
-        # Optional: Add check to avoid duplicates if they exist in both
-        if a["url"] not in [s["url"] for s in selected]:
+        # Diversity constraint
+        if source_counter[src] < MAX_PER_SOURCE and len(selected) < TOP_K:
             selected.append(a)
+            source_counter[src] += 1
+            if src == "Arxiv AI":
+                arxiv_count += 1
+        else:
+            overflow.append(a)
 
-# ============================
-# UPDATE ARCHIVE
-# ============================
-today_archive = overflow[:ARCHIVE_ADD_DAILY]
-timestamp = NOW_UTC.isoformat()
-
-for a in today_archive:
-    a["archived_at"] = timestamp
-
-archive = today_archive + archive
-archive = archive[:ARCHIVE_MAX]
+    return selected, overflow
 
 # ============================
-# SAVE FILES
+# BACKLOG
 # ============================
-TOP_NEWS_FILE.write_text(
-    json.dumps(selected, indent=2, ensure_ascii=False),
-    encoding="utf-8"
-)
+def fill_from_backlog(selected, backlog, now=None):
+    """Tops up a quiet day with the best unsent backlog stories."""
+    if len(selected) >= TOP_K:
+        return selected
 
-ARCHIVE_FILE.write_text(
-    json.dumps(archive, indent=2, ensure_ascii=False),
-    encoding="utf-8"
-)
-
-BACKUP_QUEUE_FILE.write_text(
-    json.dumps(overflow[:15], indent=2, ensure_ascii=False),
-    encoding="utf-8"
-)
-
-# ============================
-# LOGS
-# ============================
-print(f"Success: Selected {len(selected)} stories for today.")
-print(f"Archive: {len(today_archive)} stories added.")
-print(f"Archive size: {len(archive)}")
\ No newline at end of file
+    needed = TOP_K - len(selected)
+    print(f"[BACKLOG] Filling {needed} slots from backlog")
+    return selected + backlog.take(needed, now, exclude={ensure_id(s) for s in selected})
+
+def update_backlog(backlog, selected, overflow, now=None):
+    """Marks today's picks as sent and queues the overflow. Returns the number queued."""
+    backlog.mark_sent(selected, now)
+    return sum(backlog.push(a) for a in overflow)
+
+# ============================
+# MAIN
+# ============================
+def without_full_text(articles):
+    """Long-lived lists (backlog, pool) only keep the feed summary."""
+    return [{k: v for k, v in a.items() if k != "full_text"} for a in articles]
+
+def main(now=None):
+    pipeline_metrics.start_stage("rank_news")
+    now = now or datetime.now(timezone.utc)
+    # Prefer the deduplicated set, which also carries extracted full text
+    input_file = DEDUPED_FILE if DEDUPED_FILE.exists() else RAW_NEWS_FILE
+    if not input_file.exists():
+        print("ERROR: raw_news.json missing")
+        exit(1)
+
+    articles = json.loads(input_file.read_text(encoding="utf-8"))
+
+    pipeline_metrics.incr("articles_in", len(articles))
+    fresh = filter_fresh(articles, now, topic_tracker.load_momentum())
+    selected, overflow = select_top(fresh)
+
+    backlog = Backlog.load(now=now)
+    selected = fill_from_backlog(selected, backlog, now)
+    queued = update_backlog(backlog, selected, overflow, now)
+    backlog.save(now=now)
+
+    TOP_NEWS_FILE.write_text(
+        json.dumps(selected, indent=2, ensure_ascii=False),
+        encoding="utf-8"
+    )
+
+    CANDIDATE_POOL_FILE.write_text(
+        json.dumps(without_full_text((selected + overflow)[:CANDIDATE_POOL_SIZE]), indent=2, ensure_ascii=False),
+        encoding="utf-8"
+    )
+
+    pipeline_metrics.incr("articles_out", len(selected))
+    print(f"Success: Selected {len(selected)} stories for today.")
+    print(f"Backlog: {queued} stories queued.")
+    print(f"Backlog size: {len(backlog)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import threading
+import time
+
+class RateLimiter:
+    """Thread-safe token bucket."""
+
+    def __init__(self, rate_per_sec, burst=None):
+        self.rate = rate_per_sec
+        self.capacity = burst or max(1.0, rate_per_sec)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a token only if one is free right now (for optional work such as hedges)."""
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """Block until a token is free. Returns the seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
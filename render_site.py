@@ -0,0 +1,106 @@
+"""
+Pre-renders the microsite: docs/index.html for the current brief and
+docs/archive/<date>.html for every archived one.
+
+Pages are complete HTML from the same data the JSON files carry, rendered
+with the email's template engine (templating.py, templates/site.html), so
+content shows up without JavaScript and crawlers or mail clients can read
+it. script.js only fills the history dropdown from manifest.json and
+navigates between pages (plus the glossary search box).
+
+Only pages whose HTML changed are rewritten, so a daily run touches
+index.html and the new day's archive page.
+"""
+from pathlib import Path
+
+import pipeline_metrics
+import publish
+import staging
+import templating
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+SITE_DIR = staging.SITE_DIR
+INDEX_FILE = SITE_DIR / "index.html"
+ARCHIVE_PAGE_DIR = SITE_DIR / "archive"
+
+TEMPLATE = "site.html"
+SITE_TITLE = "AI Executive Brief"
+
+# ============================
+# CONTEXT
+# ============================
+def story_context(story):
+    return {
+        **story,
+        "related": [
+            {"url": r.get("url", "#"), "title": r.get("title", ""), "day": (r.get("published_at") or "")[:10]}
+            for r in story.get("related") or []
+        ]
+    }
+
+def page_context(brief, root, page_date="", sections=None):
+    """Template context for one brief. `sections` (jargon, glossary, toolbox, lab report) only on the current page."""
+    sections = sections or {}
+    stories = [story_context(s) for s in brief.get("top_stories", [])]
+    jargon = sections.get("jargon") or {}
+    glossary = sections.get("glossary") or {}
+    toolbox = sections.get("toolbox")
+    tools = toolbox if isinstance(toolbox, list) else (toolbox or {}).get("tools", [])
+    date = brief.get("date", "")
+
+    return {
+        "root": root,
+        "page_date": page_date,
+        "title": f"{SITE_TITLE} | {date}" if page_date else SITE_TITLE,
+        "description": "; ".join(s["title"] for s in stories[:3]),
+        "date": date,
+        "stories": stories,
+        "rising_topics": brief.get("rising_topics") or [],
+        "jargon": jargon if jargon.get("terms") else None,
+        "glossary": glossary if glossary.get("terms") else None,
+        "tools": tools,
+        "papers": (sections.get("lab_report") or {}).get("papers", []),
+    }
+
+def write_page(path, rendered):
+    """Returns True when the page changed and was rewritten."""
+    return publish.write_if_changed(path, str(rendered).encode("utf-8"))
+
+def render_archive(template=None):
+    """Renders docs/archive/<date>.html for every archived brief. Returns (pages, pages changed)."""
+    template = template or templating.get_template(TEMPLATE)
+    written = 0
+    with pipeline_metrics.span("archive_pages"):
+        archive = publish.archive_files()
+        for day, path in archive.items():
+            payload = publish.load_archived(path)
+            if isinstance(payload, dict):
+                page = template.render(page_context(payload, "../", page_date=day))
+                written += write_page(ARCHIVE_PAGE_DIR / f"{day}.html", page)
+    return len(archive), written
+
+# ============================
+# MAIN
+# ============================
+def main():
+    pipeline_metrics.start_stage("render_site")
+    brief = publish.read_json(publish.BRIEF_FILE)
+    if brief is None:
+        print("❌ docs/data/daily_brief.json not found. Nothing to render.")
+        raise SystemExit(1)
+
+    template = templating.get_template(TEMPLATE)
+    sections = {key: publish.read_json(publish.SITE_DATA_DIR / name) for key, name in publish.SECTIONS.items()}
+
+    written = write_page(INDEX_FILE, template.render(page_context(brief, "./", sections=sections)))
+    pages, changed = render_archive(template)
+    written += changed
+
+    pipeline_metrics.incr("pages_written", written)
+    print(f"✅ Rendered index.html and {pages} archive pages ({written} changed)")
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,10 @@ import json
 import time  # Added for pauses
 from datetime import datetime
 
+import pipeline_metrics
+import staging
+from backlog import Backlog
+
 # ============================
 # CONFIGURATION
 # ============================
@@ -15,11 +19,37 @@ PYTHON_EXE = sys.executable
 # Paths to critical data files
 DATA_DIR = os.path.join(BASE_DIR, "data")
 RAW_NEWS_PATH = os.path.join(DATA_DIR, "raw_news.json")
-BACKUP_QUEUE_PATH = os.path.join(DATA_DIR, "backup_queue.json")
 TOP_NEWS_PATH = os.path.join(DATA_DIR, "top_news.json")
 ENRICHED_PATH = os.path.join(DATA_DIR, "enriched_summaries.json")
+CANDIDATE_POOL_PATH = os.path.join(DATA_DIR, "candidate_pool.json")
+DEDUPED_PATH = os.path.join(DATA_DIR, "deduped_news.json")
+RISING_TOPICS_PATH = os.path.join(DATA_DIR, "rising_topics.json")
+MOMENTUM_PATH = os.path.join(DATA_DIR, "topic_momentum.json")
+RELATED_PATH = os.path.join(DATA_DIR, "related_stories.json")
+
+# Format: (Script Name, Delay in Seconds after execution)
+# We add 60s delays for the most AI-intensive scripts to reset Free Tier quotas.
+STANDARD_FLOW = [
+    ("fetch_github.py", 0),
+    ("quality_filter.py", 0),      # Local classifier: drops low-value articles before dedup
+    ("ai_deduplicate.py", 0),      # Local model (no quota hit)
+    ("vector_archive.py", 0),      # Cross-day dedup + related links against the long-term archive
+    ("topic_tracker.py", 0),       # Local, reuses the dedup vectors
+    ("extract_articles.py", 30),   # Network only, but 30s breather helps before Gemini
+    ("jargon_buster.py", 65),      # HEAVY AI: 65s pause to fully reset RPM
+    ("process_lab_report.py", 30),  # MEDIUM AI: 30s pause
+    ("process_toolbox.py", 65),    # HEAVY AI: 65s pause to reset RPM
+    ("rank_news.py", 30),
+    ("summarize.py", 30), 
+    ("enrich.py", 0)
+]
+
+FINAL_STEPS = ["format_brief.py", "segment_briefs.py", "publish.py", "render_site.py"]
 
-def run_step(script_name):
+# Load tests against a local Gemini stand-in set this to 0 (no real quota to wait for)
+BREATHER_SCALE = float(os.getenv("PIPELINE_BREATHER_SCALE", "1"))
+
+def run_step(script_name, recorder=None):
     """Utility to run individual scripts and print output"""
     script_path = os.path.join(BASE_DIR, script_name)
     print(f"\n>>> [RUNNING] {script_name}...")
@@ -28,9 +58,13 @@ def run_step(script_name):
         print(f"ERROR: Script not found: {script_path}")
         return False
 
+    # PIPELINE_PROFILE=cprofile|pyinstrument wraps the stage in a profiler
+    command = pipeline_metrics.profiler_command(script_path) or [PYTHON_EXE, script_path]
+    started = time.perf_counter()
+    ok = False
     try:
         result = subprocess.run(
-            [PYTHON_EXE, script_path],
+            command,
             cwd=BASE_DIR,
             capture_output=True,
             text=True,
@@ -43,28 +77,34 @@ def run_step(script_name):
         if result.returncode != 0:
             print(f"ERROR in {script_name}:\n{result.stderr.strip()}")
             return False
+        ok = True
         return True
     except Exception as e:
         print(f"CRITICAL SYSTEM ERROR running {script_name}: {e}")
         return False
+    finally:
+        if recorder:
+            recorder.step(script_name, ok, time.perf_counter() - started)
 
 # ============================
 # DYNAMIC PIPELINE RUNNER
 # ============================
 
-def run_pipeline():
+def execute_pipeline(recorder):
+    """Runs every stage. Returns the process exit code."""
     print("========== AI NEWS PIPELINE START ==========")
     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     # PRE-STEP: Clear old session data to ensure fresh results
-    for path in [RAW_NEWS_PATH, TOP_NEWS_PATH, ENRICHED_PATH]:
+    for path in [RAW_NEWS_PATH, DEDUPED_PATH, TOP_NEWS_PATH, ENRICHED_PATH, CANDIDATE_POOL_PATH,
+                 RISING_TOPICS_PATH, MOMENTUM_PATH, RELATED_PATH]:
         if os.path.exists(path):
             os.remove(path)
 
     # STEP 1: Always Fetch News First
-    if not run_step("fetch_news.py"):
+    if not run_step("fetch_news.py", recorder):
         print("CRITICAL: Fetch stage failed.")
-        sys.exit(1)
+        return 1
 
     # STEP 2: Check for content
     has_new_content = False
@@ -82,52 +122,60 @@ def run_pipeline():
     if has_new_content:
         print(f">>> {len(raw_data)} new articles found. Executing AI enhancement...")
         
-        # Format: (Script Name, Delay in Seconds after execution)
-        # We add 60s delays for the most AI-intensive scripts to reset Free Tier quotas.
-        standard_flow = [
-            ("fetch_github.py", 0),
-            ("ai_deduplicate.py", 30),     # Local model (no quota hit), but 30s breather helps
-            ("jargon_buster.py", 65),      # HEAVY AI: 65s pause to fully reset RPM
-            ("process_lab_report.py", 30),  # MEDIUM AI: 30s pause
-            ("process_toolbox.py", 65),    # HEAVY AI: 65s pause to reset RPM
-            ("rank_news.py", 30),
-            ("summarize.py", 30), 
-            ("enrich.py", 0)
-        ]
-        
-        for script, delay in standard_flow:
-            if not run_step(script):
+        for script, delay in STANDARD_FLOW:
+            if not run_step(script, recorder):
                 print(f"Pipeline stopped at {script}")
-                sys.exit(1)
+                return 1
             
+            delay *= BREATHER_SCALE
             if delay > 0:
                 print(f"☕ Taking a {delay}s breather to respect Gemini Free Tier limits...")
-                time.sleep(delay)
+                recorder.sleep(delay)
                 
     else:
         # PATH B: 0 new news -> Try Archive (Fixes Sunday Drought UI)
         print(">>> 0 new articles found. Switching to Archive Recovery Mode...")
-        if os.path.exists(BACKUP_QUEUE_PATH):
-            with open(BACKUP_QUEUE_PATH, "r", encoding="utf-8") as f:
-                backup_data = json.load(f)
-            
-            if len(backup_data) > 0:
-                print(f">>> Found {len(backup_data)} stories in backup. Filling Today's Brief.")
-                with open(TOP_NEWS_PATH, "w", encoding="utf-8") as f:
-                    json.dump(backup_data[:5], f, indent=2, ensure_ascii=False)
-            else:
-                print(">>> Archive empty. Pipeline cannot proceed.")
-                sys.exit(0)
+        backlog = Backlog.load()
+        backup_data = backlog.take(5)
+        if len(backup_data) > 0:
+            print(f">>> Took {len(backup_data)} unsent stories from the backlog. Filling Today's Brief.")
+            with open(TOP_NEWS_PATH, "w", encoding="utf-8") as f:
+                json.dump(backup_data, f, indent=2, ensure_ascii=False)
+            backlog.save()
+        else:
+            print(">>> Backlog empty. Pipeline cannot proceed.")
+            return 0
 
     # STEP 4: Always Format and Send
-    #final_steps = ["format_brief.py", "send_email.py"]
-    final_steps = ["format_brief.py"]
-    for script in final_steps:
-        if not run_step(script):
-            sys.exit(1)
+    #FINAL_STEPS = ["format_brief.py", "segment_briefs.py", "send_email.py"]
+    for script in FINAL_STEPS:
+        if not run_step(script, recorder):
+            return 1
 
     print("\n========================================")
     print("ALL TASKS COMPLETED SUCCESSFULLY")
+    return 0
+
+def run_pipeline():
+    with staging.run_lock() as locked:
+        if not locked:
+            print("Another pipeline run on this machine holds the lock. Skipping this run.")
+            sys.exit(0)
+
+        # Stages write into a copy of docs/; only a successful run replaces the live site
+        recorder = pipeline_metrics.RunRecorder()
+        site = staging.stage_site()
+        exit_code = 1
+        try:
+            exit_code = execute_pipeline(recorder)
+        finally:
+            if exit_code == 0:
+                staging.swap(site)
+            else:
+                staging.discard(site)
+                print("Live site left unchanged.")
+            recorder.finish("ok" if exit_code == 0 else "failed")
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     run_pipeline()
\ No newline at end of file
@@ -0,0 +1,188 @@
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+import enrich
+import format_brief
+import pipeline_metrics
+import staging
+import summarize
+from canonical import ensure_id
+from rank_news import CANDIDATE_POOL_FILE, MAX_PER_SOURCE, TOP_K, TOP_NEWS_FILE
+
+# ============================
+# PATHS
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+ENRICHED_FILE = PROJECT_ROOT / "data" / "enriched_summaries.json"
+SITE_DATA_DIR = staging.SITE_DATA_DIR
+
+# ============================
+# AUDIENCES
+# ============================
+AUDIENCES = ["infra", "research", "leadership"]
+
+# Affinity of every `who_should_care` role used by enrich.py: [infra, research, leadership]
+ROLE_AFFINITY = {
+    "Research Scientists": [0, 1, 0],
+    "ML Engineers": [0.5, 0.5, 0],
+    "Open-Source Contributors": [1, 0, 0],
+    "Applied Researchers": [0, 1, 0],
+    "Enterprise ML Teams": [0.5, 0, 0.5],
+    "Policy Leaders": [0, 0, 1],
+    "Tech Strategists": [0, 0, 1],
+    "Startup Founders": [0, 0, 1],
+    "Product Leaders": [0, 0, 1],
+    "AI Ethics Engineers": [0, 0.5, 0.5],
+    "Legal & Compliance": [0, 0, 1],
+    "AI Infrastructure Engineers": [1, 0, 0],
+    "Sustainability Leaders": [0, 0, 1],
+    "CTOs": [0.5, 0, 0.5],
+    "Engineering Leaders": [0.5, 0, 0.5],
+    "Mobile Engineers": [1, 0, 0],
+    "Product Managers": [0, 0, 1],
+    "AI Professionals": [1 / 3, 1 / 3, 1 / 3],
+}
+
+# Fallback for roles written by the LLM that are not in the table above
+ROLE_PATTERNS = [
+    re.compile(r"engineer|infra|devops|platform|developer|sre", re.I),
+    re.compile(r"research|scientist|academic", re.I),
+    re.compile(r"lead|chief|ceo|cto|founder|executive|policy|product|strateg|investor", re.I),
+]
+
+TOPIC_KEYWORDS = [
+    ["gpu", "inference", "latency", "compute", "kubernetes", "deploy", "serving", "chip", "data center", "open-source"],
+    ["arxiv", "paper", "benchmark", "dataset", "training", "architecture", "theorem", "we propose"],
+    ["funding", "regulation", "market", "revenue", "acquisition", "policy", "enterprise", "strategy", "lawsuit"],
+]
+
+# Feature columns: [rank score, role infra, role research, role leadership, kw infra, kw research, kw leadership]
+# One weight column per audience, so every audience is scored in a single matrix product.
+AUDIENCE_WEIGHTS = np.array([
+    # infra  research  leadership
+    [1.0,    1.0,      1.0],   # normalised rank score
+    [2.0,    0.0,      0.0],   # role affinity: infra
+    [0.0,    2.0,      0.0],   # role affinity: research
+    [0.0,    0.0,      2.0],   # role affinity: leadership
+    [1.0,    0.0,      0.0],   # keyword hits: infra
+    [0.0,    1.0,      0.0],   # keyword hits: research
+    [0.0,    0.0,      1.0],   # keyword hits: leadership
+], dtype=np.float32)
+
+# ============================
+# HELPERS
+# ============================
+def role_affinity(roles):
+    vectors = []
+    for role in roles or []:
+        if role in ROLE_AFFINITY:
+            vectors.append(ROLE_AFFINITY[role])
+        else:
+            hits = [1.0 if p.search(role) else 0.0 for p in ROLE_PATTERNS]
+            if any(hits):
+                vectors.append(hits)
+    return np.mean(vectors, axis=0) if vectors else np.full(3, 1 / 3)
+
+def feature_matrix(pool):
+    features = np.zeros((len(pool), AUDIENCE_WEIGHTS.shape[0]), dtype=np.float32)
+    scores = np.array([a["story"].get("score") or 0 for a in pool], dtype=np.float32)
+    features[:, 0] = scores / scores.max() if len(pool) and scores.max() > 0 else 0
+
+    for i, item in enumerate(pool):
+        features[i, 1:4] = role_affinity(item["enriched"].get("who_should_care"))
+        text = (item["story"].get("title", "") + " " + item["story"].get("summary", "")).lower()
+        for j, keywords in enumerate(TOPIC_KEYWORDS):
+            features[i, 4 + j] = min(1.0, sum(kw in text for kw in keywords) / 2)
+    return features
+
+def pick_diverse(order, pool):
+    """Walk one audience's ranking and apply the same per-source cap as rank_news."""
+    picked, per_source = [], {}
+    for idx in order:
+        src = pool[idx]["story"].get("source", "Unknown")
+        if per_source.get(src, 0) >= MAX_PER_SOURCE:
+            continue
+        picked.append(idx)
+        per_source[src] = per_source.get(src, 0) + 1
+        if len(picked) == TOP_K:
+            break
+    return picked
+
+def pool_source():
+    """The ranked candidate pool, or today's top stories when rank_news.py did not run (archive recovery)."""
+    for path in (CANDIDATE_POOL_FILE, TOP_NEWS_FILE):
+        if path.exists():
+            return path
+    return None
+
+def clear_stale_briefs():
+    """Audience briefs from an earlier run must not be published beside today's brief."""
+    for audience in AUDIENCES:
+        (SITE_DATA_DIR / f"brief_{audience}.json").unlink(missing_ok=True)
+
+def load_pool(path):
+    candidates = json.loads(path.read_text(encoding="utf-8"))
+
+    enriched_map = {}
+    if ENRICHED_FILE.exists():
+        try:
+            enriched_map = {
+                ensure_id(a): a
+                for a in json.loads(ENRICHED_FILE.read_text(encoding="utf-8"))
+            }
+        except ValueError:
+            enriched_map = {}
+
+    # Top stories reuse the main pass; the rest get the cheap local enrichment (no LLM)
+    pool = []
+    for story in candidates:
+        enriched = enriched_map.get(ensure_id(story))
+        if enriched is None:
+            enriched = enrich.enrich(summarize.technical_summary(story))
+        pool.append({"story": story, "enriched": enriched})
+    return pool
+
+# ============================
+# MAIN
+# ============================
+def main():
+    pipeline_metrics.start_stage("segment_briefs")
+    source = pool_source()
+    if source is None:
+        clear_stale_briefs()
+        print("⚠️ No candidate pool or top stories. Removed the audience briefs.")
+        return
+    if source != CANDIDATE_POOL_FILE:
+        print(f"ℹ️ No candidate pool from rank_news.py. Building audience briefs from {source.name}.")
+
+    pool = load_pool(source)
+    if not pool:
+        clear_stale_briefs()
+        print("⚠️ Candidate pool is empty. Removed the audience briefs.")
+        return
+    pipeline_metrics.incr("articles_in", len(pool))
+
+    with pipeline_metrics.span("score"):
+        scores = feature_matrix(pool) @ AUDIENCE_WEIGHTS   # (n_articles, n_audiences)
+        orders = np.argsort(-scores, axis=0, kind="stable")
+
+    SITE_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    for a, audience in enumerate(AUDIENCES):
+        picked = pick_diverse(orders[:, a], pool)
+        articles = [
+            format_brief.format_article(rank, pool[idx]["story"], pool[idx]["enriched"])
+            for rank, idx in enumerate(picked, start=1)
+        ]
+        payload = format_brief.build_payload(articles)
+        payload["audience"] = audience
+
+        output = SITE_DATA_DIR / f"brief_{audience}.json"
+        output.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+        pipeline_metrics.incr("articles_out", len(articles))
+        print(f"✅ {audience.title()} brief: {len(articles)} stories -> {output.name}")
+
+if __name__ == "__main__":
+    main()
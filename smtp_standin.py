@@ -0,0 +1,167 @@
+"""
+Minimal local SMTP stand-in for testing and benchmarking delivery.py.
+
+Speaks just enough SMTP (EHLO/HELO, AUTH PLAIN, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT) to accept mail from smtplib without TLS. It can inject
+latency and transient 421 failures, and counts what it receives.
+
+    # Serve on localhost:8025 (point send_email.py at it with SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_SSL=0)
+    python smtp_standin.py --port 8025
+
+    # Benchmark the delivery engine against it with 5000 fake recipients
+    python smtp_standin.py --bench 5000 --workers 8 --latency-ms 5
+"""
+import argparse
+import random
+import socketserver
+import tempfile
+import threading
+import time
+from email.message import EmailMessage
+from pathlib import Path
+
+# ============================
+# SERVER
+# ============================
+class StandinStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.rejected = 0
+
+    def add(self, field, n=1):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + n)
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        server = self.server
+        server.stats.add("connections")
+        self.reply("220 localhost smtp-standin ready")
+
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").strip()
+            verb = line.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250-AUTH PLAIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                if server.fail_rate and random.random() < server.fail_rate:
+                    server.stats.add("rejected")
+                    self.reply("421 4.7.0 Try again later")
+                    continue
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                if server.latency:
+                    time.sleep(server.latency)
+                server.stats.add("messages")
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port=8025, latency_ms=0, fail_rate=0.0):
+        super().__init__(("127.0.0.1", port), SMTPHandler)
+        self.latency = latency_ms / 1000.0
+        self.fail_rate = fail_rate
+        self.stats = StandinStats()
+
+def start_in_thread(port=0, latency_ms=0, fail_rate=0.0):
+    """Start a stand-in on a free port (port=0). Returns the server; use server.server_address[1]."""
+    server = StandinServer(port, latency_ms, fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ============================
+# BENCHMARK
+# ============================
+def run_benchmark(count, workers, latency_ms, fail_rate, rate):
+    import delivery
+    import templating
+
+    server = start_in_thread(0, latency_ms, fail_rate)
+    port = server.server_address[1]
+
+    body = templating.Template(
+        "<html><body><p>Hello {{ recipient.name }},</p><p>" + "Brief content. " * 400 + "</p>"
+        "<p>Sent to {{ recipient.email }}</p></body></html>"
+    ).render({"recipient": {"name": templating.Late("name"), "email": templating.Late("email")}})
+    recipients = [{"email": f"user{i}@example.test", "name": f"User {i}"} for i in range(count)]
+
+    def build_message(r):
+        msg = EmailMessage()
+        msg["From"] = "AI Briefing <bench@example.test>"
+        msg["To"] = r["email"]
+        msg["Subject"] = "Benchmark"
+        msg.set_content(body.fill(r), subtype="html")
+        return msg
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = delivery.DeliveryLog(Path(tmp) / "delivery_log.jsonl")
+        started = time.perf_counter()
+        stats = delivery.deliver(
+            "bench", recipients, build_message,
+            delivery.default_smtp_factory(host="127.0.0.1", port=port, use_ssl=False),
+            workers=workers, rate_per_sec=rate, log=log
+        )
+        elapsed = time.perf_counter() - started
+
+    server.shutdown()
+    print("===================================")
+    print(f"Recipients:        {count}")
+    print(f"Sent / failed:     {stats['sent']} / {stats['failed']}")
+    print(f"SMTP connections:  {server.stats.connections}")
+    print(f"Transient 421s:    {server.stats.rejected}")
+    print(f"Elapsed:           {elapsed:.2f}s ({stats['sent'] / elapsed:.1f} msg/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in for delivery tests.")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of RCPTs answered with 421")
+    parser.add_argument("--bench", type=int, default=0, help="Run a delivery benchmark with N recipients")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0, help="Rate limit for the benchmark (0 = unlimited)")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.bench, args.workers, args.latency_ms, args.fail_rate, args.rate)
+        return
+
+    server = StandinServer(args.port, args.latency_ms, args.fail_rate)
+    print(f"📮 SMTP stand-in listening on 127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Received {server.stats.messages} message(s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Run lock, staged site output and atomic writes.
+
+A pipeline run holds an exclusive lock on data/pipeline.lock, so two runs
+on the same machine (the daemon plus the CLI, a backfill) never interleave.
+The lock is a local file: runs on separate machines, such as two GitHub
+Actions jobs, are kept apart by the workflow's concurrency group instead.
+Stages do not write the live site: the runner copies docs/ to a per-run
+staging directory under .staging/ and points the stages at it through
+PIPELINE_SITE_DIR. Only a successful run swaps the staged tree in, so the
+published brief, jargon, lab report and toolbox always come from one run.
+A failed run leaves the live site untouched.
+
+State in data/ that must only change when the run publishes (the backlog's
+sent stories, the glossary) is written through `deferred(path)`: during a staged run that
+is <name>.staged beside the real file, moved into place by the swap and
+deleted with a failed run.
+
+The swap is two renames (live -> .staging/previous, staged -> live) and then
+the deferred files. A marker file written before the first rename lets
+`recover()` finish or roll back a swap that was interrupted on the way.
+
+    SITE_DIR / SITE_DATA_DIR    where stages read and write the site
+    deferred(path)              where to write run state that only counts once published
+    atomic_write_text(path, s)  temp file + rename, for files that outlive a run
+"""
+import fcntl
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+LIVE_SITE_DIR = PROJECT_ROOT / "docs"
+STAGING_ROOT = PROJECT_ROOT / ".staging"
+PREVIOUS_DIR = STAGING_ROOT / "previous"
+SWAP_MARKER = STAGING_ROOT / "swap.json"
+DATA_DIR = PROJECT_ROOT / "data"
+LOCK_FILE = DATA_DIR / "pipeline.lock"
+
+SITE_ENV = "PIPELINE_SITE_DIR"
+DEFERRED_SUFFIX = ".staged"
+
+# Set by the runner for every stage; unset means the live site (manual runs, readers)
+SITE_DIR = Path(os.getenv(SITE_ENV) or LIVE_SITE_DIR)
+SITE_DATA_DIR = SITE_DIR / "data"
+
+# ============================
+# ATOMIC WRITES
+# ============================
+def atomic_write_text(path, text):
+    """Writes `text` to a temp file beside `path` and renames it over; readers see old or new, never half."""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+# ============================
+# DEFERRED RUN STATE
+# ============================
+def deferred(path):
+    """`path`, or its .staged twin while a staged run is in progress (swap() moves it into place)."""
+    path = Path(path)
+    return path.with_name(path.name + DEFERRED_SUFFIX) if os.getenv(SITE_ENV) else path
+
+def _deferred_files():
+    return list(DATA_DIR.glob(f"*{DEFERRED_SUFFIX}"))
+
+def _commit_deferred():
+    for path in _deferred_files():
+        path.replace(path.with_name(path.name[:-len(DEFERRED_SUFFIX)]))
+
+def _drop_deferred():
+    for path in _deferred_files():
+        path.unlink()
+
+# ============================
+# RUN LOCK
+# ============================
+@contextmanager
+def run_lock():
+    """Yields True while holding the pipeline lock, or False at once if another run has it."""
+    LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_FILE, "a+") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            handle.seek(0)
+            handle.truncate()
+            handle.write(f"{os.getpid()} {datetime.now(timezone.utc).isoformat()}\n")
+            handle.flush()
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+# ============================
+# STAGED SITE
+# ============================
+def recover():
+    """
+    Repairs what an interrupted run left behind. Call with the lock held.
+    A swap cut between its two renames is completed (the staged tree was
+    whole before the marker was written), or rolled back if that is gone.
+    Deferred state is kept only if its run's site went live.
+    """
+    if SWAP_MARKER.exists():
+        staged = STAGING_ROOT / json.loads(SWAP_MARKER.read_text(encoding="utf-8"))["staged"]
+        published = LIVE_SITE_DIR.exists() and not staged.exists()
+        if not LIVE_SITE_DIR.exists():
+            if staged.exists():
+                os.rename(staged, LIVE_SITE_DIR)
+                published = True
+                print("🩹 Completed an interrupted site swap")
+            elif PREVIOUS_DIR.exists():
+                os.rename(PREVIOUS_DIR, LIVE_SITE_DIR)
+                print("🩹 Rolled back an interrupted site swap")
+        if published:
+            _commit_deferred()
+        SWAP_MARKER.unlink()
+    _drop_deferred()   # Left by a run that never published
+    if STAGING_ROOT.exists():
+        for leftover in STAGING_ROOT.iterdir():
+            if leftover.is_dir():
+                shutil.rmtree(leftover)
+
+def stage_site():
+    """Copies the live site to a fresh staging directory and points the stages at it. Returns the directory."""
+    recover()
+    staged = STAGING_ROOT / f"docs-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    STAGING_ROOT.mkdir(exist_ok=True)
+    shutil.copytree(LIVE_SITE_DIR, staged)
+    os.environ[SITE_ENV] = str(staged)
+    return staged
+
+def swap(staged):
+    """Publishes a staged site in place of the live one, then the run's deferred state."""
+    os.environ.pop(SITE_ENV, None)
+    atomic_write_text(SWAP_MARKER, json.dumps({"staged": staged.name}))
+    os.rename(LIVE_SITE_DIR, PREVIOUS_DIR)
+    os.rename(staged, LIVE_SITE_DIR)
+    _commit_deferred()
+    SWAP_MARKER.unlink()
+    shutil.rmtree(PREVIOUS_DIR)
+
+def discard(staged):
+    os.environ.pop(SITE_ENV, None)
+    shutil.rmtree(staged, ignore_errors=True)
+    _drop_deferred()
@@ -1,10 +1,44 @@
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import re
 
+import llm_client
+import pipeline_metrics
+import staging
+from canonical import ensure_id
+
 PROJECT_ROOT = Path(__file__).resolve().parent
 INPUT_FILE = PROJECT_ROOT / "data" / "top_news.json"
 OUTPUT_FILE = PROJECT_ROOT / "data" / "technical_summaries.json"
+CACHE_FILE = PROJECT_ROOT / "data" / "summary_cache.json"
+
+# ============================
+# LLM BATCHING
+# ============================
+BATCH_TOKEN_BUDGET = 3000   # Prompt tokens per request (articles only, instructions excluded)
+MAX_BATCH_SIZE = 8
+MAX_CONCURRENT_BATCHES = 3
+CACHE_TTL_DAYS = 14
+
+LLM_FIELDS = ["technical_takeaway", "primary_risk", "primary_opportunity", "who_should_care"]
+
+PROMPT_HEADER = """
+You are a senior AI analyst writing an executive brief for technical leaders.
+For EACH article below write:
+- "technical_takeaway": one sentence on what is technically new or important.
+- "primary_risk": one sentence on the main risk or limitation.
+- "primary_opportunity": one sentence on the main opportunity.
+- "who_should_care": a list of 2 job roles (e.g. "ML Engineers", "CTOs").
+Base every answer only on the article text. Do not invent numbers.
+
+Return ONLY valid JSON:
+{"summaries": [{"index": 0, "technical_takeaway": "...", "primary_risk": "...", "primary_opportunity": "...", "who_should_care": ["...", "..."]}]}
+
+ARTICLES:
+"""
 
 def clean_text(text, max_chars=350):
     if not text:
@@ -20,7 +54,7 @@ def neutral_fallback_summary(title, source):
         f"relevant to AI researchers and practitioners."
     )
 
-def technical_summary(article):
+def technical_summary(article, insight=None):
     title = article.get("title")
     source = article.get("source", "The publisher")
     raw_summary = clean_text(article.get("summary"))
@@ -28,19 +62,123 @@ def technical_summary(article):
     if not raw_summary:
         raw_summary = neutral_fallback_summary(title, source)
 
+    insight = insight or {}
     return {
+        "id": ensure_id(article),
         "title": title,
         "url": article.get("url"),
         "source": source,
         "score": article.get("score"),
         "what_happened": raw_summary,
-        "technical_takeaway": None,
-        "primary_risk": None,
-        "primary_opportunity": None,
-        "who_should_care": None
+        # None => enrich.py falls back to its templates
+        "technical_takeaway": insight.get("technical_takeaway"),
+        "primary_risk": insight.get("primary_risk"),
+        "primary_opportunity": insight.get("primary_opportunity"),
+        "who_should_care": insight.get("who_should_care")
     }
 
+# ============================
+# CACHE
+# ============================
+def cache_key(article):
+    return ensure_id(article)
+
+def load_cache():
+    if not CACHE_FILE.exists():
+        return {}
+    try:
+        cache = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=CACHE_TTL_DAYS)).isoformat()
+    return {k: v for k, v in cache.items() if v.get("cached_at", "") >= cutoff}
+
+def save_cache(cache):
+    staging.atomic_write_text(CACHE_FILE, json.dumps(cache, indent=2, ensure_ascii=False))
+
+# ============================
+# BATCHED LLM SUMMARIES
+# ============================
+def article_block(index, article):
+    return (
+        f"[{index}] Title: {article.get('title', '')}\n"
+        f"Source: {article.get('source', '')}\n"
+        f"Text: {clean_text(article.get('full_text') or article.get('summary'), 1500)}\n"
+    )
+
+def pack_batches(articles, estimate_tokens):
+    """Greedy packing of articles into prompts under BATCH_TOKEN_BUDGET / MAX_BATCH_SIZE."""
+    batches, current, used = [], [], 0
+    for article in articles:
+        cost = estimate_tokens(article_block(0, article))
+        if current and (used + cost > BATCH_TOKEN_BUDGET or len(current) >= MAX_BATCH_SIZE):
+            batches.append(current)
+            current, used = [], 0
+        current.append(article)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def valid_insight(item):
+    return (
+        isinstance(item, dict)
+        and all(isinstance(item.get(f), str) and item[f].strip() for f in LLM_FIELDS[:3])
+        and isinstance(item.get("who_should_care"), list)
+        and item["who_should_care"]
+    )
+
+def summarize_batch(batch):
+    """Returns {cache_key: insight} for the articles the model answered correctly."""
+    prompt = PROMPT_HEADER + "\n".join(article_block(i, a) for i, a in enumerate(batch))
+    data = llm_client.generate_json(prompt)
+    items = data.get("summaries", []) if isinstance(data, dict) else (data or [])
+
+    results = {}
+    for item in items:
+        idx = item.get("index") if isinstance(item, dict) else None
+        if isinstance(idx, int) and 0 <= idx < len(batch) and valid_insight(item):
+            results[cache_key(batch[idx])] = {f: item[f] for f in LLM_FIELDS}
+    return results
+
+def summarize_with_llm(articles, cache):
+    """Fill insights from cache, then batch the misses into concurrent Gemini requests."""
+    insights = {}
+    misses = []
+    for a in articles:
+        key = cache_key(a)
+        if key in cache:
+            insights[key] = cache[key]
+            pipeline_metrics.incr("cache_hits")
+        else:
+            misses.append(a)
+
+    if not misses:
+        return insights
+    if not os.getenv("GEMINI_API_KEY"):
+        print("⚠️ GEMINI_API_KEY not set. Using template insights for uncached articles.")
+        return insights
+
+    batches = pack_batches(misses, llm_client.estimate_tokens)
+    print(f"🤖 Summarizing {len(misses)} article(s) in {len(batches)} batch(es) "
+          f"({len(articles) - len(misses)} cached)")
+
+    timestamp = datetime.now(timezone.utc).isoformat()
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES) as executor:
+        for batch_result in executor.map(summarize_batch, batches):
+            for key, insight in batch_result.items():
+                insights[key] = insight
+                cache[key] = {**insight, "cached_at": timestamp}
+
+    failed = len(misses) - sum(1 for a in misses if cache_key(a) in insights)
+    pipeline_metrics.incr("llm_failed_articles", failed)
+    if failed:
+        print(f"⚠️ {failed} article(s) fell back to template insights.")
+    return insights
+
 def main():
+    pipeline_metrics.start_stage("summarize")
     if not INPUT_FILE.exists():
         print(f"ERROR: {INPUT_FILE} not found.")
         return
@@ -48,7 +186,13 @@ def main():
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         articles = json.load(f)
 
-    summaries = [technical_summary(article) for article in articles]
+    pipeline_metrics.incr("articles_in", len(articles))
+    cache = load_cache()
+    insights = summarize_with_llm(articles, cache)
+    save_cache(cache)
+
+    summaries = [technical_summary(a, insights.get(cache_key(a))) for a in articles]
+    pipeline_metrics.incr("articles_out", len(summaries))
 
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
@@ -57,4 +201,4 @@ def main():
     print(f"Technical summaries generated: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,193 @@
+"""
+Tiny compiled template engine shared by the email and site renderers.
+
+Syntax (a strict Jinja subset):
+
+    {{ item.title }}             value lookup (dict key or attribute), auto-escaped in .html templates
+    {{ item.url|raw }}           insert without escaping
+    {% if item.terms %}..{% else %}..{% endif %}
+    {% for item in stories %}..{% endfor %}
+
+Templates compile once into a list of closures and are cached by path and
+mtime. Rendering appends into a single list and joins once. Values that
+are `Late(name)` markers are left as slots, so a body rendered once can be
+filled per recipient with `Rendered.fill(values)`: one join, no re-render.
+"""
+import html
+import re
+from functools import lru_cache
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+TEMPLATE_DIR = PROJECT_ROOT / "templates"
+
+TOKEN_RE = re.compile(r"(\{\{.*?\}\}|\{%.*?%\})", re.DOTALL)
+
+class TemplateError(ValueError):
+    pass
+
+class Late:
+    """Placeholder for a value supplied after rendering (e.g. the recipient's email)."""
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+class Rendered:
+    """Rendered output with zero or more late slots."""
+    __slots__ = ("parts", "slots", "escape")
+
+    def __init__(self, parts, slots, escape):
+        self.parts = parts
+        self.slots = slots
+        self.escape = escape
+
+    def fill(self, values=None):
+        if not self.slots:
+            return self.parts[0]
+        values = values or {}
+        out = [self.parts[0]]
+        for slot, text in zip(self.slots, self.parts[1:]):
+            value = values.get(slot, "")
+            out.append(self.escape(value) if self.escape else str(value))
+            out.append(text)
+        return "".join(out)
+
+    def __str__(self):
+        return self.fill()
+
+# ============================
+# COMPILER
+# ============================
+def _lookup(path):
+    keys = path.split(".")
+
+    def get(ctx):
+        value = ctx
+        for key in keys:
+            if isinstance(value, dict):
+                value = value.get(key)
+            else:
+                value = getattr(value, key, None)
+            if value is None:
+                return None
+        return value
+    return get
+
+def _escape_html(value):
+    return html.escape(str(value), quote=True)
+
+def _parse(tokens, pos, end_tags):
+    """Returns (nodes, pos, closing_tag)."""
+    nodes = []
+    while pos < len(tokens):
+        tok = tokens[pos]
+        pos += 1
+        if tok.startswith("{{"):
+            expr = tok[2:-2].strip()
+            raw = expr.endswith("|raw")
+            nodes.append(("var", expr[:-4].strip() if raw else expr, raw))
+        elif tok.startswith("{%"):
+            stmt = tok[2:-2].strip()
+            word = stmt.split(" ", 1)[0]
+            if word in end_tags:
+                return nodes, pos, word
+            if word == "if":
+                body, pos, closing = _parse(tokens, pos, ("else", "endif"))
+                orelse = []
+                if closing == "else":
+                    orelse, pos, closing = _parse(tokens, pos, ("endif",))
+                if closing != "endif":
+                    raise TemplateError(f"Unclosed {{% {stmt} %}}")
+                nodes.append(("if", stmt[3:].strip(), body, orelse))
+            elif word == "for":
+                m = re.match(r"for\s+(\w+)\s+in\s+([\w.]+)$", stmt)
+                if not m:
+                    raise TemplateError(f"Bad loop: {{% {stmt} %}}")
+                body, pos, closing = _parse(tokens, pos, ("endfor",))
+                if closing != "endfor":
+                    raise TemplateError(f"Unclosed {{% {stmt} %}}")
+                nodes.append(("for", m.group(1), m.group(2), body))
+            else:
+                raise TemplateError(f"Unknown tag: {{% {stmt} %}}")
+        elif tok:
+            nodes.append(("text", tok))
+    if end_tags:
+        raise TemplateError(f"Missing {{% {end_tags[-1]} %}}")
+    return nodes, pos, None
+
+def _compile(nodes, escape):
+    ops = []
+    for node in nodes:
+        kind = node[0]
+        if kind == "text":
+            ops.append(lambda ctx, out, _t=node[1]: out.append(_t))
+        elif kind == "var":
+            get = _lookup(node[1])
+            esc = None if node[2] else escape
+
+            def op(ctx, out, _get=get, _esc=esc):
+                value = _get(ctx)
+                if value is None:
+                    return
+                if isinstance(value, Late):
+                    out.append(value)
+                else:
+                    out.append(_esc(value) if _esc else str(value))
+            ops.append(op)
+        elif kind == "if":
+            cond = _lookup(node[1])
+            body, orelse = _compile(node[2], escape), _compile(node[3], escape)
+
+            def op(ctx, out, _cond=cond, _body=body, _orelse=orelse):
+                for f in (_body if _cond(ctx) else _orelse):
+                    f(ctx, out)
+            ops.append(op)
+        elif kind == "for":
+            name, items, body = node[1], _lookup(node[2]), _compile(node[3], escape)
+
+            def op(ctx, out, _name=name, _items=items, _body=body):
+                seq = _items(ctx) or ()
+                scope = dict(ctx)
+                for i, item in enumerate(seq):
+                    scope[_name] = item
+                    scope["loop"] = {"index": i + 1, "first": i == 0, "last": i == len(seq) - 1}
+                    for f in _body:
+                        f(scope, out)
+            ops.append(op)
+    return ops
+
+class Template:
+    def __init__(self, source, autoescape=True):
+        # Like Jinja's trim_blocks: a newline right after a {% tag %} is dropped
+        source = re.sub(r"%\}\n", "%}", source)
+        nodes, _, _ = _parse(TOKEN_RE.split(source), 0, ())
+        self.escape = _escape_html if autoescape else None
+        self.ops = _compile(nodes, self.escape)
+
+    def render(self, context):
+        """Render to a Rendered; str() / .fill() gives the final text."""
+        out = []
+        for f in self.ops:
+            f(context, out)
+
+        parts, slots, buf = [], [], []
+        for piece in out:
+            if isinstance(piece, Late):
+                parts.append("".join(buf))
+                slots.append(piece.name)
+                buf = []
+            else:
+                buf.append(piece)
+        parts.append("".join(buf))
+        return Rendered(parts, slots, self.escape)
+
+@lru_cache(maxsize=32)
+def _load(path, mtime):
+    source = Path(path).read_text(encoding="utf-8")
+    return Template(source, autoescape=str(path).endswith(".html"))
+
+def get_template(name):
+    """Compiled template from templates/, recompiled only when the file changes."""
+    path = TEMPLATE_DIR / name
+    return _load(str(path), path.stat().st_mtime_ns)
@@ -1,7 +1,6 @@
-import os
-from google import genai
+import llm_client
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+client = llm_client.new_client()
 
 print("List of models that support text generation:")
 for m in client.models.list():
@@ -0,0 +1,25 @@
+import send_email
+import templating
+
+def render(recipient):
+    context = {
+        "date": "2026-10-19",
+        "stories": [],
+        "tools": [],
+        "papers": [],
+        "recipient": {field: templating.Late(field) for field in send_email.RECIPIENT_FIELDS},
+    }
+    html_part, text_part = send_email.render_bodies(context)
+    return html_part, text_part, html_part.fill(recipient), text_part.fill(recipient)
+
+def test_footer_is_a_recipient_slot():
+    html_part, text_part, _, _ = render({})
+    assert "email" in html_part.slots
+    assert "email" in text_part.slots
+
+def test_filled_values_are_escaped_in_html_only():
+    recipient = {"name": "Ann", "email": "<b>ann&co@example.test"}
+    _, _, html_body, text_body = render(recipient)
+    assert "Sent to &lt;b&gt;ann&amp;co@example.test." in html_body
+    assert "{email}" not in html_body and "<b>ann" not in html_body
+    assert "Sent to <b>ann&co@example.test." in text_body
@@ -0,0 +1,67 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+import glossary
+
+def vector(score, axis):
+    """Unit vector whose cosine with the query [1, 0, 0] is `score`."""
+    v = np.zeros(3, dtype=np.float32)
+    v[0], v[axis] = score, math.sqrt(1 - score ** 2)
+    return v
+
+def make_glossary(tmp_path, entries, scores):
+    """Glossary whose entry i scores `scores[i]` = (name, definition) against any query."""
+    path, embeddings_path = tmp_path / "glossary.json", tmp_path / "glossary_embeddings.npy"
+    path.write_text(json.dumps([{"term": t, "definition": "", "aliases": []} for t in entries]))
+    np.save(embeddings_path, np.stack([[vector(n, 1), vector(d, 2)] for n, d in scores]))
+    g = glossary.Glossary(path, embeddings_path)
+    g._embed = lambda texts: np.array([[1.0, 0.0, 0.0]], dtype=np.float32)
+    return g
+
+@pytest.mark.parametrize("term, entry, scores", [
+    ("RLAIF", "RLHF", (0.82, 0.78)),               # sibling acronyms
+    ("QLoRA", "LoRA", (0.84, 0.83)),               # acronyms clear the definition bar, still different
+    ("Speculative sampling", "Speculative decoding", (0.80, 0.75)),
+])
+def test_near_miss_terms_get_their_own_entry(tmp_path, term, entry, scores):
+    g = make_glossary(tmp_path, [entry], [scores])
+    assert g.lookup(term) is None
+    assert g.entries[0]["aliases"] == []
+
+@pytest.mark.parametrize("term, entry, scores", [
+    ("MoE", "Mixture of Experts", (0.55, 0.86)),   # acronym onto a spelled-out entry
+    ("Mixture-of-Experts models", "Mixture of Experts", (0.90, 0.70)),
+])
+def test_spelling_variants_reuse_the_entry(tmp_path, term, entry, scores):
+    g = make_glossary(tmp_path, [entry], [scores])
+    assert g.lookup(term) == 0
+    assert g.entries[0]["aliases"] == [term]
+
+def test_acronym_skips_acronym_entries_for_the_next_best(tmp_path):
+    g = make_glossary(tmp_path, ["RLHF", "Reinforcement learning from AI feedback"], [(0.9, 0.9), (0.5, 0.85)])
+    assert g.lookup("RLAIF") == 1
+
+def test_same_day_rerun_leaves_the_site_copy_unchanged(tmp_path):
+    g = make_glossary(tmp_path, ["RLHF"], [(1.0, 1.0)])
+    g.entries[0]["updated_at"] = "2026-05-18T06:00:00+00:00"
+    site = tmp_path / "site" / "glossary.json"
+
+    g.touch(0)
+    assert g.publish(site)
+    g.touch(0)
+    assert not g.publish(site)
+    assert g.entries[0]["seen_count"] == 1
+    assert json.loads(site.read_text())["last_updated"] == "May 18, 2026"
+
+def test_staged_run_defers_the_glossary(tmp_path, monkeypatch):
+    g = make_glossary(tmp_path, ["RLHF"], [(1.0, 1.0)])
+    before = g.path.read_bytes()
+    monkeypatch.setenv(glossary.staging.SITE_ENV, str(tmp_path / "staged-site"))
+    g.touch(0)
+    g.save()
+    assert g.path.read_bytes() == before
+    assert (tmp_path / "glossary.json.staged").exists()
+    assert len(np.load(tmp_path / "glossary_embeddings.npy.staged")) == 1
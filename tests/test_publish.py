@@ -0,0 +1,65 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import format_brief
+import publish
+
+ARTICLES = [
+    {"id": f"s{i}", "rank": i, "title": f"Story {i}", "summary": "What happened.", "source": "Example",
+     "url": f"https://example.test/{i}", "related": []}
+    for i in range(1, 4)
+]
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    monkeypatch.setattr(publish, "SITE_DATA_DIR", data)
+    monkeypatch.setattr(publish, "ARCHIVE_DIR", data / "archive")
+    monkeypatch.setattr(publish, "STORY_DIR", data / "stories")
+    monkeypatch.setattr(publish, "MANIFEST_FILE", data / "manifest.json")
+    monkeypatch.setattr(publish, "BRIEF_FILE", data / "daily_brief.json")
+    monkeypatch.setattr(publish.pipeline_metrics, "start_stage", lambda name: None)
+    data.mkdir()
+    return tmp_path
+
+def snapshot(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in sorted(root.rglob("*")) if p.is_file()}
+
+def write_brief(now):
+    payload = format_brief.build_payload([dict(a) for a in ARTICLES], now)
+    format_brief.keep_timestamp(payload, publish.BRIEF_FILE)
+    publish.BRIEF_FILE.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+
+def test_unchanged_run_leaves_the_tree_unchanged(site):
+    write_brief(datetime(2026, 5, 18, 6, 0))
+    publish.main()
+    before = snapshot(site)
+
+    write_brief(datetime(2026, 5, 18, 9, 30))   # Same stories, later run
+    publish.main()
+    assert snapshot(site) == before
+
+def test_archive_ignores_the_run_timestamp(site):
+    write_brief(datetime(2026, 5, 18, 6, 0))
+    publish.main()
+    archived = snapshot(site / "data" / "archive")
+
+    brief = json.loads(publish.BRIEF_FILE.read_text(encoding="utf-8"))
+    brief["timestamp"] = "2026-05-18T09:30:00"
+    publish.BRIEF_FILE.write_text(json.dumps(brief), encoding="utf-8")
+    publish.main()
+    assert snapshot(site / "data" / "archive") == archived
+
+def test_changed_stories_replace_the_days_archive(site):
+    write_brief(datetime(2026, 5, 18, 6, 0))
+    publish.main()
+    first = set(snapshot(site / "data" / "archive"))
+
+    changed = [{**ARTICLES[0], "title": "Story 1, updated"}] + ARTICLES[1:]
+    payload = format_brief.build_payload(changed, datetime(2026, 5, 18, 9, 30))
+    publish.BRIEF_FILE.write_text(json.dumps(payload), encoding="utf-8")
+    publish.main()
+    second = set(snapshot(site / "data" / "archive"))
+    assert len(second) == 1 and second != first
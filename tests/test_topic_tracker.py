@@ -0,0 +1,37 @@
+from datetime import date
+
+import numpy as np
+
+import topic_tracker
+
+def unit(i, dim=4):
+    v = np.zeros(dim, dtype=np.float32)
+    v[i] = 1
+    return v
+
+def test_recycling_spares_topics_matched_today(monkeypatch):
+    monkeypatch.setattr(topic_tracker, "MAX_TOPICS", 2)
+    state = topic_tracker.TopicState(dim=4)
+
+    state.begin_day(date(2026, 5, 1))
+    labels, _ = state.update(np.stack([unit(0), unit(1)]))
+    assert list(labels) == [0, 1]
+
+    # Both topics decayed below REPLACEABLE_COUNT; e0 still belongs to topic 0,
+    # so the new e2 topic must take slot 1 instead of merging into slot 0
+    state.begin_day(date(2026, 5, 2))
+    labels, today = state.update(np.stack([unit(0), unit(2)]))
+    assert list(labels) == [0, 1]
+    assert list(today) == [1, 1]
+    np.testing.assert_allclose(state.centroids[0], unit(0))
+    np.testing.assert_allclose(state.centroids[1], unit(2))
+
+def test_no_free_slot_leaves_the_article_unassigned(monkeypatch):
+    monkeypatch.setattr(topic_tracker, "MAX_TOPICS", 2)
+    state = topic_tracker.TopicState(dim=4)
+
+    state.begin_day(date(2026, 5, 1))
+    state.update(np.stack([unit(0), unit(1)]))
+    state.begin_day(date(2026, 5, 2))
+    labels, _ = state.update(np.stack([unit(0), unit(1), unit(2)]))
+    assert list(labels) == [0, 1, -1]
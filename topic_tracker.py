@@ -0,0 +1,263 @@
+"""
+Streaming topic tracker over the daily dedup embeddings.
+
+A fixed number of topic centroids is updated incrementally (mini-batch
+k-means: each topic moves towards the mean of today's articles with a
+1/n learning rate) and every topic carries a time-decayed article count.
+Nothing is ever reclustered; the whole state is a few fixed-size arrays in
+data/topic_state.npz.
+
+Today's count against the decayed history gives each topic a momentum:
+rank_news.py adds a bonus for articles in rising topics, format_brief.py
+publishes the top ones as `rising_topics`.
+"""
+import json
+import math
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+import pipeline_metrics
+from canonical import ensure_id
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+STATE_FILE = PROJECT_ROOT / "data" / "topic_state.npz"
+MOMENTUM_FILE = PROJECT_ROOT / "data" / "topic_momentum.json"
+RISING_TOPICS_FILE = PROJECT_ROOT / "data" / "rising_topics.json"
+DEDUPED_FILE = PROJECT_ROOT / "data" / "deduped_news.json"
+
+MAX_TOPICS = 64
+HALF_LIFE_DAYS = 7            # A topic's count halves after a week without articles
+NEW_TOPIC_SIMILARITY = 0.45   # Below this cosine to every centroid, an article starts a topic
+REPLACEABLE_COUNT = 1.0       # Topics that decayed below one article (e.g. yesterday's singletons) can be recycled
+MIN_RISING_ARTICLES = 2
+RISING_TOPICS = 3
+HEADLINES_PER_TOPIC = 3
+
+DAILY_DECAY = 0.5 ** (1 / HALF_LIFE_DAYS)
+
+# ============================
+# STATE
+# ============================
+class TopicState:
+    """
+    centroids (K, dim), counts (K,) decayed, seen (K,) lifetime assignments
+    (sets the learning rate). `prev_*` hold the state before the last
+    day's update so a second run on the same day replaces, not adds to, it.
+    """
+    FIELDS = ["centroids", "counts", "seen"]
+
+    def __init__(self, dim, arrays=None, day=None):
+        arrays = arrays or {}
+        self.centroids = arrays.get("centroids", np.zeros((MAX_TOPICS, dim), dtype=np.float32))
+        self.counts = arrays.get("counts", np.zeros(MAX_TOPICS, dtype=np.float32))
+        self.seen = arrays.get("seen", np.zeros(MAX_TOPICS, dtype=np.float32))
+        self.prev = {f: arrays.get(f"prev_{f}", getattr(self, f).copy()) for f in self.FIELDS}
+        self.day = day
+
+    @classmethod
+    def load(cls, dim, path=STATE_FILE):
+        if path.exists():
+            try:
+                with np.load(path) as data:
+                    arrays = {k: data[k] for k in data.files if k != "day"}
+                    day = date.fromisoformat(str(data["day"]))
+                if arrays["centroids"].shape == (MAX_TOPICS, dim):
+                    return cls(dim, arrays, day)
+                print("⚠️ Topic state has another shape (model or MAX_TOPICS changed). Starting fresh.")
+            except (OSError, KeyError, ValueError):
+                print("⚠️ Topic state unreadable. Starting fresh.")
+        return cls(dim)
+
+    def save(self, path=STATE_FILE):
+        arrays = {f: getattr(self, f) for f in self.FIELDS}
+        arrays.update({f"prev_{f}": v for f, v in self.prev.items()})
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez_compressed(tmp, day=np.array(self.day.isoformat()), **arrays)
+        tmp.replace(path)
+
+    def begin_day(self, day):
+        """Decay to `day`; re-running the same day starts again from its snapshot."""
+        if self.day == day:
+            for f in self.FIELDS:
+                setattr(self, f, self.prev[f].copy())
+            return
+        if self.day is not None:
+            self.counts *= DAILY_DECAY ** max(0, (day - self.day).days)
+        self.prev = {f: getattr(self, f).copy() for f in self.FIELDS}
+        self.day = day
+
+    # ----------------------------
+    # Mini-batch update
+    # ----------------------------
+    def _seed(self, vector, active, in_use):
+        """
+        Slot for a new topic: an unused one, else the most decayed if it is
+        stale enough. Topics in `in_use` (matched or seeded today) are never recycled.
+        """
+        empty = np.flatnonzero(~active)
+        if len(empty):
+            slot = int(empty[0])
+        else:
+            counts = self.counts.copy()
+            counts[list(in_use)] = np.inf
+            slot = int(np.argmin(counts))
+            if counts[slot] >= REPLACEABLE_COUNT:
+                return None
+        self.centroids[slot] = vector
+        self.counts[slot] = 0
+        self.seen[slot] = 0
+        return slot
+
+    def assign(self, vectors):
+        """
+        Topic index per vector, seeding new topics for articles far from every
+        centroid. Articles that fit no topic while every slot is in use get -1.
+        Returns (labels, set of topics seeded today).
+        """
+        active = self.seen > 0
+        sims = vectors @ self.centroids.T
+        sims[:, ~active] = -np.inf
+        labels = np.argmax(sims, axis=1)
+        best = sims[np.arange(len(vectors)), labels]
+
+        seeded = set()
+        matched = {int(t) for t in labels[best >= NEW_TOPIC_SIMILARITY]}
+        for i in np.flatnonzero(best < NEW_TOPIC_SIMILARITY):
+            # Topics seeded earlier in this batch may already cover this article
+            row = self.centroids @ vectors[i]
+            row[~active] = -np.inf
+            if active.any() and row.max() >= NEW_TOPIC_SIMILARITY:
+                labels[i] = int(np.argmax(row))
+                matched.add(int(labels[i]))
+                continue
+            slot = self._seed(vectors[i], active, matched | seeded)
+            if slot is None:
+                labels[i] = -1        # No room; joining an unrelated topic would drag its centroid
+                continue
+            active[slot] = True
+            seeded.add(slot)
+            labels[i] = slot
+        return labels, seeded
+
+    def update(self, vectors):
+        """One mini-batch step. Returns (labels, today's count per topic)."""
+        labels, seeded = self.assign(vectors)
+        today = np.bincount(labels[labels >= 0], minlength=MAX_TOPICS).astype(np.float32)
+
+        for topic in np.flatnonzero(today):
+            members = vectors[labels == topic]
+            seen = (0 if topic in seeded else self.seen[topic]) + len(members)
+            eta = len(members) / seen
+            centroid = (1 - eta) * self.centroids[topic] + eta * members.mean(axis=0)
+            self.centroids[topic] = centroid / (np.linalg.norm(centroid) or 1)
+            self.seen[topic] = seen
+        self.counts += today
+        return labels, today
+
+    def momentum(self, today):
+        """Today's count over the daily rate the decayed history predicts (+1 smoothing)."""
+        history = self.counts - today
+        expected = history * (1 - DAILY_DECAY)
+        return today / (expected + 1)
+
+def momentum_bonus(momentum, max_bonus=2.0):
+    """Rank bonus: log2 of momentum, so doubling the expected coverage is worth +1."""
+    if not momentum or momentum <= 1:
+        return 0.0
+    return round(min(max_bonus, math.log2(momentum)), 2)
+
+# ============================
+# REPORT
+# ============================
+def rising_topics(articles, vectors, labels, today, momentum, state):
+    topics = []
+    for topic in np.argsort(-momentum, kind="stable"):
+        if len(topics) >= RISING_TOPICS or momentum[topic] <= 1:
+            break
+        if today[topic] < MIN_RISING_ARTICLES:
+            continue
+        members = np.flatnonzero(labels == topic)
+        closest = members[np.argsort(-(vectors[members] @ state.centroids[topic]))]
+        topics.append({
+            "topic_id": int(topic),
+            "label": articles[closest[0]].get("title", ""),
+            "articles_today": int(today[topic]),
+            "momentum": round(float(momentum[topic]), 2),
+            "headlines": [
+                {"title": articles[i].get("title", ""), "url": articles[i].get("url", "#"),
+                 "source": articles[i].get("source", "Unknown")}
+                for i in closest[:HEADLINES_PER_TOPIC]
+            ]
+        })
+    return topics
+
+def load_momentum():
+    """{article_id: momentum} written by the last tracker run, or {}."""
+    if not MOMENTUM_FILE.exists():
+        return {}
+    try:
+        return json.loads(MOMENTUM_FILE.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+def load_rising_topics():
+    if not RISING_TOPICS_FILE.exists():
+        return []
+    try:
+        return json.loads(RISING_TOPICS_FILE.read_text(encoding="utf-8"))
+    except ValueError:
+        return []
+
+# ============================
+# MAIN
+# ============================
+def main(now=None):
+    pipeline_metrics.start_stage("topic_tracker")
+    day = (now or datetime.now(timezone.utc)).date()
+
+    if not DEDUPED_FILE.exists():
+        print("⚠️ deduped_news.json missing. Skipping topic tracking.")
+        return
+    import ai_deduplicate  # heavy (sentence-transformers); keeps rank_news' import of this module light
+    articles = json.loads(DEDUPED_FILE.read_text(encoding="utf-8"))
+    vectors_by_id = ai_deduplicate.load_embeddings()
+    articles = [a for a in articles if ensure_id(a) in vectors_by_id]
+    if not articles:
+        print("⚠️ No dedup embeddings for today's articles. Skipping topic tracking.")
+        MOMENTUM_FILE.write_text("{}", encoding="utf-8")
+        RISING_TOPICS_FILE.write_text("[]", encoding="utf-8")
+        return
+    pipeline_metrics.incr("articles_in", len(articles))
+
+    vectors = np.stack([vectors_by_id[ensure_id(a)] for a in articles]).astype(np.float32)
+    state = TopicState.load(vectors.shape[1])
+    state.begin_day(day)
+
+    with pipeline_metrics.span("update"):
+        labels, today = state.update(vectors)
+        momentum = state.momentum(today)
+
+    topics = rising_topics(articles, vectors, labels, today, momentum, state)
+    state.save()
+
+    MOMENTUM_FILE.write_text(json.dumps(
+        {ensure_id(a): round(float(momentum[t]), 3) for a, t in zip(articles, labels) if t >= 0},
+        indent=2
+    ), encoding="utf-8")
+    RISING_TOPICS_FILE.write_text(json.dumps(topics, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    active = int(np.count_nonzero(state.seen))
+    pipeline_metrics.incr("articles_out", int(np.count_nonzero(labels >= 0)))
+    pipeline_metrics.incr("active_topics", active)
+    print(f"🧭 {len(articles)} articles over {int(np.count_nonzero(today))} topics today "
+          f"({active}/{MAX_TOPICS} topics tracked)")
+    for t in topics:
+        print(f"   📈 x{t['momentum']} ({t['articles_today']} articles): {t['label']}")
+
+if __name__ == "__main__":
+    main()
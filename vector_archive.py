@@ -0,0 +1,351 @@
+"""
+Long-term, compressed embedding archive of every deduplicated article.
+
+Vectors are stored as IVF-PQ codes (96 sub-quantizers x 8 bits plus an
+8-byte id: 104 bytes per article instead of 1,536 for raw float32 MiniLM,
+about 15x smaller) in data/vector_archive/, next to a JSON-lines metadata
+sidecar whose line number is the FAISS id. Lookups memory-map the index
+read-only; the daily append loads it, adds today's vectors and rewrites it
+atomically.
+
+Until TRAIN_MIN vectors have been seen, new vectors wait in a small float16
+buffer that is searched exactly. A uniform reservoir sample of everything
+ever added is kept for training, and the index is retrained from it once
+the archive has doubled since the last training (archived vectors are
+re-encoded from their current codes; the originals are not kept).
+
+PQ scores run low: a vector scores about 0.9 against its own code. Each
+training measures the median of that self-score on the reservoir and
+index scores are divided by it, so an exact repeat scores ~1.0 like it does
+in the exact buffer and CROSS_DAY_THRESHOLD means the same for both.
+
+As a pipeline stage (after ai_deduplicate.py) it drops articles that repeat
+a story from an earlier day, writes related-story links for format_brief.py
+and appends today's articles.
+
+    python vector_archive.py --search "open-weight reasoning models"
+    python vector_archive.py --stats
+"""
+import argparse
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+import pipeline_metrics
+from canonical import ensure_id
+
+# ============================
+# CONFIG
+# ============================
+PROJECT_ROOT = Path(__file__).resolve().parent
+ARCHIVE_DIR = PROJECT_ROOT / "data" / "vector_archive"
+DEDUPED_FILE = PROJECT_ROOT / "data" / "deduped_news.json"
+RELATED_FILE = PROJECT_ROOT / "data" / "related_stories.json"
+
+INDEX_NAME = "index.faiss"
+META_NAME = "meta.jsonl"
+PENDING_NAME = "pending.npy"
+RESERVOIR_NAME = "reservoir.npy"
+STATE_NAME = "state.json"
+
+NLIST = 64                  # IVF cells
+PQ_M = 96                   # sub-quantizers (4 dims each for MiniLM)
+PQ_BITS = 8
+NPROBE = 8
+TRAIN_MIN = 39 * 2 ** PQ_BITS   # FAISS wants >= 39 training points per PQ centroid (~4 weeks of articles)
+RESERVOIR_SIZE = 10000      # float16 on disk (~7.7 MB); must stay >= TRAIN_MIN
+CALIBRATION_SAMPLE = 2000   # Reservoir vectors scored against their own codes
+RETRAIN_GROWTH = 2          # Retrain when the archive doubled since the last training
+
+CROSS_DAY_THRESHOLD = 0.88  # Same story as an earlier day (on calibrated scores)
+RELATED_MIN = 0.60
+RELATED_K = 3
+
+_rng = np.random.default_rng()
+
+# ============================
+# ARCHIVE
+# ============================
+class VectorArchive:
+    def __init__(self, root=ARCHIVE_DIR, writable=False):
+        self.root = root
+        self.writable = writable
+        self.state = {"seen": 0, "trained_size": 0, "trained_at": None}
+        if (root / STATE_NAME).exists():
+            self.state.update(json.loads((root / STATE_NAME).read_text(encoding="utf-8")))
+
+        self.meta = []
+        if (root / META_NAME).exists():
+            with open(root / META_NAME, encoding="utf-8") as f:
+                self.meta = [json.loads(line) for line in f if line.strip()]
+        self.ids = {m["id"] for m in self.meta}
+        self._new_meta = []
+
+        self.index = None
+        if (root / INDEX_NAME).exists():
+            # Read-only lookups page the codes in from disk instead of loading them
+            flags = 0 if writable else faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            self.index = faiss.read_index(str(root / INDEX_NAME), flags)
+            self.index.nprobe = NPROBE
+
+        self.pending = self._load_array(PENDING_NAME)
+        self.reservoir = self._load_array(RESERVOIR_NAME)
+        if self.index is not None and "pq_scale" not in self.state and self.reservoir is not None:
+            self._calibrate()   # Index trained before calibration existed
+
+    def _load_array(self, name):
+        path = self.root / name
+        return np.load(path) if path.exists() else None
+
+    def __len__(self):
+        return len(self.meta)
+
+    # ----------------------------
+    # Append
+    # ----------------------------
+    def _sample(self, vectors):
+        """Reservoir sampling (Algorithm R) over every vector ever added."""
+        rows = list(self.reservoir) if self.reservoir is not None else []
+        for v in vectors.astype(np.float16):
+            self.state["seen"] += 1
+            if len(rows) < RESERVOIR_SIZE:
+                rows.append(v)
+            else:
+                j = int(_rng.integers(0, self.state["seen"]))
+                if j < RESERVOIR_SIZE:
+                    rows[j] = v
+        self.reservoir = np.stack(rows)
+
+    def add(self, articles, vectors):
+        """Append articles not archived yet. Returns how many were added."""
+        new = [i for i, a in enumerate(articles) if ensure_id(a) not in self.ids]
+        if not new:
+            return 0
+        vectors = np.ascontiguousarray(vectors[new], dtype=np.float32)
+        start = len(self.meta)
+        added_on = datetime.now(timezone.utc).date().isoformat()
+        for i in new:
+            a = articles[i]
+            entry = {
+                "id": ensure_id(a),
+                "title": a.get("title", ""),
+                "url": a.get("url", ""),
+                "source": a.get("source", "Unknown"),
+                "published_at": a.get("published_at"),
+                "added": added_on
+            }
+            self.meta.append(entry)
+            self._new_meta.append(entry)
+            self.ids.add(entry["id"])
+
+        self._sample(vectors)
+        if self.index is None:
+            stacked = vectors.astype(np.float16)
+            self.pending = stacked if self.pending is None else np.concatenate([self.pending, stacked])
+            if self.state["seen"] >= TRAIN_MIN:
+                self.train()
+        else:
+            self.index.add_with_ids(vectors, np.arange(start, start + len(new), dtype=np.int64))
+            if self.index.ntotal >= RETRAIN_GROWTH * self.state["trained_size"]:
+                self.train()
+        return len(new)
+
+    def train(self):
+        """(Re)build the IVF-PQ index from the reservoir and move every vector into it."""
+        dim = self.reservoir.shape[1]
+        index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, NLIST, PQ_M, PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+        with pipeline_metrics.span("train"):
+            index.train(self.reservoir.astype(np.float32))
+
+        if self.index is not None and self.index.ntotal:
+            self.index.make_direct_map()
+            index.add_with_ids(self.index.reconstruct_n(0, self.index.ntotal),
+                               np.arange(self.index.ntotal, dtype=np.int64))
+        if self.pending is not None and len(self.pending):
+            start = index.ntotal
+            index.add_with_ids(self.pending.astype(np.float32),
+                               np.arange(start, start + len(self.pending), dtype=np.int64))
+
+        index.nprobe = NPROBE
+        self.index = index
+        self.pending = None
+        self.state["trained_size"] = index.ntotal
+        self.state["trained_at"] = datetime.now(timezone.utc).isoformat()
+        self._calibrate()
+        pipeline_metrics.incr("retrains")
+        print(f"🧮 Vector archive trained on {len(self.reservoir)} sampled vectors ({index.ntotal} archived)")
+
+    def _calibrate(self):
+        """Median score of reservoir vectors against their own PQ codes (an exact repeat's expected score)."""
+        sample = self.reservoir[:CALIBRATION_SAMPLE].astype(np.float32)
+        decoded = self.index.sa_decode(self.index.sa_encode(sample))
+        self.state["pq_scale"] = round(float(np.median(np.sum(sample * decoded, axis=1))), 4)
+
+    # ----------------------------
+    # Lookup
+    # ----------------------------
+    def search(self, vectors, k=10):
+        """
+        Top-k (score, metadata) per query, over the index and the untrained
+        buffer. Index scores are calibrated to be comparable to exact cosines.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        scores = np.full((len(vectors), 0), -np.inf, dtype=np.float32)
+        rows = np.zeros((len(vectors), 0), dtype=np.int64)
+
+        if self.index is not None and self.index.ntotal:
+            scores, rows = self.index.search(vectors, min(k, self.index.ntotal))
+            scores = np.minimum(scores / self.state.get("pq_scale", 1.0), 1.0)
+        if self.pending is not None and len(self.pending):
+            exact = vectors @ self.pending.astype(np.float32).T
+            offset = len(self.meta) - len(self.pending)
+            top = np.argsort(-exact, axis=1)[:, :k]
+            scores = np.hstack([scores, np.take_along_axis(exact, top, axis=1)])
+            rows = np.hstack([rows, top + offset])
+
+        order = np.argsort(-scores, axis=1)[:, :k]
+        results = []
+        for q in range(len(vectors)):
+            results.append([
+                (float(scores[q, j]), self.meta[rows[q, j]])
+                for j in order[q] if rows[q, j] >= 0
+            ])
+        return results
+
+    def bytes_per_vector(self):
+        if self.index is None:
+            return self.reservoir.shape[1] * 2 if self.reservoir is not None else 0
+        return self.index.code_size + 8
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def save(self):
+        if not self.writable:
+            raise RuntimeError("archive opened read-only")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        if self._new_meta:
+            with open(self.root / META_NAME, "a", encoding="utf-8") as f:
+                for entry in self._new_meta:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._new_meta = []
+
+        if self.index is not None:
+            tmp = self.root / (INDEX_NAME + ".tmp")
+            faiss.write_index(self.index, str(tmp))
+            tmp.replace(self.root / INDEX_NAME)
+
+        pending_path = self.root / PENDING_NAME
+        if self.pending is not None:
+            np.save(pending_path, self.pending)
+        elif pending_path.exists():
+            pending_path.unlink()
+        if self.reservoir is not None:
+            np.save(self.root / RESERVOIR_NAME, self.reservoir)
+        (self.root / STATE_NAME).write_text(json.dumps(self.state, indent=2), encoding="utf-8")
+
+def load_related():
+    """{article_id: [related earlier stories]} from the last archive run, or {}."""
+    if not RELATED_FILE.exists():
+        return {}
+    try:
+        return json.loads(RELATED_FILE.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+# ============================
+# PIPELINE STAGE
+# ============================
+def earlier_matches(article, hits, today):
+    """Hits for other articles archived before today."""
+    own = ensure_id(article)
+    return [(score, m) for score, m in hits if m["id"] != own and m["added"] < today]
+
+def run_stage():
+    pipeline_metrics.start_stage("vector_archive")
+    if not DEDUPED_FILE.exists():
+        print("⚠️ deduped_news.json missing. Skipping vector archive.")
+        return
+
+    import ai_deduplicate  # heavy (sentence-transformers); only the stage needs it
+    articles = json.loads(DEDUPED_FILE.read_text(encoding="utf-8"))
+    vectors_by_id = ai_deduplicate.load_embeddings()
+    articles = [a for a in articles if ensure_id(a) in vectors_by_id]
+    if not articles:
+        print("⚠️ No dedup embeddings for today's articles. Skipping vector archive.")
+        RELATED_FILE.write_text("{}", encoding="utf-8")
+        return
+    pipeline_metrics.incr("articles_in", len(articles))
+    vectors = np.stack([vectors_by_id[ensure_id(a)] for a in articles]).astype(np.float32)
+
+    archive = VectorArchive(writable=True)
+    today = datetime.now(timezone.utc).date().isoformat()
+    with pipeline_metrics.span("search"):
+        all_hits = archive.search(vectors, k=RELATED_K + 2) if len(archive) else [[] for _ in articles]
+
+    kept, related = [], {}
+    for i, (article, hits) in enumerate(zip(articles, all_hits)):
+        earlier = earlier_matches(article, hits, today)
+        if earlier and earlier[0][0] >= CROSS_DAY_THRESHOLD:
+            continue
+        kept.append(i)
+        links = [
+            {"title": m["title"], "url": m["url"], "source": m["source"],
+             "published_at": m["published_at"], "similarity": round(score, 3)}
+            for score, m in earlier if score >= RELATED_MIN
+        ][:RELATED_K]
+        if links:
+            related[ensure_id(article)] = links
+
+    dropped = len(articles) - len(kept)
+    kept_articles = [articles[i] for i in kept]
+    if dropped:
+        DEDUPED_FILE.write_text(json.dumps(kept_articles, indent=2, ensure_ascii=False), encoding="utf-8")
+        ai_deduplicate.save_embeddings(kept_articles, vectors[kept])
+    RELATED_FILE.write_text(json.dumps(related, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    with pipeline_metrics.span("append"):
+        added = archive.add(kept_articles, vectors[kept])
+        archive.save()
+
+    pipeline_metrics.incr("dropped_cross_day", dropped)
+    pipeline_metrics.incr("articles_out", len(kept_articles))
+    ratio = vectors.shape[1] * 4 / archive.bytes_per_vector()
+    print(f"🗄️ Cross-day duplicates dropped: {dropped}; related links for {len(related)} articles")
+    print(f"🗄️ Archived {added} new vectors ({len(archive)} total, "
+          f"{archive.bytes_per_vector()} B/vector, {ratio:.1f}x smaller than float32)")
+
+# ============================
+# MAIN
+# ============================
+def main():
+    parser = argparse.ArgumentParser(description="Long-term compressed article embedding archive.")
+    parser.add_argument("--search", help="Find archived articles similar to this text")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--stats", action="store_true", help="Print archive size and compression")
+    args = parser.parse_args()
+
+    if args.stats:
+        archive = VectorArchive()
+        print(json.dumps({
+            "articles": len(archive),
+            "indexed": archive.index.ntotal if archive.index is not None else 0,
+            "pending": len(archive.pending) if archive.pending is not None else 0,
+            "bytes_per_vector": archive.bytes_per_vector(),
+            **archive.state
+        }, indent=2))
+    elif args.search:
+        import ai_deduplicate
+        query = ai_deduplicate.embed_texts(ai_deduplicate.load_model(), [args.search])
+        for score, m in VectorArchive().search(query, args.k)[0]:
+            print(f"{score:.3f}  {(m['published_at'] or '')[:10]}  {m['source']}: {m['title']}")
+            print(f"       {m['url']}")
+    else:
+        run_stage()
+
+if __name__ == "__main__":
+    main()